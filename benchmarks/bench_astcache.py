@@ -0,0 +1,61 @@
+"""Time to get the ASTs of the in-out corpus by parsing it, through a
+cold ASTCache (parse and store) and through a warm one (load only).
+
+    python3 benchmarks/bench_astcache.py
+"""
+
+import argparse
+import contextlib
+import io
+import pathlib
+import tempfile
+from ucgen import best_of
+from uc.uc_cache import ASTCache
+from uc.uc_parser import UCParser
+
+CORPUS = pathlib.Path(__file__).parent.parent / "tests" / "in-out"
+
+
+def corpus(parser):
+    """Texts of the in-out inputs, without those with syntax errors."""
+    texts = []
+    for path in sorted(CORPUS.glob("*.in")):
+        text = path.read_text()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                parser.parse(text)
+        except SystemExit:
+            continue
+        texts.append(text)
+    return texts
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--repeat", type=int, default=5)
+    args = argparser.parse_args()
+
+    plain = UCParser()
+    texts = corpus(plain)
+
+    def parse_all(parser):
+        for text in texts:
+            parser.parse(text)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ASTCache(tmpdir)
+        parser = UCParser(ast_cache=cache)
+
+        def cold():
+            cache.clear()
+            parse_all(parser)
+
+        times = [
+            ("parse", best_of(lambda: parse_all(plain), args.repeat)),
+            ("cold cache", best_of(cold, args.repeat)),
+            ("warm cache", best_of(lambda: parse_all(parser), args.repeat)),
+        ]
+        print("%d files" % len(texts))
+        for name, seconds in times:
+            print("%-12s %7.3fs  %8.1f files/s" % (name, seconds, len(texts) / seconds))
+        print("hits %d  misses %d" % (cache.hits, cache.misses))
@@ -0,0 +1,68 @@
+"""Parsing a batch of generated programs from an event loop: with
+UCParser.parse called in the loop, and with AsyncUCParser. Reports the
+elapsed time and the longest the loop went without running a 1 ms
+heartbeat task.
+
+    python3 benchmarks/bench_async.py
+"""
+
+import argparse
+import asyncio
+import time
+from ucgen import program
+from uc.uc_async import AsyncUCParser
+from uc.uc_parser import UCParser
+
+
+async def heartbeat(stalls):
+    last = time.perf_counter()
+    while True:
+        await asyncio.sleep(0.001)
+        now = time.perf_counter()
+        stalls.append(now - last)
+        last = now
+
+
+async def measure(parse_all):
+    stalls = []
+    beat = asyncio.ensure_future(heartbeat(stalls))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await parse_all()
+    elapsed = time.perf_counter() - start
+    beat.cancel()
+    return elapsed, max(stalls)
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--size", type=int, default=50_000)
+    argparser.add_argument("--files", type=int, default=16)
+    argparser.add_argument("-j", "--jobs", type=int, default=None)
+    args = argparser.parse_args()
+
+    texts = [program(args.size) for _ in range(args.files)]
+    parser = UCParser()
+
+    async def blocking():
+        for text in texts:
+            parser.parse(text)
+            await asyncio.sleep(0)
+
+    async def main():
+        results = [("UCParser", await measure(blocking))]
+        async with AsyncUCParser(args.jobs) as async_parser:
+            # start the workers outside of the measure
+            await asyncio.gather(*(async_parser.parse("int a;") for _ in range(8)))
+
+            async def concurrent():
+                await asyncio.gather(*(async_parser.parse(text) for text in texts))
+
+            results.append(("AsyncUCParser", await measure(concurrent)))
+            print(async_parser.metrics())
+        return results
+
+    results = asyncio.run(main())
+    print("%d files of %d bytes" % (args.files, args.size))
+    for name, (elapsed, stall) in results:
+        print("%-14s %7.3fs  longest stall %8.1fms" % (name, elapsed, stall * 1000))
@@ -0,0 +1,110 @@
+"""Size, dump and load times of the AST of a generated program of
+--size bytes written by uc_binary and by pickle: loading all of it, and
+loading one function, which pickle can only do by loading all of it.
+Each load walks the tree it gets, which reads the lazy bodies.
+Loading all of it is also timed with the cyclic GC paused, which
+otherwise rescans the growing tree many times over in both.
+
+    python3 benchmarks/bench_binary.py
+"""
+
+import argparse
+import gc
+import os
+import pickle
+import tempfile
+from ucgen import best_of, program
+from uc.uc_ast import FuncDef, ast_equal
+from uc.uc_binary import ASTReader, dump
+from uc.uc_parser import UCParser
+
+
+def walk(node):
+    """Count the nodes under node, reading all the lazy bodies."""
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(child for _, child in node.children())
+    return count
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--size", type=int, default=4 << 20)
+    argparser.add_argument("--repeat", type=int, default=3)
+    args = argparser.parse_args()
+
+    ast = UCParser().parse(program(args.size))
+    nodes = walk(ast)
+    funcdefs = [gdecl for gdecl in ast.gdecls if isinstance(gdecl, FuncDef)]
+    middle = funcdefs[len(funcdefs) // 2]
+    name = middle.decl.name.name
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        binary_path = os.path.join(tmpdir, "ast.bin")
+        pickle_path = os.path.join(tmpdir, "ast.pickle")
+
+        def dump_binary():
+            with open(binary_path, "wb") as f:
+                dump(ast, f)
+
+        def dump_pickle():
+            with open(pickle_path, "wb") as f:
+                pickle.dump(ast, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        def load_pickle():
+            with open(pickle_path, "rb") as f:
+                root = pickle.load(f)
+            walk(root)
+            return root
+
+        def paused(load):
+            def paused_load():
+                gc.disable()
+                try:
+                    return load()
+                finally:
+                    gc.enable()
+
+            return paused_load
+
+        def load_binary():
+            with ASTReader(binary_path) as reader:
+                root = reader.root()
+                walk(root)
+            return root
+
+        def load_function():
+            with ASTReader(binary_path) as reader:
+                funcdef = reader.function(name)
+                walk(funcdef)
+            return funcdef
+
+        def load_top():
+            return ASTReader(binary_path).root()
+
+        times = [
+            ("dump", best_of(dump_binary, args.repeat), best_of(dump_pickle, 1)),
+        ]
+        assert ast_equal(load_binary(), ast) and ast_equal(load_pickle(), ast)
+        assert ast_equal(load_function(), middle)
+        pickle_load = best_of(load_pickle, args.repeat)
+        times += [
+            ("load all", best_of(load_binary, args.repeat), pickle_load),
+            (
+                "load all, GC paused",
+                best_of(paused(load_binary), args.repeat),
+                best_of(paused(load_pickle), args.repeat),
+            ),
+            ("load one function", best_of(load_function, args.repeat), pickle_load),
+            ("load, bodies lazy", best_of(load_top, args.repeat), pickle_load),
+        ]
+        sizes = os.path.getsize(binary_path), os.path.getsize(pickle_path)
+
+    print("%d bytes of source, %d nodes" % (args.size, nodes))
+    print("%-20s %10s %10s" % ("", "binary", "pickle"))
+    print("%-20s %8.2fMB %8.2fMB" % ("size", sizes[0] / 1e6, sizes[1] / 1e6))
+    for what, binary, pickled in times:
+        print("%-20s %9.3fs %9.3fs" % (what, binary, pickled))
@@ -0,0 +1,95 @@
+"""Memory held by the coords of the AST of a large generated program,
+and the time to build them and to parse the program.
+
+    python3 benchmarks/bench_coord_memory.py
+"""
+
+import argparse
+import gc
+import struct
+import sys
+import tracemalloc
+from ucgen import best_of, program
+from uc.uc_parser import UCParser
+
+
+def coords(ast):
+    """The number of nodes of ast with a coord, and the distinct objects
+    their coords hold: offsets and line indexes."""
+    count = 0
+    parts = {}
+    stack = [ast]
+    seen = set()
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        lines = node._lines
+        if lines is not None:
+            count += 1
+            offset = node._offset
+            if not -5 <= offset <= 256:
+                parts[id(offset)] = offset
+            # a line index shared by the coords
+            parts[id(lines)] = lines
+            parts[id(lines.starts)] = lines.starts
+        stack.extend(child for _, child in node.children())
+    return count, parts
+
+
+def build_coords(parser, text):
+    # the coords of every token, as the grammar actions build them
+    lexer = parser.uclex
+    lexer.reset_lineno()
+    lexer.input(text)
+
+    class P:
+        pass
+
+    p = P()
+    p.lexer = lexer
+    toks = list(iter(lexer.token, None))
+    p.lineno = lambda i: toks[i].lineno
+    p.lexpos = lambda i: toks[i].lexpos
+    coord = parser._token_coord
+
+    def run():
+        for i in range(len(toks)):
+            coord(p, i)
+
+    return len(toks), run
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--size", type=int, default=1 << 20)
+    argparser.add_argument("--repeat", type=int, default=3)
+    args = argparser.parse_args()
+
+    text = program(args.size)
+    parser = UCParser()
+
+    ntokens, run = build_coords(parser, text)
+    coord_time = best_of(run, args.repeat)
+    parse_time = best_of(lambda: parser.parse(text), args.repeat)
+
+    gc.collect()
+    tracemalloc.start()
+    ast = parser.parse(text)
+    ast_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    count, parts = coords(ast)
+    # the two slots of each node holding its offset and line index
+    coord_bytes = count * 2 * struct.calcsize("P")
+    # ints, and line indexes with their offsets
+    int_bytes = sum(sys.getsizeof(v) for v in parts.values())
+    print("%d bytes, %d tokens, %d coords" % (len(text), ntokens, count))
+    print("coord per token   %8.3fs" % coord_time)
+    print("parse             %8.3fs" % parse_time)
+    print("AST               %8.1f MB" % (ast_bytes / 1e6))
+    print(
+        "coords            %8.1f MB (slots %.1f MB, held by them %.1f MB)"
+        % ((coord_bytes + int_bytes) / 1e6, coord_bytes / 1e6, int_bytes / 1e6)
+    )
@@ -0,0 +1,61 @@
+"""Cost of resolving the column of every token, comparing the old
+rfind scan with the LineIndex binary search.
+
+    python3 benchmarks/bench_coords.py
+"""
+
+import argparse
+from ucgen import best_of, long_line, many_lines
+from uc.uc_lexer import LineIndex, UCLexer
+
+
+def token_positions(text):
+    lexer = UCLexer(lambda msg, line, column: None)
+    lexer.build()
+    lexer.input(text)
+    positions = []
+    tok = lexer.token()
+    while tok:
+        positions.append(tok.lexpos)
+        tok = lexer.token()
+    return positions
+
+
+def rfind_columns(text, positions):
+    for lexpos in positions:
+        lexpos - text.rfind("\n", 0, lexpos)
+
+
+def index_columns(text, positions):
+    column = LineIndex(text).column
+    for lexpos in positions:
+        column(lexpos)
+
+
+def run(name, text, sample):
+    positions = token_positions(text)
+    step = max(1, len(positions) // sample)
+    sampled = positions[::step]
+    scale = len(positions) / len(sampled)
+    old = best_of(lambda: rfind_columns(text, sampled)) * scale
+    new = best_of(lambda: index_columns(text, positions))
+    print(
+        "%-16s %9d tokens  rfind %9.3fs  line index %7.3fs  (%.1fx)"
+        % (name, len(positions), old, new, old / new)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--line-bytes", type=int, default=1 << 20)
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=5000,
+        help="tokens timed with rfind; the total is extrapolated",
+    )
+    args = parser.parse_args()
+
+    run("1 MB line", long_line(args.line_bytes), args.sample)
+    run("%d lines" % args.lines, many_lines(args.lines), args.sample)
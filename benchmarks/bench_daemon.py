@@ -0,0 +1,84 @@
+"""Latency of getting the AST dump of a small file: by running
+uc_parser.py, by running uc_client.py against a running uc_daemon, and
+by a request on an open Client connection.
+
+    python3 benchmarks/bench_daemon.py
+"""
+
+import argparse
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+from ucgen import best_of, program
+from uc.uc_client import Client
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+
+def wait_for(path, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise TimeoutError("The daemon did not start")
+        time.sleep(0.05)
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--size", type=int, default=2000)
+    argparser.add_argument("--repeat", type=int, default=10)
+    args = argparser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = os.path.join(tmpdir, "input.uc")
+        with open(source, "w") as f:
+            f.write(program(args.size))
+        socket_path = os.path.join(tmpdir, "daemon.sock")
+        daemon = subprocess.Popen(
+            [
+                sys.executable,
+                str(ROOT / "uc" / "uc_daemon.py"),
+                "--socket",
+                socket_path,
+                "-j",
+                "1",
+            ],
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for(socket_path)
+
+            def run(script, *extra):
+                subprocess.run(
+                    [sys.executable, str(ROOT / "uc" / script), source, *extra],
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                )
+
+            with Client(socket_path) as client:
+                times = [
+                    ("uc_parser.py", best_of(lambda: run("uc_parser.py"), args.repeat)),
+                    (
+                        "uc_client.py",
+                        best_of(
+                            lambda: run("uc_client.py", "--socket", socket_path),
+                            args.repeat,
+                        ),
+                    ),
+                    (
+                        "Client.call",
+                        best_of(
+                            lambda: client.call(op="dump", path=source), args.repeat
+                        ),
+                    ),
+                ]
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+    print("%d bytes" % args.size)
+    for name, seconds in times:
+        print("%-13s %8.2fms" % (name, seconds * 1000))
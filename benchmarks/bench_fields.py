@@ -0,0 +1,64 @@
+"""Time to walk a tree of about 1M nodes with an explicit stack, by
+children() and by iter_children(), to compare it with an equal tree with
+ast_equal(), and
+to parse a generated program of --size bytes, which builds its nodes.
+
+The tree is the AST of a generated program whose global declarations
+are repeated until it has --nodes nodes: the subtrees are shared, which
+does not change the walks.
+
+    python3 benchmarks/bench_fields.py
+"""
+
+import argparse
+from ucgen import best_of, program
+from uc.uc_ast import Program, ast_equal
+from uc.uc_parser import UCParser
+
+
+def walk_children(tree):
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(child for _, child in node.children())
+    return count
+
+
+def walk_iter_children(tree):
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(child for _, child in node.iter_children())
+    return count
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--nodes", type=int, default=1_000_000)
+    argparser.add_argument("--size", type=int, default=1 << 20)
+    argparser.add_argument("--repeat", type=int, default=3)
+    args = argparser.parse_args()
+
+    parser = UCParser()
+    ast = parser.parse(program(1 << 18))
+    copies = -(-args.nodes // walk_children(ast))
+    tree = Program(ast.gdecls * copies)
+    other = Program(parser.parse(program(1 << 18)).gdecls * copies)
+    nodes = walk_children(tree)
+    assert walk_iter_children(tree) == nodes and ast_equal(tree, other)
+
+    text = program(args.size)
+    times = [
+        ("children()", best_of(lambda: walk_children(tree), args.repeat)),
+        ("iter_children()", best_of(lambda: walk_iter_children(tree), args.repeat)),
+        ("ast_equal()", best_of(lambda: ast_equal(tree, other), args.repeat)),
+    ]
+    print("%d nodes" % nodes)
+    for name, seconds in times:
+        print("%-16s %7.3fs  %6.2f M nodes/s" % (name, seconds, nodes / seconds / 1e6))
+    seconds = best_of(lambda: parser.parse(text), args.repeat)
+    print("parse %d bytes  %7.3fs" % (len(text), seconds))
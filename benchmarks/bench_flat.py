@@ -0,0 +1,125 @@
+"""Memory and traversal speed of a FlatAST against the Node tree of a
+generated program of about --nodes nodes: memory traced while building
+each from the other, a preorder walk by children() and one moving a
+Cursor, the count of the nodes of each class, and the query of the
+names of all the IDs.
+
+    python3 benchmarks/bench_flat.py
+"""
+
+import argparse
+import gc
+import tracemalloc
+from collections import Counter
+from ucgen import best_of, program
+from uc.uc_ast import NodeVisitor
+from uc.uc_flat import KINDS, FlatAST
+from uc.uc_parser import UCParser
+
+
+def traced(func):
+    """Result of func and the memory traced it still holds."""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, held
+
+
+def walk_tree(tree):
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(child for _, child in node.children())
+    return count
+
+
+def walk_cursor(flat):
+    count = 1
+    cursor = flat.cursor()
+    while True:
+        if cursor.goto_first_child():
+            count += 1
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return count
+        count += 1
+
+
+def kinds_tree(tree):
+    counts = Counter()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        counts[type(node).__name__] += 1
+        stack.extend(child for _, child in node.children())
+    return counts
+
+
+def kinds_flat(flat):
+    counts = Counter(flat.kinds[: flat.size])
+    return Counter({KINDS[kind].__name__: count for kind, count in counts.items()})
+
+
+class IDNames(NodeVisitor):
+    def __init__(self):
+        self.names = []
+
+    def visit_ID(self, node):
+        self.names.append(node.name)
+
+
+def id_names_tree(tree):
+    visitor = IDNames()
+    visitor.visit(tree)
+    return visitor.names
+
+
+def id_names_flat(flat):
+    return [cursor.value(0) for cursor in flat.find("ID")]
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--nodes", type=int, default=1_000_000)
+    argparser.add_argument("--repeat", type=int, default=3)
+    args = argparser.parse_args()
+
+    # about 180 nodes per kilobyte of ucgen.program
+    ast = UCParser().parse(program(args.nodes * 1000 // 180))
+    flat, flat_bytes = traced(lambda: FlatAST.from_tree(ast))
+    del ast
+    tree, tree_bytes = traced(flat.to_tree)
+    nodes = len(flat)
+    assert walk_tree(tree) == walk_cursor(flat) == nodes
+    assert kinds_tree(tree) == kinds_flat(flat)
+    assert id_names_tree(tree) == id_names_flat(flat)
+
+    print("%d nodes" % nodes)
+    print("%-22s %9s %9s" % ("", "tree", "flat"))
+    print(
+        "%-22s %7.1fMB %7.1fMB" % ("memory", tree_bytes / 1e6, flat_bytes / 1e6)
+    )
+    print(
+        "%-22s %9.1f %9.1f"
+        % ("bytes per node", tree_bytes / nodes, flat_bytes / nodes)
+    )
+    for name, tree_func, flat_func in [
+        ("preorder walk", walk_tree, walk_cursor),
+        ("count of each kind", kinds_tree, kinds_flat),
+        ("names of the IDs", id_names_tree, id_names_flat),
+        ("convert", FlatAST.from_tree, FlatAST.to_tree),
+    ]:
+        print(
+            "%-22s %8.3fs %8.3fs"
+            % (
+                name,
+                best_of(lambda: tree_func(tree), args.repeat),
+                best_of(lambda: flat_func(flat), args.repeat),
+            )
+        )
@@ -0,0 +1,50 @@
+"""Peak memory and time of going through every global declaration of a
+large file, with UCParser.parse and with UCParser.iter_parse reading
+the file chunk by chunk.
+
+    python3 benchmarks/bench_iter_parse.py
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from ucgen import program
+from uc.uc_parser import UCParser
+
+
+def whole(parser, path):
+    with open(path) as f:
+        return len(parser.parse(f.read()).gdecls)
+
+
+def streamed(parser, path):
+    with open(path) as f:
+        return sum(1 for _ in parser.iter_parse(f))
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--megabytes", type=float, nargs="+", default=[0.5, 1, 2])
+    args = argparser.parse_args()
+
+    parser = UCParser()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "big.uc")
+        for megabytes in args.megabytes:
+            with open(path, "w") as f:
+                f.write(program(int(megabytes * (1 << 20))))
+            for name, func in [("parse", whole), ("iter_parse", streamed)]:
+                start = time.perf_counter()
+                func(parser, path)
+                elapsed = time.perf_counter() - start
+                # traced apart, as tracing slows the parse down
+                tracemalloc.start()
+                func(parser, path)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(
+                    "%5.1f MB  %-10s %7.3fs  peak %7.1f MB"
+                    % (megabytes, name, elapsed, peak / (1 << 20))
+                )
@@ -0,0 +1,109 @@
+"""Throughput of the JSON export of the AST of a generated program of
+--size bytes: write_json and write_ndjson streaming to a file, against
+show() and against building the whole document as dicts for the C
+encoder of json.dumps, with the peak memory traced while each writes.
+
+    python3 benchmarks/bench_json.py
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import tracemalloc
+from ucgen import best_of, program
+from uc.uc_ast import DATA
+from uc.uc_json import write_json, write_ndjson
+from uc.uc_parser import UCParser
+
+
+def as_dict(node):
+    """The document of node as dicts, built with an explicit stack."""
+    root = {}
+    stack = [(node, root)]
+    while stack:
+        node, result = stack.pop()
+        coord = node.coord
+        result["_nodetype"] = type(node).__name__
+        result["coord"] = coord and {"line": coord.line, "column": coord.column}
+        for name, kind in node.fields.items():
+            if kind == DATA:
+                continue
+            value = getattr(node, name)
+            if isinstance(value, list):
+                result[name] = [{} for _ in value]
+                stack.extend(zip(value, result[name]))
+            elif value is None or isinstance(value, str):
+                result[name] = value
+            else:
+                result[name] = {}
+                stack.append((value, result[name]))
+    return root
+
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(child for _, child in node.children())
+    return count
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--size", type=int, default=4 << 20)
+    argparser.add_argument("--repeat", type=int, default=3)
+    args = argparser.parse_args()
+
+    ast = UCParser().parse(program(args.size))
+    encoder = json.JSONEncoder(separators=(",", ":"))
+    dumps = encoder.encode
+    nodes = count_nodes(ast)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "ast.json")
+
+        def writer(write):
+            def write_file():
+                # a new file each time: truncating the last one is slower
+                if os.path.exists(path):
+                    os.remove(path)
+                with open(path, "w") as f:
+                    write(f)
+
+            return write_file
+
+        writers = [
+            ("write_json", writer(lambda f: write_json(ast, f))),
+            ("write_ndjson", writer(lambda f: write_ndjson(ast, f))),
+            ("show()", writer(lambda f: ast.show(buf=f, showcoord=True))),
+            ("dicts + json.dumps", writer(lambda f: f.write(dumps(as_dict(ast))))),
+        ]
+        results = []
+        for name, write in writers:
+            seconds = best_of(write, args.repeat)
+            tracemalloc.start()
+            write()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append((name, seconds, os.path.getsize(path), peak))
+
+    print("%d bytes of source, %d nodes" % (args.size, nodes))
+    print(
+        "%-18s %8s %9s %10s %10s %9s"
+        % ("", "seconds", "MB out", "MB/s", "k nodes/s", "peak MB")
+    )
+    for name, seconds, size, peak in results:
+        print(
+            "%-18s %8.3f %9.1f %10.1f %10.0f %9.1f"
+            % (
+                name,
+                seconds,
+                size / 1e6,
+                size / seconds / 1e6,
+                nodes / seconds / 1e3,
+                peak / 1e6,
+            )
+        )
@@ -0,0 +1,53 @@
+"""Time and memory of a signature-only workload, reading the name and
+parameters of every function of a large file, with an eager parse and
+with a lazy one, which skips the function bodies.
+
+    python3 benchmarks/bench_lazy.py
+"""
+
+import argparse
+import time
+import tracemalloc
+from ucgen import program
+from uc.uc_ast import FuncDef
+from uc.uc_parser import UCParser
+
+
+def signatures(ast):
+    return [
+        (g.decl.name.name, g.decl.type.params)
+        for g in ast.gdecls
+        if isinstance(g, FuncDef)
+    ]
+
+
+def measure(parser, text, lazy):
+    """Seconds taken, then peak and retained bytes allocated, which are
+    measured in a second run as tracing slows the parse down."""
+    start = time.perf_counter()
+    signatures(parser.parse(text, lazy=lazy))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    ast = parser.parse(text, lazy=lazy)
+    signatures(ast)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ast
+    return elapsed, peak, retained
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--megabytes", type=float, default=2)
+    args = argparser.parse_args()
+
+    parser = UCParser()
+    text = program(int(args.megabytes * (1 << 20)))
+    print("%.1f MB, %d lines" % (len(text) / (1 << 20), text.count("\n")))
+    for name, lazy in [("eager", False), ("lazy", True)]:
+        elapsed, peak, retained = measure(parser, text, lazy)
+        print(
+            "%-6s %7.3fs  peak %7.1f MB  retained %7.1f MB"
+            % (name, elapsed, peak / (1 << 20), retained / (1 << 20))
+        )
@@ -0,0 +1,45 @@
+"""Tokens per second of the PLY and regex lexer engines.
+
+    python3 benchmarks/bench_lexer.py
+"""
+
+import argparse
+from pathlib import Path
+from ucgen import best_of, many_lines
+from uc.uc_lexer import UCLexer
+
+IN_OUT = Path(__file__).parent.parent / "tests" / "in-out"
+
+
+def count_tokens(lexer, text):
+    lexer.input(text)
+    n = 0
+    token = lexer.token
+    while token():
+        n += 1
+    return n
+
+
+def run(name, text):
+    rates = []
+    for engine in ("ply", "regex"):
+        lexer = UCLexer(lambda msg, line, column: None)
+        lexer.build(engine=engine)
+        ntokens = count_tokens(lexer, text)
+        elapsed = best_of(lambda: count_tokens(lexer, text))
+        rates.append(ntokens / elapsed)
+    print(
+        "%-16s %9d tokens  ply %10.0f tok/s  regex %10.0f tok/s  (%.2fx)"
+        % (name, ntokens, rates[0], rates[1], rates[1] / rates[0])
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--copies", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = "".join(path.read_text() for path in sorted(IN_OUT.glob("*.in")))
+    run("in-out corpus", corpus * args.copies)
+    run("%d lines" % args.lines, many_lines(args.lines))
@@ -0,0 +1,61 @@
+"""Parse time of generated programs with growing numbers of globals and
+statements. With the list rules growing their lists in place the time
+per item stays flat; --compare also runs the former list rules, which
+copied the whole list on every reduction.
+
+    python3 benchmarks/bench_lists.py
+"""
+
+import argparse
+import time
+from uc.uc_parser import UCParser
+
+
+class CopyingParser(UCParser):
+    """UCParser with list rules that copy the list on every reduction."""
+
+    def p_global_declaration_list(self, p):
+        """global_declaration_list : global_declaration
+                                    | global_declaration_list global_declaration
+        """
+        p[0] = [p[1]] if len(p) == 2 else p[1] + [p[2]]
+
+    def p_statement_list(self, p):
+        """statement_list : statement
+                          | statement_list statement
+        """
+        p[0] = [p[1]] if len(p) == 2 else p[1] + [p[2]]
+
+
+def source(n):
+    """n globals and a function with 2 * n statements."""
+    globals_ = "".join("int g%d;\n" % i for i in range(n))
+    body = "".join("    g%d;\n    print(g%d);\n" % (i, i) for i in range(n))
+    return globals_ + "int main() {\n" + body + "    return 0;\n}\n"
+
+
+def run(parser, text):
+    start = time.perf_counter()
+    parser.parse(text)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    argparser.add_argument("--compare", action="store_true")
+    args = argparser.parse_args()
+
+    parsers = [("in place", UCParser(lexer_engine="regex"))]
+    if args.compare:
+        parsers.append(("copying", CopyingParser(lexer_engine="regex")))
+    for n in args.sizes:
+        text = source(n)
+        for name, parser in parsers:
+            elapsed = run(parser, text)
+            print(
+                "%-9s %7d globals %7d statements  %8.3fs  %6.2f us/item"
+                % (name, n, 2 * n + 1, elapsed, elapsed / (3 * n + 1) * 1e6)
+            )
@@ -0,0 +1,70 @@
+"""Memory taken by the AST nodes of a generated program of about 100k
+nodes: bytes per node, as sys.getsizeof counts them (with their
+__dict__, if they have one), the memory traced while parsing and the
+RSS of the process holding the AST.
+
+    python3 benchmarks/bench_node_memory.py
+"""
+
+import argparse
+import gc
+import resource
+import sys
+import tracemalloc
+from collections import Counter
+from ucgen import program
+from uc.uc_parser import UCParser
+
+
+def walk(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(child for _, child in node.children())
+
+
+def node_size(node):
+    size = sys.getsizeof(node)
+    if hasattr(node, "__dict__"):
+        size += sys.getsizeof(node.__dict__)
+    return size
+
+
+def rss():
+    """Current resident set size in bytes."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--nodes", type=int, default=100_000)
+    args = argparser.parse_args()
+
+    parser = UCParser()
+    # about 180 nodes per kilobyte of ucgen.program
+    text = program(args.nodes * 1000 // 180)
+    gc.collect()
+    before = rss()
+    tracemalloc.start()
+    ast = parser.parse(text)
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    gc.collect()
+    held = rss() - before
+
+    nodes = list(walk(ast))
+    sizes = Counter()
+    counts = Counter()
+    for node in nodes:
+        sizes[type(node).__name__] += node_size(node)
+        counts[type(node).__name__] += 1
+    total = sum(sizes.values())
+    print("%d bytes of source, %d nodes" % (len(text), len(nodes)))
+    print("bytes per node    %8.1f" % (total / len(nodes)))
+    for name, count in counts.most_common(6):
+        print("  %-15s %8.1f" % (name, sizes[name] / count))
+    print("nodes             %8.1f MB" % (total / 1e6))
+    print("traced by parse   %8.1f MB" % (traced / 1e6))
+    print("RSS after parse   %8.1f MB (+%.1f MB)" % (rss() / 1e6, held / 1e6))
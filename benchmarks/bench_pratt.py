@@ -0,0 +1,53 @@
+"""Parse time of expression-dense sources, and of the generic program of
+ucgen, with the LALR expressions of UCParser and the hand-written
+precedence climbing of UCPrattParser.
+
+    python3 benchmarks/bench_pratt.py
+"""
+
+import argparse
+import random
+from ucgen import best_of, program
+from uc.uc_parser import UCParser
+from uc.uc_pratt import UCPrattParser
+
+OPERATORS = ["+", "-", "*", "/", "%", "<", "<=", ">", ">=", "==", "!=", "&&", "||"]
+
+
+def expression(rng, length):
+    operands = ["a", "b[i]", "f(x, y)", "-c", "!d", "(e + 1)", "42", "'z'"]
+    parts = [rng.choice(operands)]
+    for _ in range(length):
+        parts.append(rng.choice(OPERATORS))
+        parts.append(rng.choice(operands))
+    return " ".join(parts)
+
+
+def source(statements, length, seed=921):
+    rng = random.Random(seed)
+    body = "".join(
+        "    x = %s;\n" % expression(rng, length) for _ in range(statements)
+    )
+    return "int main() {\n" + body + "}\n"
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--statements", type=int, default=2000)
+    argparser.add_argument("--lengths", type=int, nargs="+", default=[1, 4, 16, 64])
+    argparser.add_argument("--engine", default="regex")
+    args = argparser.parse_args()
+
+    lalr = UCParser(lexer_engine=args.engine)
+    pratt = UCPrattParser(lexer_engine=args.engine)
+    inputs = [
+        ("%d operators" % length, source(args.statements, length))
+        for length in args.lengths
+    ]
+    inputs.append(("ucgen program", program(1 << 20)))
+    for name, text in inputs:
+        times = [best_of(lambda: parser.parse(text)) for parser in (lalr, pratt)]
+        print(
+            "%-14s lalr %7.3fs  pratt %7.3fs  (%.2fx)"
+            % (name, times[0], times[1], times[0] / times[1])
+        )
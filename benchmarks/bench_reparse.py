@@ -0,0 +1,51 @@
+"""Latency of parsing again a file of many functions after one of them
+is edited: a full parse against UCParser.reparse, which only parses the
+edited function. The edit either keeps the line count or adds lines,
+which moves the coords of every function after it.
+
+    python3 benchmarks/bench_reparse.py
+"""
+
+import argparse
+import time
+from ucgen import function
+from uc.uc_parser import UCParser
+
+EDITS = {
+    "same lines": ("    int a = %d;\n", "    int a = -%d;\n"),
+    "added lines": (
+        '    char s[] = "f%d";\n',
+        '    char s[] = "f%d";\n    int b;\n\n',
+    ),
+}
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--functions", type=int, default=5000)
+    argparser.add_argument("--repeat", type=int, default=3)
+    args = argparser.parse_args()
+
+    parser = UCParser()
+    text = "".join(function(i) for i in range(args.functions))
+    edited = args.functions // 2
+    print("%d functions, %d bytes" % (args.functions, len(text)))
+    for name, (old, new) in EDITS.items():
+        new_text = text.replace(old % edited, new % edited, 1)
+        full = incremental = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            parser.parse(new_text)
+            elapsed = time.perf_counter() - start
+            full = elapsed if full is None else min(full, elapsed)
+
+            # reparse takes over the old program: parse it anew each time
+            program = parser.parse(text)
+            start = time.perf_counter()
+            parser.reparse(program, new_text)
+            elapsed = time.perf_counter() - start
+            incremental = elapsed if incremental is None else min(incremental, elapsed)
+        print(
+            "%-12s full %7.3fs  reparse %7.4fs  (%.0fx)"
+            % (name, full, incremental, full / incremental)
+        )
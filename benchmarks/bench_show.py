@@ -0,0 +1,76 @@
+"""Throughput of dumping the AST of a generated program with show()
+(coords on, as the command line tool prints it) and repr(), and the
+deepest else-if chain each of them handles.
+
+    python3 benchmarks/bench_show.py
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+from ucgen import best_of, program
+from uc.uc_parser import UCParser
+
+
+def else_ifs(depth):
+    """A function with an if followed by depth else-ifs."""
+    chain = "".join("else if (a == %d) a = %d;\n" % (i, i) for i in range(depth))
+    return "int f(int a) {\nif (a) a = 0;\n" + chain + "return a;\n}\n"
+
+
+def deepest(parser, dump, limit):
+    """Depth of the deepest else-if chain, up to limit, that dump
+    handles. The size of the dumps grows with the square of the depth,
+    as each level is indented further."""
+    depth = 100
+    while depth <= limit:
+        ast = parser.parse(else_ifs(depth))
+        try:
+            dump(ast)
+        except RecursionError:
+            return depth // 2
+        depth *= 2
+    return limit
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--size", type=int, default=1 << 20)
+    argparser.add_argument("--repeat", type=int, default=3)
+    argparser.add_argument("--depth-limit", type=int, default=3200)
+    args = argparser.parse_args()
+
+    parser = UCParser()
+    ast = parser.parse(program(args.size))
+
+    def show(ast, buf=None):
+        ast.show(buf=buf or io.StringIO(), showcoord=True)
+
+    buf = io.StringIO()
+    show(ast, buf)
+    sizes = {"show": len(buf.getvalue()), "repr": len(repr(ast))}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        def show_file():
+            with open(os.path.join(tmpdir, "dump.ast"), "w") as f:
+                show(ast, f)
+
+        times = [
+            ("show StringIO", best_of(lambda: show(ast), args.repeat)),
+            ("show file", best_of(show_file, args.repeat)),
+            ("repr", best_of(lambda: repr(ast), args.repeat)),
+        ]
+    print("%d bytes of source" % args.size)
+    for name, seconds in times:
+        nbytes = sizes[name.split()[0]]
+        print(
+            "%-14s %7.3fs  %9d bytes  %6.1f MB/s"
+            % (name, seconds, nbytes, nbytes / seconds / 1e6)
+        )
+    sys.setrecursionlimit(1000)
+    print("deepest else-if chain (recursion limit 1000):")
+    print("  show %d" % deepest(parser, show, args.depth_limit))
+    print("  repr %d" % deepest(parser, repr, args.depth_limit))
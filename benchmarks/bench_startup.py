@@ -0,0 +1,46 @@
+"""Construction time of UCLexer(...).build() and UCParser(), without
+the table caches, with cold caches and with warm ones. Every measurement runs in a
+fresh interpreter, as a short-lived worker would.
+
+    python3 benchmarks/bench_startup.py
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+
+CASES = {
+    "lexer": "UCLexer(print).build()",
+    "lexer cached": "UCLexer(print).build(cache=True, cache_dir=%(cache_dir)r)",
+    "parser": "UCParser(cache=False)",
+    "parser cached": "UCParser(cache_dir=%(cache_dir)r)",
+}
+
+SETUP = "from uc.uc_lexer import UCLexer\nfrom uc.uc_parser import UCParser"
+
+
+def measure(statement, cache_dir):
+    """Seconds taken by statement in a fresh interpreter."""
+    statement = statement % {"cache_dir": cache_dir}
+    code = (
+        "import time\n%s\nstart = time.perf_counter()\n%s\n"
+        "print(time.perf_counter() - start)\n" % (SETUP, statement)
+    )
+    # grammar warnings of cold builds go to the captured stderr
+    out = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return float(out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, statement in CASES.items():
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold = measure(statement, cache_dir)
+            warm = min(measure(statement, cache_dir) for _ in range(args.repeat))
+        print("%-16s cold %7.2f ms  warm %7.2f ms" % (name, cold * 1000, warm * 1000))
@@ -0,0 +1,70 @@
+"""Peak RSS and time of scanning a large generated file read whole
+against scanning it chunk by chunk or from an mmap.
+
+    python3 benchmarks/bench_stream.py --megabytes 200
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from ucgen import program
+from uc.uc_lexer import UCLexer
+
+
+def scan(path, mode, chunk_size):
+    """Scan path in the given mode; runs in a child process."""
+    lexer = UCLexer(lambda msg, line, column: None)
+    lexer.build(engine="regex")
+    start = time.perf_counter()
+    if mode == "read":
+        with open(path) as f:
+            lexer.input(f.read())
+    else:
+        lexer.input_file(path, use_mmap=mode == "mmap", chunk_size=chunk_size)
+    ntokens = 0
+    token = lexer.token
+    while token():
+        ntokens += 1
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print("%-8s %10d tokens  %7.2fs  peak RSS %8.1f MB" % (mode, ntokens, elapsed, peak))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=float, default=100)
+    parser.add_argument("--chunk-size", type=int, default=1 << 16)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        scan(args.path, args.mode, args.chunk_size)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "big.uc")
+        piece = program(1 << 20)
+        with open(path, "w") as f:
+            for _ in range(int(args.megabytes)):
+                f.write(piece)
+        del piece
+        print("%.0f MB file" % (os.path.getsize(path) / (1 << 20)))
+        for mode in ("read", "chunked", "mmap"):
+            subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--mode",
+                    mode,
+                    "--path",
+                    path,
+                    "--chunk-size",
+                    str(args.chunk_size),
+                ],
+                check=True,
+            )
@@ -0,0 +1,54 @@
+"""Memory per token of a list of PLY LexTokens against a TokenBuffer,
+on a generated uC file of about 10 MB.
+
+    python3 benchmarks/bench_tokbuf.py
+"""
+
+import argparse
+import time
+import tracemalloc
+from ucgen import program
+from uc.uc_lexer import UCLexer
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    tokens = build()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return tokens, size, elapsed
+
+
+def token_list(lexer, text):
+    lexer.reset_lineno()
+    lexer.input(text)
+    return list(iter(lexer.token, None))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=float, default=10)
+    args = parser.parse_args()
+
+    text = program(int(args.megabytes * (1 << 20)))
+    lexer = UCLexer(lambda msg, line, column: None)
+    lexer.build(engine="regex")
+    # keep the line table of the input out of both measurements
+    lexer.input(text)
+
+    tokens, list_size, list_time = measure(lambda: token_list(lexer, text))
+    ntokens = len(tokens)
+    del tokens
+    buf, buf_size, buf_time = measure(lambda: lexer.tokenize_all(text))
+
+    print("%.1f MB of source, %d tokens" % (len(text) / (1 << 20), ntokens))
+    print(
+        "LexToken list  %7.1f bytes/token  %6.1f MB  %.2fs"
+        % (list_size / ntokens, list_size / (1 << 20), list_time)
+    )
+    print(
+        "TokenBuffer    %7.1f bytes/token  %6.1f MB  %.2fs"
+        % (buf_size / ntokens, buf_size / (1 << 20), buf_time)
+    )
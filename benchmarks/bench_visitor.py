@@ -0,0 +1,65 @@
+"""Time to walk a tree of about 1M nodes: by recursing into children(),
+with a NodeVisitor whose generic_visit counts every node, and with one
+that only has a visit_ID method.
+
+The tree is the AST of a generated program whose global declarations
+are repeated until it has --nodes nodes: the subtrees are shared, which
+does not change the walks.
+
+    python3 benchmarks/bench_visitor.py
+"""
+
+import argparse
+from ucgen import best_of, program
+from uc.uc_ast import NodeVisitor, Program
+from uc.uc_parser import UCParser
+
+
+def count_children(node):
+    count = 1
+    for _, child in node.children():
+        count += count_children(child)
+    return count
+
+
+class Counter(NodeVisitor):
+    def __init__(self):
+        self.count = 0
+
+    def generic_visit(self, node):
+        self.count += 1
+
+
+class IDCounter(NodeVisitor):
+    def __init__(self):
+        self.count = 0
+
+    def visit_ID(self, node):
+        self.count += 1
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--nodes", type=int, default=1_000_000)
+    argparser.add_argument("--repeat", type=int, default=3)
+    args = argparser.parse_args()
+
+    ast = UCParser().parse(program(1 << 18))
+    copies = -(-args.nodes // count_children(ast))
+    tree = Program(ast.gdecls * copies)
+    nodes = count_children(tree)
+
+    def visit(visitor_class):
+        visitor = visitor_class()
+        visitor.visit(tree)
+        return visitor.count
+
+    assert visit(Counter) == nodes
+    times = [
+        ("children()", best_of(lambda: count_children(tree), args.repeat)),
+        ("NodeVisitor", best_of(lambda: visit(Counter), args.repeat)),
+        ("visit_ID only", best_of(lambda: visit(IDCounter), args.repeat)),
+    ]
+    print("%d nodes" % nodes)
+    for name, seconds in times:
+        print("%-14s %7.3fs  %6.2f M nodes/s" % (name, seconds, nodes / seconds / 1e6))
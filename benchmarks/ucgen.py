@@ -0,0 +1,67 @@
+"""Generators of synthetic uC sources used by the benchmarks."""
+
+import time
+
+
+def long_line(nbytes):
+    """A single line holding roughly nbytes of global declarations."""
+    chunk = "int g%d = %d; "
+    parts = []
+    size = 0
+    i = 0
+    while size < nbytes:
+        part = chunk % (i, i)
+        parts.append(part)
+        size += len(part)
+        i += 1
+    return "".join(parts) + "\n"
+
+
+def many_lines(nlines):
+    """nlines short lines of global declarations."""
+    return "".join("int g%d = %d;\n" % (i, i) for i in range(nlines))
+
+
+def function(i):
+    """A small function definition exercising most statements."""
+    return (
+        "int f%d() {\n"
+        "    int a = %d;\n"
+        "    char s[] = \"f%d\";\n"
+        "    if (a) {\n"
+        "        print(s);\n"
+        "    } else {\n"
+        "        a = 'x';\n"
+        "    }\n"
+        "    while (a) {\n"
+        "        read(a);\n"
+        "        break;\n"
+        "    }\n"
+        "    return a;\n"
+        "}\n" % (i, i, i)
+    )
+
+
+def program(nbytes):
+    """Globals and functions adding up to roughly nbytes."""
+    parts = []
+    size = 0
+    i = 0
+    while size < nbytes:
+        part = "int g%d = %d;\n" % (i, i) + function(i)
+        parts.append(part)
+        size += len(part)
+        i += 1
+    return "".join(parts)
+
+
+def best_of(func, repeat=3):
+    """Best wall clock time, in seconds, of calling func repeat times."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
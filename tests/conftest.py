@@ -0,0 +1,20 @@
+import os
+import shutil
+import tempfile
+
+
+def pytest_configure(config):
+    """Keep the lexer and parser tables the tests generate, collection
+    included, out of the user's cache directory. Processes started by
+    the tests inherit it."""
+    config.uc_cache_dir = tempfile.mkdtemp(prefix="uc-cache-")
+    config.uc_saved_cache_dir = os.environ.get("UC_CACHE_DIR")
+    os.environ["UC_CACHE_DIR"] = config.uc_cache_dir
+
+
+def pytest_unconfigure(config):
+    if config.uc_saved_cache_dir is None:
+        os.environ.pop("UC_CACHE_DIR", None)
+    else:
+        os.environ["UC_CACHE_DIR"] = config.uc_saved_cache_dir
+    shutil.rmtree(config.uc_cache_dir, ignore_errors=True)
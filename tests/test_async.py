@@ -0,0 +1,68 @@
+import asyncio
+import io
+from pathlib import Path
+import pytest
+from uc.uc_async import AsyncUCParser
+from uc.uc_parser import ParseError, UCParser
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+BIG = "int f() {" + "a = 1;" * 20000 + "}"
+
+
+def dump(program):
+    buf = io.StringIO()
+    program.show(buf=buf, showcoord=True)
+    return buf.getvalue()
+
+
+def test_async_parse():
+    async def main():
+        async with AsyncUCParser(jobs=2) as parser:
+            names = ["t01", "t05", "t19", "t24", "t30"]
+            programs = await asyncio.gather(
+                *(parser.parse((IN_OUT / (n + ".in")).read_text()) for n in names)
+            )
+            with pytest.raises(ParseError) as e:
+                await parser.parse((IN_OUT / "t10.in").read_text())
+            return names, programs, e.value, parser.metrics()
+
+    names, programs, error, metrics = asyncio.run(main())
+    for name, program in zip(names, programs):
+        assert dump(program) == (IN_OUT / (name + ".out")).read_text()
+    assert str(error.diagnostics[0]) + "\n" == (IN_OUT / "t10.out").read_text()
+    assert (metrics.completed, metrics.failed, metrics.cancelled) == (5, 1, 0)
+    assert (metrics.queued, metrics.running) == (0, 0)
+    assert len(metrics.latencies) == 6
+    assert metrics.percentile(50) <= metrics.percentile(100) == max(metrics.latencies)
+
+
+def test_async_deep_tree():
+    text = "int f(int a) {\n" + "if (a) a = 1; else " * 400 + "a = 2;\n}\n"
+
+    async def main():
+        async with AsyncUCParser(jobs=1) as parser:
+            return await parser.parse(text)
+
+    assert dump(asyncio.run(main())) == dump(UCParser().parse(text))
+
+
+def test_async_backpressure_and_cancel():
+    async def main():
+        async with AsyncUCParser(jobs=1) as parser:
+            running = asyncio.ensure_future(parser.parse(BIG))
+            waiting = [asyncio.ensure_future(parser.parse("int a;")) for _ in range(3)]
+            await asyncio.sleep(0.1)
+            # only one text goes to the single worker at a time
+            metrics = parser.metrics()
+            assert (metrics.running, metrics.queued) == (1, 3)
+            waiting[0].cancel()
+            running.cancel()
+            await asyncio.gather(running, *waiting, return_exceptions=True)
+            assert running.cancelled() and waiting[0].cancelled()
+            assert all(w.result() is not None for w in waiting[1:])
+            return parser.metrics()
+
+    metrics = asyncio.run(main())
+    assert (metrics.completed, metrics.cancelled) == (2, 2)
+    assert (metrics.queued, metrics.running) == (0, 0)
@@ -0,0 +1,46 @@
+import shutil
+from pathlib import Path
+import pytest
+from uc import uc_batch
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_batch(jobs, tmp_path):
+    # files with errors must not stop the batch
+    names = ["t01", "t10", "t22", "t25", "t31"]
+    src = tmp_path / "src"
+    src.mkdir()
+    for name in names:
+        shutil.copy(IN_OUT / (name + ".in"), src / (name + ".uc"))
+    paths = uc_batch.collect_files([str(src)])
+    assert [p.stem for p in paths] == names
+    outputs = uc_batch.output_paths(paths, tmp_path / "out")
+    result = uc_batch.parse_batch(paths, outputs, jobs=jobs)
+
+    assert result.files == len(names)
+    failed = [Path(path).stem for path, _ in result.failures]
+    assert failed == ["t10", "t22", "t25", "t31"]
+    for name in names:
+        dump = (tmp_path / "out" / (name + ".ast")).read_text()
+        assert dump == (IN_OUT / (name + ".out")).read_text()
+    assert "5 files, 4 failed" in result.summary()
+
+
+def test_parse_to_file_streams(tmp_path, monkeypatch):
+    files = []
+
+    def write_ast(ast, file, output_format):
+        files.append(file)
+        file.write("partial")
+        raise ValueError("Unknown output format %r" % output_format)
+
+    monkeypatch.setattr(uc_batch, "write_ast", write_ast)
+    output = tmp_path / "t01.ast"
+    error = uc_batch.parse_to_file(
+        uc_batch.UCParser(), IN_OUT / "t01.in", output, "xml"
+    )
+    assert error == "ValueError: Unknown output format 'xml'"
+    assert [file.name for file in files] == [str(output)]
+    assert output.read_text() == "partial"
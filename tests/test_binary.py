@@ -0,0 +1,96 @@
+import io
+import struct
+from pathlib import Path
+import pytest
+from uc.uc_ast import FuncDef, ast_equal, lazy_bodies, node_attrs
+from uc.uc_binary import MAGIC, ASTReader, dump, dumps, loads
+from uc.uc_parser import UCParser
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+
+def show(node):
+    buf = io.StringIO()
+    node.show(buf=buf, showcoord=True)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize(
+    "input_path", sorted(IN_OUT.glob("*.in")), ids=lambda path: path.stem
+)
+def test_binary_round_trip(input_path):
+    text = input_path.read_text()
+    parser = UCParser(errors="collect")
+    program = parser.parse(text)
+    if program is None:
+        return
+    back = loads(dumps(program))
+    assert ast_equal(back, program)
+    assert show(back) == show(program)
+    assert repr(back) == repr(program)
+    if not parser.diagnostics:
+        # the coords of lazily parsed bodies use shifted line indexes
+        program = parser.parse(text, lazy=True)
+        assert show(loads(dumps(program))) == show(program)
+
+
+def test_binary_lazy(tmp_path):
+    text = "int g = 1;\nint f(int a) {\n  return a + g;\n}\nvoid main() {\n  f(2);\n}\n"
+    program = UCParser().parse(text)
+    path = tmp_path / "ast.bin"
+    with open(path, "wb") as f:
+        dump(program, f)
+    with ASTReader(path) as reader:
+        assert reader.function_names() == ["f", "main"]
+        root = reader.root()
+        funcdefs = root.gdecls[1:]
+        assert all(isinstance(funcdef, FuncDef) for funcdef in funcdefs)
+        assert all(funcdef in lazy_bodies for funcdef in funcdefs)
+        assert "body" not in dict(node_attrs(funcdefs[0]))
+        assert ast_equal(funcdefs[0].body, program.gdecls[1].body)
+        assert funcdefs[1] in lazy_bodies
+        main = reader.function("main")
+        assert ast_equal(main, program.gdecls[2])
+        assert str(main.body.citens[0].coord) == "@ 6:3"
+    decl = root.gdecls[0].decls[0]
+    assert decl.name is decl.type.declname
+
+
+def test_binary_errors():
+    data = dumps(UCParser().parse("int x;"))
+    with pytest.raises(ValueError, match="Not a uC AST file"):
+        loads(b"PICKLE" + data[6:])
+    version = struct.pack("<H", 99)
+    with pytest.raises(ValueError, match="version 99"):
+        loads(MAGIC + version + data[8:])
+    with pytest.raises(KeyError):
+        ASTReader(data).function("main")
+
+
+def test_binary_corrupt():
+    text = "int g[2] = {1, 2};\nint f(int a) {\n  return a + g[1];\n}\n"
+    data = dumps(UCParser().parse(text))
+    for size in range(len(data)):
+        with pytest.raises(ValueError):
+            show(loads(data[:size]))
+    for i in range(len(data)):
+        corrupt = bytearray(data)
+        corrupt[i] ^= 0xFF
+        # decodes every section, to a tree that may be wrong but not walked
+        try:
+            reader = ASTReader(corrupt)
+            reader.root()
+            for index in range(reader.nfunctions):
+                reader.function(index).body
+        except ValueError:
+            pass
+
+
+def test_binary_list_values():
+    program = UCParser().parse("int g[2] = {1, 2};")
+    init = program.gdecls[0].decls[0].init
+    init.value = [1, -2, "a", None, [init.exprs[0]], []]
+    back = loads(dumps(program))
+    value = back.gdecls[0].decls[0].init.value
+    assert value[:4] == [1, -2, "a", None] and value[5] == []
+    assert ast_equal(value[4][0], init.exprs[0])
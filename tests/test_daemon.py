@@ -0,0 +1,99 @@
+import io
+import json
+import threading
+from pathlib import Path
+import pytest
+from uc.uc_client import Client
+from uc.uc_daemon import DaemonServer, WorkerPool, _Worker, serve_stream
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = WorkerPool(jobs=2, timeout=5)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def client(pool, tmp_path):
+    path = str(tmp_path / "daemon.sock")
+    server = DaemonServer(path, pool)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    with Client(path) as client:
+        yield client
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_daemon_dump(client):
+    for name in ["t01", "t19", "t24"]:
+        text = (IN_OUT / (name + ".in")).read_text()
+        response = client.call(id=name, op="dump", text=text)
+        assert response["id"] == name
+        assert response["dump"] == (IN_OUT / (name + ".out")).read_text()
+    response = client.call(op="parse", path=str(IN_OUT / "t19.in"))
+    assert response == {"ok": True, "diagnostics": []}
+
+
+def test_daemon_errors(client):
+    text = (IN_OUT / "t10.in").read_text()
+    response = client.call(op="dump", text=text)
+    assert "dump" not in response
+    assert response["diagnostics"][0]["text"] + "\n" == (
+        (IN_OUT / "t10.out").read_text()
+    )
+    assert not client.call(op="compile", text=text)["ok"]
+
+
+def test_daemon_timeout(client):
+    text = "int f() {" + "a = 1;" * 100000 + "}"
+    response = client.call(op="parse", text=text, timeout=0.01)
+    assert response == {"ok": False, "error": "Timed out after 0.01s"}
+    # the worker was replaced
+    for _ in range(3):
+        assert client.call(op="parse", text="int a;")["ok"]
+
+
+def test_daemon_bad_timeout(client):
+    for timeout in ["1", None, 0, -1, True, [1]]:
+        response = client.call(op="parse", text="int a;", timeout=timeout)
+        assert response == {"ok": False, "error": "Bad timeout %r" % (timeout,)}
+    # nothing was sent to the workers: every response is the one asked for
+    for name in ["t01", "t19", "t24"]:
+        text = (IN_OUT / (name + ".in")).read_text()
+        response = client.call(id=name, op="dump", text=text)
+        assert response["id"] == name
+        assert response["dump"] == (IN_OUT / (name + ".out")).read_text()
+
+
+def test_worker_replaced_on_error(monkeypatch):
+    def call(self, request, timeout):
+        # the response is left in the pipe
+        self.conn.send(request)
+        raise RuntimeError("connection lost")
+
+    pool = WorkerPool(jobs=1, timeout=5)
+    try:
+        with monkeypatch.context() as m:
+            m.setattr(_Worker, "call", call)
+            response = pool.submit({"op": "dump", "text": "int a;"})
+        assert response == {"ok": False, "error": "RuntimeError: connection lost"}
+        text = (IN_OUT / "t19.in").read_text()
+        response = pool.submit({"op": "dump", "text": text})
+        assert response["dump"] == (IN_OUT / "t19.out").read_text()
+    finally:
+        pool.close()
+
+
+def test_serve_stream(pool):
+    requests = [{"id": i, "text": "int a%d;" % i} for i in range(5)]
+    infile = io.StringIO("".join(json.dumps(r) + "\n" for r in requests) + "{\n")
+    outfile = io.StringIO()
+    serve_stream(pool, infile, outfile)
+    responses = [json.loads(line) for line in outfile.getvalue().splitlines()]
+    assert sorted(r["id"] for r in responses if r["ok"]) == list(range(5))
+    assert sum(not r["ok"] for r in responses) == 1
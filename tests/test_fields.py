@@ -0,0 +1,75 @@
+from pathlib import Path
+import pytest
+from uc.uc_ast import (
+    ATTR,
+    CHILD,
+    ID,
+    ArrayRef,
+    BinaryOp,
+    Constant,
+    Node,
+    Read,
+    WeakIdentityMap,
+    ast_equal,
+)
+from uc.uc_parser import UCParser
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+
+@pytest.mark.parametrize(
+    "input_path", sorted(IN_OUT.glob("*.in")), ids=lambda path: path.stem
+)
+def test_iter_children(input_path):
+    program = UCParser(errors="collect").parse(input_path.read_text())
+    if program is None:
+        return
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        children = node.children()
+        assert tuple(node.iter_children()) == children
+        stack.extend(child for _, child in children)
+
+
+def test_fields_spec():
+    assert BinaryOp.fields == {"op": ATTR, "left": CHILD, "right": CHILD}
+    assert BinaryOp.__slots__ == ("op", "left", "right")
+    assert BinaryOp.attr_names == ("op",)
+    assert BinaryOp.child_names == ("left", "right")
+    assert Read.fields == {"names": CHILD}
+    node = ArrayRef(ID("v"), Constant("int", "0"), coord=None)
+    assert [name for name, _ in node.children()] == ["name", "subscript"]
+    assert isinstance(node, Node) and node.coord is None
+
+
+def test_ast_equal():
+    text = "int f(int a) { int v[2] = {1, 2}; return v[a] + 1; }"
+    program = UCParser().parse(text)
+    # coords are not compared
+    other = UCParser().parse("\n\n" + text.replace(" ", "  "))
+    assert ast_equal(program, other)
+    assert ast_equal(program.gdecls, other.gdecls)
+    other.gdecls[0].body.citens[1].expr.right.value = "2"
+    assert not ast_equal(program, other)
+    assert not ast_equal(ID("a"), Constant("int", "a"))
+    assert not ast_equal(ID("a"), "a")
+    # nodes themselves compare and hash by identity
+    a = ID("a")
+    assert a == a and a != ID("a")
+    assert {a: 1}[a] == 1 and ID("a") not in {a}
+
+
+def test_ast_equal_deep_tree():
+    text = "int f(int a) { return " + "-" * 5000 + "a; }"
+    assert ast_equal(UCParser().parse(text), UCParser().parse(text))
+
+
+def test_weak_identity_map():
+    bodies = WeakIdentityMap()
+    a, b = ID("a"), ID("a")
+    bodies[a] = 1
+    assert a in bodies and b not in bodies
+    assert bodies.get(b) is None and bodies[a] == 1
+    del a
+    assert len(bodies) == 0
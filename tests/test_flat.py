@@ -0,0 +1,120 @@
+import io
+from pathlib import Path
+import pytest
+from uc.uc_ast import (
+    ID,
+    Coord,
+    Decl,
+    ExprList,
+    GlobalDecl,
+    Program,
+    ast_equal,
+)
+from uc.uc_flat import FlatAST
+from uc.uc_lexer import LineIndex
+from uc.uc_parser import UCParser
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+
+def show(node):
+    buf = io.StringIO()
+    node.show(buf=buf, showcoord=True)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize(
+    "input_path", sorted(IN_OUT.glob("*.in")), ids=lambda path: path.stem
+)
+def test_flat_round_trip(input_path):
+    program = UCParser(errors="collect").parse(input_path.read_text())
+    if program is None:
+        return
+    flat = FlatAST.from_tree(program)
+    tree = flat.to_tree()
+    assert ast_equal(tree, program)
+    assert show(tree) == show(program)
+    assert repr(tree) == repr(program)
+    # the nodes of the tree, in preorder
+    nodes = []
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed([child for _, child in node.children()]))
+    assert len(flat) == len(nodes)
+    assert [flat.cursor(i).kind for i in range(len(flat))] == [
+        type(node).__name__ for node in nodes
+    ]
+
+
+def test_flat_cursor():
+    text = "int f(int a) {\n  int v[2] = {1, 2};\n  return v[a] + 1;\n}\n"
+    program = UCParser().parse(text)
+    flat = FlatAST.from_tree(program)
+    cursor = flat.cursor()
+    assert cursor.kind == "Program" and cursor.name is None
+    assert cursor.goto_first_child() and cursor.kind == "FuncDef"
+    assert cursor.name == "gdecls[0]" and not cursor.goto_next_sibling()
+    assert [child.field for child in cursor.children()] == ["type", "decl", "body"]
+    body = list(cursor.children())[2]
+    statements = list(body.children())
+    assert [child.name for child in statements] == ["citens[0]", "citens[1]"]
+    ret = statements[1]
+    assert str(ret.coord) == "@ 3:3"
+    assert ast_equal(ret.to_node(), program.gdecls[0].body.citens[1])
+    assert len(ret.descendants()) == 6
+    assert ret.goto_parent() and ret == body
+    # Decl.name and VarDecl.declname hold the same ID
+    decl = statements[0]
+    assert decl.value("name").value("name") == "v"
+    array_decl = list(decl.children())[0]
+    assert array_decl.goto_first_child() and array_decl.kind == "VarDecl"
+    assert decl.value("name") == array_decl.value("declname")
+    assert [c.value("name") for c in flat.find("ID")] == ["v", "a"]
+    assert [c.name for c in flat.find("Constant", value="2")] == ["dim", "exprs[1]"]
+    assert next(flat.find("BinaryOp")).attrs() == [("op", "+")]
+    tree = flat.to_tree()
+    decl = tree.gdecls[0].body.citens[0]
+    assert decl.name is decl.type.type.declname
+    assert isinstance(tree.gdecls[0].decl.name, ID)
+    with pytest.raises(ValueError):
+        list(flat.find("Node"))
+
+
+def test_flat_subtree():
+    text = "int g = 1;\nint f(int a) {\n  int v = a;\n  return v;\n}\nint h;\n"
+    program = UCParser().parse(text)
+    flat = FlatAST.from_tree(program)
+    f = next(flat.find("FuncDef"))
+    # the held nodes built are those of the subtree: the IDs naming the
+    # Decls of f, not those of g or h
+    held = flat._held_by(f.index) - {f.index}
+    assert held and all(i >= len(flat) for i in held)
+    assert [flat.cursor(i).value("name") for i in sorted(held)] == ["f", "a", "v"]
+    assert ast_equal(f.to_node(), program.gdecls[1])
+    for i in held:
+        assert flat.subtree_end(i) == i + 1
+        assert flat.to_tree(i).name == flat.cursor(i).value("name")
+
+
+def test_flat_held_by_held_node():
+    # x is held by the first Decl, then by the Decl held by the second
+    x = ID("x")
+    first = Decl(x, None, None)
+    second = Decl(Decl(x, None, None), None, None)
+    tree = FlatAST.from_tree(Program([GlobalDecl([first, second])])).to_tree()
+    first, second = tree.gdecls[0].decls
+    assert first.name.name == "x" and second.name.name is first.name
+
+
+def test_flat_many_line_indexes():
+    # as many line indexes as regions parsed on their own
+    lines = LineIndex("a\nb\n")
+    count = 70000
+    exprs = [ID("x", Coord(2, lines.shifted(i))) for i in range(count)]
+    flat = FlatAST.from_tree(ExprList(exprs))
+    assert len(flat.lines) == count
+    tree = flat.to_tree()
+    coords = [str(tree.exprs[i].coord) for i in (0, count - 1)]
+    assert coords == ["@ 2:1", "@ %d:1" % (count + 1)]
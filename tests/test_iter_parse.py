@@ -0,0 +1,70 @@
+import contextlib
+import gc
+import io
+import weakref
+from pathlib import Path
+import pytest
+from uc.uc_ast import Program
+from uc.uc_parser import UCParser
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+
+def show(ast):
+    buf = io.StringIO()
+    ast.show(buf=buf, showcoord=True)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    """The in-out inputs without syntax errors, one after the other."""
+    p = UCParser()
+    texts = []
+    for path in sorted(IN_OUT.glob("*.in")):
+        text = path.read_text()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                p.parse(text)
+        except SystemExit:
+            continue
+        texts.append(text)
+    # some declarations share their line with the end of the previous one
+    return " ".join(texts)
+
+
+@pytest.mark.parametrize("chunk_size", [None, 1, 3, 64, 4096])
+def test_iter_parse(corpus, chunk_size):
+    p = UCParser()
+    source = corpus if chunk_size is None else io.StringIO(corpus)
+    gdecls = list(p.iter_parse(source, chunk_size=chunk_size or 1 << 16))
+    assert show(Program(gdecls)) == show(p.parse(corpus))
+
+
+def test_iter_parse_releases(corpus):
+    p = UCParser()
+    refs = []
+    for gdecl in p.iter_parse(io.StringIO(corpus), chunk_size=256):
+        refs.append(weakref.ref(gdecl))
+    del gdecl
+    gc.collect()
+    assert refs and all(ref() is None for ref in refs)
+
+
+def test_iter_parse_error(capsys):
+    p = UCParser()
+    declarations = p.iter_parse("int a;\nint b = ;\n")
+    assert next(declarations).decls[0].name.name == "a"
+    with pytest.raises(SystemExit):
+        next(declarations)
+    assert capsys.readouterr().out == "ParserError: Before ; @ 2:9\n"
+
+
+def test_iter_parse_one_line():
+    # the regions of a line start at its columns, without padding them
+    text = "int f(int a) { return a + 1; } int g; " * 300
+    p = UCParser()
+    assert show(Program(list(p.iter_parse(text)))) == show(p.parse(text))
+    assert show(p.reparse(p.parse(text), "int h; " + text)) == show(
+        p.parse("int h; " + text)
+    )
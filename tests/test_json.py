@@ -0,0 +1,75 @@
+import io
+import json
+from pathlib import Path
+import pytest
+from uc import uc_batch
+from uc.uc_ast import DATA
+from uc.uc_json import to_json, write_json, write_ndjson
+from uc.uc_parser import UCParser
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+
+def as_dict(node):
+    """What the JSON of node should load as, built by recursion."""
+    if node is None:
+        return None
+    if isinstance(node, list):
+        return [as_dict(item) for item in node]
+    if isinstance(node, str):
+        return node
+    coord = node.coord
+    result = {
+        "_nodetype": type(node).__name__,
+        "coord": coord and {"line": coord.line, "column": coord.column},
+    }
+    for name, kind in node.fields.items():
+        if kind != DATA:
+            result[name] = as_dict(getattr(node, name))
+    return result
+
+
+@pytest.mark.parametrize(
+    "input_path", sorted(IN_OUT.glob("*.in")), ids=lambda path: path.stem
+)
+def test_json(input_path):
+    program = UCParser(errors="collect").parse(input_path.read_text())
+    if program is None:
+        return
+    assert json.loads(to_json(program)) == as_dict(program)
+    buf = io.StringIO()
+    write_ndjson(program, buf)
+    lines = buf.getvalue().splitlines()
+    assert [json.loads(line) for line in lines] == as_dict(program.gdecls or [])
+
+
+class Chunks:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+
+
+def test_json_streaming():
+    depth = 5000
+    text = "int f(int a) { return " + "-" * depth + "a; }"
+    out = Chunks()
+    write_json(UCParser().parse(text), out, showcoord=False)
+    assert len(out.chunks) > 1
+    # too deep for json.loads
+    assert "".join(out.chunks).count('"UnaryOp"') == depth
+    out = Chunks()
+    write_json(UCParser().parse("int f(int a) { return --a; }"), out)
+    expr = json.loads("".join(out.chunks))["gdecls"][0]["body"]["citens"][0]["expr"]
+    assert expr["_nodetype"] == "UnaryOp" and expr["op"] == "-"
+    assert expr["coord"] == {"line": 1, "column": 25}
+
+
+def test_batch_json(tmp_path):
+    paths = [IN_OUT / "t01.in", IN_OUT / "t10.in"]
+    outputs = uc_batch.output_paths(paths, tmp_path, ".json")
+    result = uc_batch.parse_batch(paths, outputs, jobs=1, output_format="json")
+    assert len(result.failures) == 1
+    program = UCParser().parse((IN_OUT / "t01.in").read_text())
+    assert json.loads((tmp_path / "t01.json").read_text()) == as_dict(program)
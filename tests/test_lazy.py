@@ -0,0 +1,53 @@
+import contextlib
+import io
+import pickle
+from pathlib import Path
+import pytest
+from uc.uc_ast import FuncDef, node_attrs
+from uc.uc_parser import UCParser
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+
+def show(ast):
+    buf = io.StringIO()
+    ast.show(buf=buf, showcoord=True)
+    return buf.getvalue()
+
+
+def valid_inputs():
+    p = UCParser()
+    for path in sorted(IN_OUT.glob("*.in")):
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                p.parse(path.read_text())
+        except SystemExit:
+            continue
+        yield path.stem
+
+
+@pytest.mark.parametrize("test_name", list(valid_inputs()))
+def test_lazy(test_name):
+    p = UCParser()
+    text = (IN_OUT / (test_name + ".in")).read_text()
+    expect = (IN_OUT / (test_name + ".out")).read_text()
+    program = p.parse(text, lazy=True)
+    funcdefs = [g for g in program.gdecls if isinstance(g, FuncDef)]
+    assert all("body" not in dict(node_attrs(f)) for f in funcdefs)
+    assert show(pickle.loads(pickle.dumps(program))) == expect
+    assert show(program) == expect
+
+
+def test_lazy_reparse():
+    p = UCParser()
+    text = "".join((IN_OUT / name).read_text() for name in ["t19.in", "t24.in"])
+    edited = "\n\n" + text
+    program = p.reparse(p.parse(text, lazy=True), edited)
+    # the bodies parsed after their functions moved are where they moved
+    assert show(program) == show(p.parse(edited))
+
+
+def test_lazy_one_line():
+    text = "int f(int a) { return a + 1; } int g; " * 300
+    p = UCParser()
+    assert show(p.parse(text, lazy=True)) == show(p.parse(text))
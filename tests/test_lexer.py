@@ -0,0 +1,166 @@
+import io
+from array import array
+from pathlib import Path
+import pytest
+from ply import lex
+from uc.uc_lexer import LineIndex, UCLexer
+
+IN_OUT = Path(__file__).parent.absolute() / Path("in-out")
+
+EDGE_CASES = [
+    'a >= b; a>b; a > = b; if (a==b) c = "int"; "a\\"b"',
+    "x = 1; /* a\n comment */ @ y; // trailing",
+    "L'a' '\\n' $\n/* unterminated\n comment",
+    'int s = "a string\nacross lines"; identifier_longer_than_a_chunk == 12345;',
+    'x = "never closed;\ny = 1;',
+    "x >",
+    " \t ",
+]
+
+
+def scan_tokens(engine, text):
+    errors = []
+    lexer = UCLexer(lambda msg, line, column: errors.append((msg, line, column)))
+    lexer.build(engine=engine)
+    lexer.input(text)
+    tokens = []
+    tok = lexer.token()
+    while tok:
+        tokens.append((tok.type, tok.value, tok.lineno, tok.lexpos))
+        tok = lexer.token()
+    return tokens, errors
+
+
+@pytest.mark.parametrize(
+    "input_path", sorted(IN_OUT.glob("*.in")), ids=lambda path: path.stem
+)
+def test_regex_engine_matches_ply(input_path):
+    text = input_path.read_text()
+    assert scan_tokens("regex", text) == scan_tokens("ply", text)
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_regex_engine_matches_ply_on_edge_cases(text):
+    assert scan_tokens("regex", text) == scan_tokens("ply", text)
+
+
+@pytest.mark.parametrize(
+    "input_path", sorted(IN_OUT.glob("*.in")), ids=lambda path: path.stem
+)
+def test_token_buffer_round_trip(input_path):
+    text = input_path.read_text()
+    lexer = UCLexer(lambda msg, line, column: None)
+    lexer.build()
+    buf = lexer.tokenize_all(text)
+    tokens = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in buf]
+    assert len(buf) == len(tokens)
+    assert tokens == scan_tokens("ply", text)[0]
+
+    stream = buf.stream()
+    stream.input(text)
+    streamed = [(tok.type, tok.lexpos) for tok in iter(stream.token, None)]
+    assert streamed == [(type, lexpos) for type, _, _, lexpos in tokens]
+
+
+def stream_tokens(path, use_mmap, chunk_size, keep_lines=True):
+    errors = []
+    lexer = UCLexer(lambda msg, line, column: errors.append((msg, line, column)))
+    lexer.build(engine="regex")
+    lexer.input_file(
+        path, use_mmap=use_mmap, chunk_size=chunk_size, keep_lines=keep_lines
+    )
+    tokens = []
+    tok = lexer.token()
+    while tok:
+        tokens.append((tok.type, tok.value, tok.lineno, tok.lexpos))
+        tok = lexer.token()
+    return tokens, errors, list(lexer.lines.starts)
+
+
+@pytest.mark.parametrize("use_mmap", [False, True], ids=["chunked", "mmap"])
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 64])
+def test_streamed_input_matches_ply(tmp_path, use_mmap, chunk_size):
+    texts = [path.read_text() for path in sorted(IN_OUT.glob("*.in"))]
+    for i, text in enumerate(texts + EDGE_CASES):
+        path = tmp_path / ("input%d.uc" % i)
+        path.write_text(text)
+        expected = scan_tokens("ply", text) + (LineIndex(text).starts,)
+        assert stream_tokens(path, use_mmap, chunk_size) == expected, text
+        # the lexer errors are located from the lines of the window
+        streamed = stream_tokens(path, use_mmap, chunk_size, keep_lines=False)
+        assert streamed[:2] == expected[:2], text
+
+
+def test_streamed_lines_bounded(tmp_path):
+    text = "int f(int a) {\n  return a + 1;\n}\n" * 20000
+    path = tmp_path / "input.uc"
+    path.write_text(text)
+    whole = LineIndex(text)
+    lexer = UCLexer(lambda msg, line, column: None)
+    lexer.build(engine="regex")
+    lexer.input_file(path, chunk_size=256)
+    indexed = 0
+    for tok in iter(lexer.token, None):
+        indexed = max(indexed, len(lexer.lines.starts))
+        assert lexer.find_tok_column(tok) == whole.column(tok.lexpos)
+    # the lines of a window of two chunks or so, not the 60000 of the file
+    assert indexed < 100
+
+    lexer.input_file(path, chunk_size=256, keep_lines=True)
+    list(iter(lexer.token, None))
+    assert lexer.lines.starts == array("q", whole.starts)
+
+
+@pytest.mark.parametrize("engine", ["ply", "regex"])
+def test_token_after_eof(tmp_path, engine):
+    lexer = UCLexer(lambda msg, line, column: None)
+    lexer.build(engine=engine)
+    lexer.input("x = 1;")
+    assert len(list(iter(lexer.token, None))) == 4
+    assert lexer.token() is None
+    assert lexer.token() is None
+    if engine == "regex":
+        path = tmp_path / "input.uc"
+        path.write_text("x = 1;")
+        lexer.input_file(path, chunk_size=2)
+        assert len(list(iter(lexer.token, None))) == 4
+        assert lexer.token() is None
+
+
+class CountingReader(io.StringIO):
+    reads = 0
+
+    def read(self, size):
+        self.reads += 1
+        return super().read(size)
+
+
+def test_streamed_long_token():
+    literal = '"' + "a" * 100000 + '"'
+    lexer = UCLexer(lambda msg, line, column: None)
+    lexer.build(engine="regex")
+    source = CountingReader("x = " + literal + ";")
+    lexer.lexer.input_stream(source, lexer.lines, 1)
+    values = [tok.value for tok in iter(lexer.token, None)]
+    assert values == ["x", "=", literal.strip('"'), ";"]
+    # the window doubles instead of growing by a chunk
+    assert source.reads < 40
+
+    lexer.lexer.max_window = 1000
+    lexer.lexer.input_stream(io.StringIO("x = " + literal), lexer.lines, 16)
+    with pytest.raises(lex.LexError, match="longer than 1000"):
+        list(iter(lexer.token, None))
+
+
+def test_cached_build_reuses_its_table(tmp_path):
+    text = "\n".join(EDGE_CASES)
+    expected = scan_tokens("ply", text)
+    for _ in range(2):
+        errors = []
+        lexer = UCLexer(lambda msg, line, column: errors.append((msg, line, column)))
+        lexer.build(cache=True, cache_dir=str(tmp_path))
+        lexer.input(text)
+        tokens = [(t.type, t.value, t.lineno, t.lexpos) for t in iter(lexer.token, None)]
+        assert (tokens, errors) == expected
+    assert len(list(tmp_path.glob("uc_lextab_*.py"))) == 1
+    assert lexer.lexer.lexoptimize
@@ -1,7 +1,13 @@
+import io
+import os
 import sys
 from pathlib import Path
 import pytest
-from uc.uc_parser import UCParser
+from uc import uc_cache
+from uc.uc_lexer import UCLexer
+from uc.uc_parser import ParseError, UCParser
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
 
 
 def resolve_test_files(test_name):
@@ -94,3 +100,262 @@ def test_parser_error(test_name, capsys):
         expect = f_ex.read()
         assert captured.out == expect
         assert captured.err == ""
+
+
+def show(ast):
+    buf = io.StringIO()
+    ast.show(buf=buf, showcoord=True)
+    return buf.getvalue()
+
+
+ALL_TESTS = sorted(path.stem for path in IN_OUT.glob("*.in"))
+
+
+def parser_output(parse, capsys):
+    """What the command line tool prints for the program parse()
+    returns, or for the error it exits on."""
+    try:
+        ast = parse()
+    except SystemExit as e:
+        assert e.code == 1
+    else:
+        ast.show(buf=sys.stdout, showcoord=True)
+    captured = capsys.readouterr()
+    assert captured.err == ""
+    return captured.out
+
+
+@pytest.mark.parametrize("engine", ["ply", "regex"])
+@pytest.mark.parametrize("test_name", ALL_TESTS)
+def test_parser_lexer_argument(test_name, engine, capsys):
+    input_path, expected_path = resolve_test_files(test_name)
+    p = UCParser()
+    lexer = UCLexer(p._lexer_error)
+    lexer.build(engine=engine)
+    output = parser_output(lambda: p.parse(input_path.read_text(), lexer=lexer), capsys)
+    assert output == expected_path.read_text()
+
+
+@pytest.mark.parametrize("test_name", ALL_TESTS)
+def test_parser_token_stream(test_name, capsys):
+    input_path, expected_path = resolve_test_files(test_name)
+    p = UCParser()
+    lexer = UCLexer(p._lexer_error)
+    lexer.build()
+
+    def parse():
+        text = input_path.read_text()
+        return p.parse(text, lexer=lexer.tokenize_all(text).stream())
+
+    assert parser_output(parse, capsys) == expected_path.read_text()
+
+
+@pytest.mark.parametrize("test_name", ALL_TESTS)
+def test_parser_regex_engine(test_name, capsys):
+    input_path, expected_path = resolve_test_files(test_name)
+    p = UCParser(lexer_engine="regex")
+    output = parser_output(lambda: p.parse(input_path.read_text()), capsys)
+    assert output == expected_path.read_text()
+
+
+@pytest.mark.parametrize("use_mmap", [False, True], ids=["chunked", "mmap"])
+@pytest.mark.parametrize("test_name", ALL_TESTS)
+def test_parse_file(test_name, use_mmap, capsys):
+    input_path, expected_path = resolve_test_files(test_name)
+    p = UCParser(lexer_engine="regex")
+    # small chunks put tokens across their boundaries
+    output = parser_output(
+        lambda: p.parse_file(input_path, use_mmap=use_mmap, chunk_size=16), capsys
+    )
+    assert output == expected_path.read_text()
+
+
+class EditedParser(UCParser):
+    def p_unary_operator(self, p):
+        """unary_operator : NOT
+                          | MINUS
+                          | PLUS
+        """
+        p[0] = p[1]
+
+
+def test_parser_tables_cache(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    monkeypatch.chdir(work_dir)
+    # tables of an earlier version of the grammar
+    stale = cache_dir / "uc_parsetab_ucparser_0123456789abcdef.py"
+    stale.write_text("")
+    text = "int main() { return -1 + 2; }"
+    expected = show(UCParser(cache=False).parse(text))
+
+    assert show(UCParser(cache_dir=str(cache_dir)).parse(text)) == expected
+    tables = sorted(cache_dir.glob("uc_parsetab_*.py"))
+    assert len(tables) == 1 and tables != [stale]
+    written = tables[0].stat()
+
+    # loaded, not written again
+    assert show(UCParser(cache_dir=str(cache_dir)).parse(text)) == expected
+    assert tables[0].stat().st_ino == written.st_ino
+
+    # another grammar gets tables of its own
+    assert show(EditedParser(cache_dir=str(cache_dir)).parse(text)) == expected
+    assert len(list(cache_dir.glob("uc_parsetab_editedparser_*.py"))) == 1
+    assert tables[0].exists()
+
+    assert os.listdir(str(work_dir)) == []
+
+
+def test_ast_cache(tmp_path):
+    cache = uc_cache.ASTCache(str(tmp_path))
+    p = UCParser(ast_cache=cache)
+    texts = {}
+    for test_name in ["t19", "t24", "t40"]:
+        input_path, expected_path = resolve_test_files(test_name)
+        texts[test_name] = input_path.read_text()
+        assert show(p.parse(texts[test_name])) == expected_path.read_text()
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    # a new parser finds the ASTs stored by the first one
+    cache = uc_cache.ASTCache(str(tmp_path))
+    p = UCParser(ast_cache=cache)
+    for test_name, text in texts.items():
+        _, expected_path = resolve_test_files(test_name)
+        assert show(p.parse(text)) == expected_path.read_text()
+    assert (cache.hits, cache.misses) == (3, 0)
+
+
+def test_ast_cache_eviction(tmp_path):
+    cache = uc_cache.ASTCache(str(tmp_path))
+    p = UCParser(ast_cache=cache)
+    names = ["t19", "t24", "t40"]
+    texts = [resolve_test_files(name)[0].read_text() for name in names]
+    for i, text in enumerate(texts):
+        p.parse(text)
+        path = os.path.join(str(tmp_path), cache.key(p.version(), text) + ".ast")
+        # distinct modification times, oldest first
+        os.utime(path, (i, i))
+    sizes = sorted(entry.stat().st_size for entry in os.scandir(str(tmp_path)))
+
+    # reading the oldest entry makes it the most recently used
+    p.parse(texts[0])
+    cache.max_bytes = sum(sizes) - 1
+    cache.evict()
+    assert cache.evictions == 1
+    cache.hits = cache.misses = 0
+    p.parse(texts[0])
+    p.parse(texts[2])
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_ast_cache_deep_tree(tmp_path):
+    text = "int f(int a) {\n" + "if (a) a = 1; else " * 400 + "a = 2;\n}\n"
+    expected = show(UCParser().parse(text))
+    cache = uc_cache.ASTCache(str(tmp_path))
+    assert show(UCParser(ast_cache=cache).parse(text)) == expected
+    cache = uc_cache.ASTCache(str(tmp_path))
+    assert show(UCParser(ast_cache=cache).parse(text)) == expected
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_ast_cache_scans_over_budget(tmp_path, monkeypatch):
+    scans = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        scans.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    cache = uc_cache.ASTCache(str(tmp_path))
+    p = UCParser(ast_cache=cache)
+    texts = ["int x%d;" % i for i in range(20)]
+    for text in texts:
+        p.parse(text)
+    # the first put finds out the size of the directory
+    assert len(scans) == 1
+    sizes = [entry.stat().st_size for entry in scandir(str(tmp_path))]
+    assert cache.total == sum(sizes)
+
+    cache.max_bytes = cache.total + sizes[0] // 2
+    p.parse("int y;")
+    assert len(scans) == 2 and cache.evictions == 1
+    assert cache.total <= cache.max_bytes
+
+
+@pytest.mark.parametrize("test_name", ["t10", "t11", "t22", "t25", "t31", "t34"])
+def test_parser_error_collect(test_name, capsys):
+    input_path, expected_path = resolve_test_files(test_name)
+
+    p = UCParser(errors="collect")
+    p.parse(input_path.read_text())
+    # the first error is the one the exiting parser reports
+    assert str(p.diagnostics[0]) + "\n" == expected_path.read_text()
+    assert capsys.readouterr().out == ""
+
+    with pytest.raises(ParseError) as error:
+        UCParser(errors="raise").parse(input_path.read_text())
+    assert list(map(str, error.value.diagnostics)) == list(map(str, p.diagnostics))
+
+
+def test_parser_error_recovery():
+    text = (
+        "int a = ;\n"
+        "int f() {\n"
+        "    int i;\n"
+        "    i = ;\n"
+        "    return i;\n"
+        "}\n"
+        "int b = 3 $ 4;\n"
+        "int g() { return 1 }\n"
+        "int c;\n"
+    )
+    p = UCParser(errors="collect")
+    program = p.parse(text)
+    assert [str(d) for d in p.diagnostics] == [
+        "ParserError: Before ; @ 1:9",
+        "ParserError: Before ; @ 4:9",
+        "LexerError: Illegal character '$' at 7:11",
+        "ParserError: Before 4 @ 7:13",
+        "ParserError: Before } @ 8:20",
+    ]
+    assert [d.token.value for d in p.diagnostics if d.token] == [";", ";", "4", "}"]
+    # what was not in error is kept
+    assert [type(g).__name__ for g in program.gdecls] == [
+        "FuncDef",
+        "FuncDef",
+        "GlobalDecl",
+    ]
+    assert [type(c).__name__ for c in program.gdecls[0].body.citens] == [
+        "Decl",
+        "Return",
+    ]
+
+
+def test_coords_share_line_index():
+    p = UCParser()
+    program = p.parse("int a;\n\nint f() {\n  return 42;\n}\n")
+    ret = program.gdecls[1].body.citens[0]
+    assert (ret.coord.line, ret.coord.column) == (4, 3)
+    assert str(ret.expr.coord) == "@ 4:10"
+    assert ret.coord.offset == 20
+    assert ret.coord.lines is program.gdecls[1].type.coord.lines
+    # nodes hold the parts of their coord, not a Coord object
+    assert ret.coord is not ret.coord and ret.coord == ret.coord
+    ret.coord = None
+    assert ret.coord is None and not hasattr(ret, "__dict__")
+
+
+def test_show_deep_nesting():
+    depth = 2 * sys.getrecursionlimit()
+    chain = "".join("else if (a == %d) a = %d;\n" % (i, i) for i in range(depth))
+    text = "int f(int a) {\nif (a) a = 0;\n" + chain + "return a;\n}\n"
+    program = UCParser().parse(text)
+    buf = io.StringIO()
+    program.show(buf=buf, showcoord=True)
+    lines = buf.getvalue().splitlines()
+    assert sum(line.lstrip().startswith("If:") for line in lines) == depth + 1
+    assert " " * (4 * depth + 12) + "If: @ %d:6" % (depth + 2) in lines
+    assert repr(program).count("If(") == depth + 1
@@ -0,0 +1,134 @@
+import io
+import sys
+from pathlib import Path
+import pytest
+from uc import uc_binary
+from uc.uc_parser import UCParser
+from uc.uc_pratt import UCPrattParser
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+ALL_TESTS = sorted(path.stem for path in IN_OUT.glob("*.in"))
+
+
+def output(parser, text, capsys):
+    """What the command line tool prints for text: the AST with its
+    coords, or the error it exits on."""
+    try:
+        ast = parser.parse(text)
+    except SystemExit as e:
+        assert e.code == 1
+    else:
+        ast.show(buf=sys.stdout, showcoord=True)
+    captured = capsys.readouterr()
+    assert captured.err == ""
+    return captured.out
+
+
+def collect(parser_class, text, **kwargs):
+    """The AST (None or its uc_binary encoding, coords included) and the
+    diagnostics of parsing text without stopping at errors."""
+    parser = parser_class(errors="collect", **kwargs)
+    ast = parser.parse(text)
+    data = None if ast is None else uc_binary.dumps(ast)
+    return data, [str(diagnostic) for diagnostic in parser.diagnostics]
+
+
+@pytest.fixture(scope="module")
+def parsers():
+    return UCParser(), UCPrattParser()
+
+
+@pytest.mark.parametrize("test_name", ALL_TESTS)
+def test_pratt_in_out(test_name, parsers, capsys):
+    text = (IN_OUT / (test_name + ".in")).read_text()
+    lalr, pratt = (output(parser, text, capsys) for parser in parsers)
+    assert pratt == lalr
+    assert pratt == (IN_OUT / (test_name + ".out")).read_text()
+
+
+@pytest.mark.parametrize("test_name", ALL_TESTS)
+def test_pratt_in_out_collect(test_name):
+    text = (IN_OUT / (test_name + ".in")).read_text()
+    assert collect(UCPrattParser, text) == collect(UCParser, text)
+
+
+EXPRESSIONS = [
+    "x = a + b * c - d / e % f;",
+    "x = a || b && c == d != e < f <= g > h >= i;",
+    "x = a - b - c + d * e * f;",
+    "x = -a * !b + +c;",
+    "x = - - -a;",
+    "x = a = b = c + d;",
+    "x = (a, b), c;",
+    "f((a, b), c);",
+    "x = a[i + 1][j](k, l)(m)[n];",
+    "x = f() + g(a = 1, 'c', \"s\");",
+    "(a) = -b[1];",
+    "-a = 1;",
+    "for (i = 0; i < n; i = i + 1) x = x + i;",
+    "if (a) x = 1; x = 2;",
+    "if (a) x = 1; else x = 2; return x * 2;",
+    "while (a < b) { a = a + 1; } assert a == b;",
+    "print(a + 1, b); read(a, b[i]);",
+    # errors
+    "x = a + b = c;",
+    "x = (a + b = c);",
+    "x = a b;",
+    "x = a + ;",
+    "x = f(a,);",
+    "x = a[1;",
+    "x = (a + b;",
+    "x = a + b",
+    "x = a @ b;",
+]
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_pratt_expressions(source):
+    text = "int main() {\n  int x;\n  %s\n  x = x;\n}\n" % source
+    assert collect(UCPrattParser, text) == collect(UCParser, text)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "int a[2 + 3 * n], b[-1];",
+        "int a[n = 3];",
+        "int a[(n, 3)];",
+        "int a = b + 1, c[2] = {1, 2 * 3};",
+        "char s[] = \"s\";",
+    ],
+)
+def test_pratt_declarations(source):
+    assert collect(UCPrattParser, source) == collect(UCParser, source)
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        # iterative in the hand-written parser
+        "-" * 5000 + "a",
+        "1" + " + (a * b[i] - -c)" * 2000,
+        # too deep for the Python stack: parsed by the LALR parser
+        "(" * 3000 + "a" + ")" * 3000,
+        "f(" * 2000 + "a" + ")" * 2000,
+        "a = " * 3000 + "1",
+    ],
+    ids=["unary", "chain", "parentheses", "calls", "assignments"],
+)
+def test_pratt_deep(expression):
+    text = "int main() {\n  x = %s;\n}\n" % expression
+    assert collect(UCPrattParser, text) == collect(UCParser, text)
+
+
+def test_pratt_parse_file(tmp_path):
+    text = (IN_OUT / "t05.in").read_text()
+    path = tmp_path / "t05.uc"
+    path.write_text(text)
+    pratt = UCPrattParser(lexer_engine="regex")
+    ast = pratt.parse_file(path, chunk_size=16)
+    assert uc_binary.dumps(ast) == uc_binary.dumps(UCParser().parse(text))
+    lazy = pratt.parse(text, lazy=True)
+    out = io.StringIO()
+    lazy.show(buf=out, showcoord=True)
+    assert out.getvalue() == (IN_OUT / "t05.out").read_text()
@@ -0,0 +1,49 @@
+import io
+from collections import Counter
+from pathlib import Path
+from uc.uc_ast import lazy_bodies
+from uc.uc_lexer import UCLexer
+from uc.uc_parser import UCParser
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+
+def count_tokens(text):
+    lexer = UCLexer(lambda msg, line, column: None)
+    lexer.build()
+    lexer.input(text)
+    return Counter(tok.type for tok in iter(lexer.token, None))
+
+
+def test_profile_counts():
+    text = (IN_OUT / "t19.in").read_text()
+    parser = UCParser(profile=True)
+    for _ in range(2):
+        program = parser.parse(text)
+    stats = parser.stats
+    buf = io.StringIO()
+    with stats.timer("show"):
+        program.show(buf=buf, showcoord=True)
+    assert buf.getvalue() == (IN_OUT / "t19.out").read_text()
+
+    assert stats.tokens == Counter({k: 2 * v for k, v in count_tokens(text).items()})
+    assert stats.reductions["p_program"] == 2
+    assert stats.reductions["p_function_definition"] == 2
+    assert stats.nodes["Program"] == 2 and stats.nodes["FuncDef"] == 2
+    assert stats.nodes["While"] == 2
+    for phase in ["lex", "actions", "parse", "show"]:
+        assert stats.times[phase] > 0
+    assert stats.times["parse"] > stats.times["lex"] + stats.times["actions"]
+    report = stats.report()
+    assert "p_binary_expression" in report and "BinaryOp" in report
+
+    stats.clear()
+    assert not stats.tokens and not stats.times
+
+
+def test_profile_lazy():
+    parser = UCParser(profile=True)
+    program = parser.parse((IN_OUT / "t19.in").read_text(), lazy=True)
+    # counting the nodes did not parse the body
+    assert program.gdecls[0] in lazy_bodies
+    assert "While" not in parser.stats.nodes
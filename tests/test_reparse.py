@@ -0,0 +1,72 @@
+import contextlib
+import io
+from pathlib import Path
+import pytest
+from uc.uc_parser import UCParser, split_regions
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+
+def show(ast):
+    buf = io.StringIO()
+    ast.show(buf=buf, showcoord=True)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    """The in-out inputs without syntax errors, one after the other."""
+    p = UCParser()
+    texts = []
+    for path in sorted(IN_OUT.glob("*.in")):
+        text = path.read_text()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                p.parse(text)
+        except SystemExit:
+            continue
+        texts.append(text)
+    return "\n".join(texts)
+
+
+def test_split_regions(corpus):
+    p = UCParser()
+    assert len(split_regions(corpus)) == len(p.parse(corpus).gdecls)
+    text = "int v[] = {1, 2}; /* } */ int f() { return '}'; }\n// ;\n"
+    assert [text[s:e] for s, e, _ in split_regions(text)] == [
+        "int v[] = {1, 2};",
+        "int f() { return '}'; }",
+    ]
+    # old style parameter declarations are not split
+    assert split_regions("int f(a) int a; { return a; }") is None
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [
+        # edit within a line
+        ("return 0;", "return 1;"),
+        # more lines: the following declarations move down
+        ("return 0;", "x = 1;\n\n    return 0;"),
+        # fewer lines
+        ("int main() {\n", "int main() {"),
+        # a global declaration removed
+        ("int v[] = {1, 2, 3, 4};\n", ""),
+    ],
+)
+def test_reparse(corpus, old, new):
+    p = UCParser()
+    assert old in corpus
+    edited = corpus.replace(old, new, 1)
+    expect = show(p.parse(edited))
+
+    program = p.parse(corpus)
+    gdecls = list(program.gdecls)
+    reparsed = p.reparse(program, edited)
+    assert show(reparsed) == expect
+    # all but the edited declaration are reused
+    reused = sum(any(g is old for old in gdecls) for g in reparsed.gdecls)
+    assert reused == len(gdecls) - 1
+
+    # and the result can be reparsed in turn
+    assert show(p.reparse(reparsed, corpus)) == show(p.parse(corpus))
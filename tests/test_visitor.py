@@ -0,0 +1,103 @@
+from pathlib import Path
+import pytest
+from uc.uc_ast import ID, Constant, NodeTransformer, NodeVisitor, Return
+from uc.uc_parser import UCParser
+
+IN_OUT = Path(__file__).parent.absolute() / "in-out"
+
+
+def preorder(node):
+    """Nodes below node, by recursing into children()."""
+    nodes = [node]
+    for _, child in node.children():
+        nodes.extend(preorder(child))
+    return nodes
+
+
+class Recorder(NodeVisitor):
+    def __init__(self):
+        self.nodes = []
+
+    def generic_visit(self, node):
+        self.nodes.append(node)
+
+
+class IDCounter(NodeVisitor):
+    def __init__(self):
+        self.count = 0
+        self.others = 0
+
+    def visit_ID(self, node):
+        self.count += 1
+
+    def visit_FuncCall(self, node):
+        # names of the functions called are not counted
+        if node.args is not None:
+            self.visit(node.args)
+        return False
+
+    def generic_visit(self, node):
+        self.others += 1
+
+
+@pytest.mark.parametrize(
+    "input_path", sorted(IN_OUT.glob("*.in")), ids=lambda path: path.stem
+)
+def test_visitor_order(input_path):
+    program = UCParser(errors="collect").parse(input_path.read_text())
+    if program is None:
+        return
+    recorder = Recorder()
+    recorder.visit(program)
+    assert recorder.nodes == preorder(program)
+
+
+def test_visitor_dispatch_and_prune():
+    program = UCParser().parse("int f(int a) { print(a, a + 1); f(a); return a; }")
+    counter = IDCounter()
+    counter.visit(program)
+    assert counter.count == 4
+    # looked up once per class of node, for each class of visitor
+    assert IDCounter._dispatch[ID][0] is IDCounter.visit_ID
+    assert IDCounter._dispatch[Return][0] is IDCounter.generic_visit
+    assert ID not in NodeTransformer._dispatch
+
+
+def test_visitor_deep_tree():
+    depth = 5000
+    text = "int f(int a) { return " + "-" * depth + "a; }"
+    recorder = Recorder()
+    recorder.visit(UCParser().parse(text))
+    assert sum(type(node).__name__ == "UnaryOp" for node in recorder.nodes) == depth
+
+
+class Folder(NodeTransformer):
+    """Folds the sums of constants, drops the returns of constants."""
+
+    def visit_BinaryOp(self, node):
+        left, right = node.left, node.right
+        if node.op == "+" and all(isinstance(n, Constant) for n in (left, right)):
+            value = str(int(left.value) + int(right.value))
+            return Constant("int", value, node.coord)
+        return node
+
+    def visit_Return(self, node):
+        if isinstance(node.expr, Constant):
+            return None
+        return node
+
+
+def test_transformer():
+    program = UCParser().parse(
+        "int f(int a) { a = 1 + 2; return 3; }\n"
+        "int g() { return 4 + 5; }\n"
+    )
+    assert Folder().visit(program) is program
+    f, g = program.gdecls
+    assign = f.body.citens[0]
+    assert isinstance(assign.rvalue, Constant) and assign.rvalue.value == "3"
+    assert len(f.body.citens) == 1
+    # the return is visited before its expression is folded
+    assert isinstance(g.body.citens[0], Return)
+    assert g.body.citens[0].expr.value == "9"
+    assert Folder().visit(Return(Constant("int", "1"))) is None
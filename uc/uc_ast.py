@@ -1,76 +1,351 @@
-from abc import ABC
+from abc import ABCMeta
 from abc import abstractmethod
 
 import sys
+import weakref
 
 
 def represent_node(obj, indent):
-    def _repr(obj, indent, printed_set):
-        """
-        Get the representation of an object, with dedicated
-        pprint-like format for lists.
-        """
+    """
+    Get the representation of an object, with dedicated pprint-like
+    format for lists. Nodes are printed once, the first time they are
+    reached, and as "" after that.
+
+    It walks obj with an explicit stack, so its depth is not bounded by
+    the recursion limit: the stack holds the strings left to write, and
+    (obj, indent) pairs left to expand, in reverse order.
+    """
+    if isinstance(obj, str):
+        return obj
+    parts = []
+    write = parts.append
+    # avoid infinite recursion with printed (ids of the nodes written)
+    printed = set()
+    getattribute = object.__getattribute__
+    stack = [(obj, indent)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        item = pop()
+        if item.__class__ is str:
+            write(item)
+            continue
+        obj, indent = item
         if isinstance(obj, list):
             indent += 1
-            sep = ",\n" + (" " * indent)
-            final_sep = ",\n" + (" " * (indent - 1))
-            return (
-                "["
-                + (sep.join((_repr(e, indent, printed_set) for e in obj)))
-                + final_sep
-                + "]"
-            )
+            push(",\n" + " " * (indent - 1) + "]")
+            sep = ",\n" + " " * indent
+            for i in range(len(obj) - 1, -1, -1):
+                push((obj[i], indent))
+                if i:
+                    push(sep)
+            write("[")
         elif isinstance(obj, Node):
-            if obj in printed_set:
-                return ""
-            else:
-                printed_set.add(obj)
-            result = obj.__class__.__name__ + "("
-            indent += len(obj.__class__.__name__) + 1
+            if id(obj) in printed:
+                continue
+            printed.add(id(obj))
+            name = obj.__class__.__name__
+            indent += len(name) + 1
+            # relevant attributes set, without the irrelevant ones
             attrs = []
+            cls = obj.__class__
+            for attr in cls.__dict__.get("_attr_order") or _slot_names(cls):
+                if attr == "coord" or attr == "bind":
+                    continue
+                try:
+                    value = getattribute(obj, attr)
+                except AttributeError:
+                    # not set, like the body of a lazy FuncDef
+                    continue
+                if value is not None:
+                    attrs.append((attr, value))
+            push(")")
+            sep = ",\n" + " " * indent
+            for i in range(len(attrs) - 1, -1, -1):
+                attr, value = attrs[i]
+                if value.__class__ is str:
+                    push(attr + "=" + value)
+                else:
+                    push((value, indent + len(attr) + 1))
+                    push(attr + "=")
+                if i:
+                    push(sep)
+            write(name + "(")
+        elif isinstance(obj, str):
+            write(obj)
+        else:
+            write(str(obj))
+    return "".join(parts)
+
+
+def _slot_names(cls):
+    names = []
+    for base in reversed(cls.__mro__):
+        # the parts of the coord and __weakref__ are not attributes
+        names.extend(
+            name for name in base.__dict__.get("__slots__", ()) if name[0] != "_"
+        )
+    # the fields of the class as its __init__ sets them, then the coord
+    names.append("coord")
+    cls._attr_order = tuple(names)
+    return cls._attr_order
+
+
+def node_attrs(node):
+    """(name, value) of the attributes set on node, in the order its
+    __init__ sets them."""
+    names = type(node).__dict__.get("_attr_order") or _slot_names(type(node))
+    for name in names:
+        try:
+            yield name, object.__getattribute__(node, name)
+        except AttributeError:
+            # not set, like the body of a lazy FuncDef
+            pass
+
+
+def ast_equal(a, b):
+    """Whether the trees under a and b are the same: nodes of the same
+    classes whose fields are equal, whatever their coords. a and b may
+    also be lists of nodes or None. == compares nodes by identity."""
+    # an explicit stack, for trees of any depth
+    stack = [(a, b)]
+    while stack:
+        a, b = stack.pop()
+        if a is b:
+            continue
+        if a.__class__ is not b.__class__:
+            return False
+        if isinstance(a, Node):
+            stack.extend((getattr(a, name), getattr(b, name)) for name in a.fields)
+        elif a.__class__ is list:
+            if len(a) != len(b):
+                return False
+            stack.extend(zip(a, b))
+        elif a != b:
+            return False
+    return True
+
+
+class WeakIdentityMap:
+    """Maps objects, by identity, to values, as long as the objects are
+    alive. Unlike a WeakKeyDictionary, it does not hash the objects nor
+    compare them for equality."""
+
+    __slots__ = ("_items",)
 
-            # convert each node attribute to string
-            for name, value in vars(obj).items():
+    def __init__(self):
+        # id(obj) -> (weak reference to obj, value)
+        self._items = {}
+
+    def __setitem__(self, obj, value):
+        key = id(obj)
+        items = self._items
+        # removed when obj dies, before its id can be reused
+        ref = weakref.ref(obj, lambda _: items.pop(key, None))
+        items[key] = (ref, value)
+
+    def __getitem__(self, obj):
+        return self._items[id(obj)][1]
+
+    def __contains__(self, obj):
+        return id(obj) in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, obj, default=None):
+        item = self._items.get(id(obj))
+        return default if item is None else item[1]
+
+    def pop(self, obj, default=None):
+        item = self._items.pop(id(obj), None)
+        return default if item is None else item[1]
+
+
+# Loaders of the bodies of the FuncDefs parsed lazily, which parse the
+# body when FuncDef.body is first read
+lazy_bodies = WeakIdentityMap()
+
+
+# Kinds of the fields of a node class, given by its fields spec
+ATTR = "attr"  # shown by show() along with the class name: attr_names
+CHILD = "child"  # a child Node, or None
+CHILDREN = "children"  # a list of child Nodes, or None
+DATA = "data"  # neither shown nor walked
+
+
+def _compile(cls_name, source):
+    namespace = {}
+    exec(source, namespace)
+    func = namespace.popitem()[1]
+    func.__qualname__ = cls_name + "." + func.__name__
+    return func
+
+
+def _make_init(cls_name, names):
+    params = "".join(name + ", " for name in names)
+    body = "".join("    self.%s = %s\n" % (name, name) for name in names)
+    source = (
+        "def __init__(self, %scoord=None):\n"
+        "%s"
+        "    if coord is None:\n"
+        "        self._offset = 0\n"
+        "        self._lines = None\n"
+        "    else:\n"
+        "        self._offset = coord.offset\n"
+        "        self._lines = coord.lines\n"
+    ) % (params, body)
+    return _compile(cls_name, source)
+
+
+def _make_children(cls_name, fields):
+    """children(), returning the tuple of the (name, node) pairs."""
+    children = [
+        (name, kind) for name, kind in fields.items() if kind in (CHILD, CHILDREN)
+    ]
+    if not children:
+        source = "def children(self):\n    return ()\n"
+    elif children == [(children[0][0], CHILD)]:
+        source = (
+            "def children(self):\n"
+            "    child = self.{0}\n"
+            "    return () if child is None else (('{0}', child),)\n"
+        ).format(children[0][0])
+    else:
+        lines = ["def children(self):", "    nodelist = []"]
+        for name, kind in children:
+            if kind == CHILD:
+                lines.append("    child = self.%s" % name)
+                lines.append("    if child is not None:")
+                lines.append("        nodelist.append(('%s', child))" % name)
+            else:
+                lines.append("    for i, child in enumerate(self.%s or ()):" % name)
+                lines.append("        nodelist.append(('%s[%%d]' %% i, child))" % name)
+        lines.append("    return tuple(nodelist)")
+        source = "\n".join(lines) + "\n"
+    return _compile(cls_name, source)
+
+
+def _make_iter_children(cls_name, fields):
+    """iter_children(), yielding the (name, node) pairs of children()."""
+    lines = ["def iter_children(self):"]
+    for name, kind in fields.items():
+        if kind == CHILD:
+            lines.append("    child = self.%s" % name)
+            lines.append("    if child is not None:")
+            lines.append("        yield '%s', child" % name)
+        elif kind == CHILDREN:
+            lines.append("    for i, child in enumerate(self.%s or ()):" % name)
+            lines.append("        yield '%s[%%d]' %% i, child" % name)
+    if len(lines) == 1:
+        lines.append("    return iter(())")
+    return _compile(cls_name, "\n".join(lines) + "\n")
+
+
+class _NodeMeta(ABCMeta):
+    """Builds a node class from its fields spec: a dict from the name
+    of each field, in the order __init__ takes them, to its kind (ATTR,
+    CHILD, CHILDREN or DATA). The fields become its __slots__, the ATTR
+    ones its attr_names and the CHILD and CHILDREN ones its child_names.
+    The __init__, children() and iter_children() the class does not
+    define are generated from the spec.
+    """
 
-                # is an irrelevant attribute: skip it.
-                if name in ('bind', 'coord'):
-                    continue
+    def __new__(mcls, name, bases, namespace, **kwargs):
+        fields = namespace.get("fields")
+        if fields is not None:
+            namespace["__slots__"] = tuple(fields)
+            namespace["attr_names"] = tuple(
+                field for field, kind in fields.items() if kind == ATTR
+            )
+            namespace["child_names"] = tuple(
+                field for field, kind in fields.items() if kind in (CHILD, CHILDREN)
+            )
+            if "__init__" not in namespace:
+                namespace["__init__"] = _make_init(name, tuple(fields))
+            if "children" not in namespace:
+                namespace["children"] = _make_children(name, fields)
+            if "iter_children" not in namespace:
+                namespace["iter_children"] = _make_iter_children(name, fields)
+        return super().__new__(mcls, name, bases, namespace, **kwargs)
+
+
+class Coord:
+    """Coordinates of a syntactic element: its offset in the source
+    text, and lines, the uc_lexer.LineIndex shared by all the coords of
+    the text, in which its line and column are looked up when read.
+    Nodes do not hold their Coord but its two parts, and build it when
+    it is read: coords are equal when their parts are.
+    """
 
-                # relevant attribte not set: skip it.
-                if value is None:
-                    continue
+    __slots__ = ("offset", "lines")
 
-                # relevant attribute set: append string representation.
-                value_str = _repr(value, indent + len(name) + 1, printed_set)
-                attrs.append(name + "=" + value_str)
+    def __init__(self, offset, lines):
+        self.offset = offset
+        self.lines = lines
 
-            sep = ",\n" + (" " * indent)
-            final_sep = ",\n" + (" " * (indent - 1))
-            result += sep.join(attrs)
-            result += ")"
-            return result
-        elif isinstance(obj, str):
-            return obj
-        else:
-            return str(obj)
+    @property
+    def line(self):
+        return self.lines.line(self.offset)
 
-    # avoid infinite recursion with printed_set
-    printed_set = set()
-    return _repr(obj, indent, printed_set)
+    @property
+    def column(self):
+        return self.lines.column(self.offset)
+
+    def __str__(self):
+        line, column = self.lines.location(self.offset)
+        if line:
+            return "@ %s:%s" % (line, column)
+        return ""
+
+    def __eq__(self, other):
+        if other.__class__ is not Coord:
+            return NotImplemented
+        return self.offset == other.offset and self.lines is other.lines
+
+    def __hash__(self):
+        return hash((self.offset, id(self.lines)))
 
 
 #
 # ABSTRACT NODES
 #
-class Node(ABC):
-    """Abstract base class for AST nodes."""
+class Node(metaclass=_NodeMeta):
+    """Abstract base class for AST nodes. Each subclass gives its fields
+    spec (see _NodeMeta), from which its slots, its __init__ and the
+    walk of its children are generated.
+
+    Nodes compare and hash by identity; ast_equal() compares the trees
+    under two nodes.
 
+    The coord of a node is kept as its offset and its line index, in
+    slots of the node: a Coord object per node would take more memory
+    than all the other coord parts together.
+    """
+
+    __slots__ = ("_offset", "_lines", "__weakref__")
     attr_names = ()
+    child_names = ()
 
     @abstractmethod
     def __init__(self, coord=None):
         self.coord = coord
 
+    @property
+    def coord(self):
+        """Coord of the node, or None."""
+        lines = self._lines
+        return None if lines is None else Coord(self._offset, lines)
+
+    @coord.setter
+    def coord(self, coord):
+        if coord is None:
+            self._offset = 0
+            self._lines = None
+        else:
+            self._offset = coord.offset
+            self._lines = coord.lines
+
     def __repr__(self):
         """Generates a python representation of the current node"""
         return represent_node(self, 0)
@@ -79,6 +354,10 @@ class Node(ABC):
         """A sequence of all children that are Nodes"""
         pass
 
+    def iter_children(self):
+        """The (name, node) pairs of children(), one at a time."""
+        return iter(self.children())
+
     def show(
         self,
         buf=sys.stdout,
@@ -102,36 +381,58 @@ class Node(ABC):
         showcoord:
             Do you want the coordinates of each Node to be displayed.
         """
-        lead = " " * offset
-        if nodenames and _my_node_name is not None:
-            buf.write(lead + self.__class__.__name__ + " <" + _my_node_name + ">: ")
-            inner_offset = len(self.__class__.__name__ + " <" + _my_node_name + ">: ")
-        else:
-            buf.write(lead + self.__class__.__name__ + ":")
-            inner_offset = len(self.__class__.__name__ + ":")
-
-        if self.attr_names:
-            if attrnames:
-                nvlist = [
-                    (n, represent_node(getattr(self, n), offset+inner_offset+1+len(n)+1))
-                    for n in self.attr_names
-                    if getattr(self, n) is not None
-                ]
-                attrstr = ", ".join("%s=%s" % nv for nv in nvlist)
+        # an explicit stack of (node, offset, name) instead of recursing,
+        # and the lines written to buf in batches
+        parts = []
+        write = parts.append
+        stack = [(self, offset, _my_node_name)]
+        while stack:
+            node, offset, node_name = stack.pop()
+            if nodenames and node_name is not None:
+                head = node.__class__.__name__ + " <" + node_name + ">: "
             else:
-                vlist = [getattr(self, n) for n in self.attr_names]
-                attrstr = ", ".join(
-                    represent_node(v, offset + inner_offset + 1) for v in vlist
-                )
-            buf.write(" " + attrstr)
-
-        if showcoord:
-            if self.coord and self.coord.line != 0:
-                buf.write(" %s" % self.coord)
-        buf.write("\n")
-
-        for (child_name, child) in self.children():
-            child.show(buf, offset + 4, attrnames, nodenames, showcoord, child_name)
+                head = node.__class__.__name__ + ":"
+            write(" " * offset + head)
+            inner_offset = len(head)
+
+            if node.attr_names:
+                if attrnames:
+                    nvlist = [
+                        (
+                            n,
+                            represent_node(
+                                getattr(node, n), offset + inner_offset + 1 + len(n) + 1
+                            ),
+                        )
+                        for n in node.attr_names
+                        if getattr(node, n) is not None
+                    ]
+                    attrstr = ", ".join("%s=%s" % nv for nv in nvlist)
+                else:
+                    vlist = [getattr(node, n) for n in node.attr_names]
+                    attrstr = ", ".join(
+                        v
+                        if v.__class__ is str
+                        else represent_node(v, offset + inner_offset + 1)
+                        for v in vlist
+                    )
+                write(" " + attrstr)
+
+            if showcoord and node._lines is not None:
+                # empty for a coord at line 0
+                coord = str(node.coord)
+                if coord:
+                    write(" " + coord)
+            write("\n")
+            if len(parts) >= 4096:
+                buf.write("".join(parts))
+                parts.clear()
+
+            children = node.children()
+            for i in range(len(children) - 1, -1, -1):
+                child_name, child = children[i]
+                stack.append((child, offset + 4, child_name))
+        buf.write("".join(parts))
 
 
 class DeclType(Node):
@@ -152,6 +453,8 @@ class DeclType(Node):
         Used to apply a type modifier in the declaration chain.
     """
 
+    __slots__ = ()
+
     @abstractmethod
     def __init__(self):
         ...
@@ -222,562 +525,423 @@ class DeclType(Node):
 
 
 #
-# CONCRETE NODES
+# VISITORS
 #
-class ArrayDecl(DeclType):
+class NodeVisitor:
+    """
+    Walks the nodes of a tree, calling visit_<ClassName>(node) of the
+    visitor for each of them, or generic_visit(node) for those of a
+    class with no such method:
+
+        class IDCounter(NodeVisitor):
+            def __init__(self):
+                self.count = 0
+
+            def visit_ID(self, node):
+                self.count += 1
+
+    The method of each class of nodes is looked up once per visitor
+    class. Nodes are visited parent first, children in the order of
+    children(), with an explicit stack, so that the depth of the tree is
+    not bounded by the recursion limit. The children are read from the
+    child_names of each class, without building children() tuples. A
+    method returning False keeps the walk from going below its node.
+    """
 
-    attr_names = ()
+    _dispatch = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # (visit method, child_names reversed) by class of node, filled
+        # as nodes are met
+        cls._dispatch = {}
+
+    def _lookup(self, node_class):
+        cls = type(self)
+        method = getattr(cls, "visit_" + node_class.__name__, cls.generic_visit)
+        if method in _noop_visits:
+            # nothing to call
+            method = None
+        # the fields of the children, last first as they go on a stack
+        entry = method, node_class.child_names[::-1]
+        self._dispatch[node_class] = entry
+        return entry
+
+    def generic_visit(self, node):
+        """Called for the nodes with no visit_<ClassName> method."""
+        pass
 
-    def __init__(self, type, dim, coord=None):
-        """
-        :param type: underlying type modifier.
-        :param dim: dimension of the array.
-        :param coord: declaration code position.
-        """
-        self.type = type
-        self.dim = dim
-        self.coord = coord
+    def visit(self, node):
+        """Visit node and every node below it."""
+        dispatch = self._dispatch
+        lookup = self._lookup
+        stack = [node]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node = pop()
+            node_class = node.__class__
+            try:
+                method, names = dispatch[node_class]
+            except KeyError:
+                method, names = lookup(node_class)
+            if method is not None and method(self, node) is False:
+                continue
+            for name in names:
+                child = getattr(node, name)
+                if child is None:
+                    continue
+                if child.__class__ is list:
+                    stack.extend(reversed(child))
+                else:
+                    push(child)
 
-    def children(self):
-        nodelist = []
-        if self.type is not None:
-            nodelist.append(("type", self.type))
-        if self.dim is not None:
-            nodelist.append(("dim", self.dim))
-        return tuple(nodelist)
 
+class NodeTransformer(NodeVisitor):
+    """
+    A NodeVisitor whose methods return what replaces their node: the
+    node itself to keep it, another node, or None to remove it from its
+    list, or leave its field empty. The walk goes on below the node
+    returned. generic_visit keeps the node.
+    """
 
-class ArrayRef(Node):
+    def generic_visit(self, node):
+        return node
+
+    def visit(self, node):
+        """Transform node and every node below it. Returns what replaces
+        node."""
+        dispatch = self._dispatch
+        lookup = self._lookup
+        root = [node]
+        # (node, container, key) where container[key], or the field key
+        # of the node container, holds node
+        stack = [(node, root, 0)]
+        pop = stack.pop
+        push = stack.append
+        # lists some node was removed from, left as None until the end
+        emptied = []
+        while stack:
+            node, container, key = pop()
+            node_class = node.__class__
+            try:
+                method, names = dispatch[node_class]
+            except KeyError:
+                method, names = lookup(node_class)
+            new = node if method is None else method(self, node)
+            if new is not node:
+                if container.__class__ is list:
+                    container[key] = new
+                    if new is None:
+                        emptied.append(container)
+                else:
+                    setattr(container, key, new)
+                if new is None:
+                    continue
+                if new.__class__ is not node_class:
+                    names = new.__class__.child_names[::-1]
+            for name in names:
+                child = getattr(new, name)
+                if child is None:
+                    continue
+                if child.__class__ is list:
+                    for i in range(len(child) - 1, -1, -1):
+                        push((child[i], child, i))
+                else:
+                    push((child, new, name))
+        for items in emptied:
+            items[:] = [item for item in items if item is not None]
+        return root[0] if root else None
 
-    attr_names = ()
 
-    def __init__(self, name, subscript, coord=None):
-        """
-        :param name: name of the array being accessed.
-        :param subscript: dimension of the array.
-        :param coord: declaration code position.
-        """
-        self.name = name
-        self.subscript = subscript
-        self.coord = coord
-        #pass
-    def children(self):
-        nodelist = []
-        if self.name is not None:
-            nodelist.append(("name", self.name))
-        if self.subscript is not None:
-            nodelist.append(("subscript", self.subscript))    
-    
+# generic_visit methods that do nothing but keep the node
+_noop_visits = (NodeVisitor.generic_visit, NodeTransformer.generic_visit)
 
-class Assert(Node):
 
-    attr_names = ()
+#
+# CONCRETE NODES
+#
+class ArrayDecl(DeclType):
+    """
+    :param type: underlying type modifier.
+    :param dim: dimension of the array.
+    :param coord: declaration code position.
+    """
 
-    def __init__(self, expr, coord=None):
-        """
-        :param expr: boolean expression being asserted.
-        :param coord: code position.
-        """
-        self.expr = expr
-        self.coord = coord
-        #pass
-    def children(self):
-        nodelist = []
-        if self.expr is not None: nodelist.append(("expr", self.expr))
-        return tuple(nodelist)
-    
+    fields = {"type": CHILD, "dim": CHILD}
 
-class Assignment(Node):
 
-    attr_names = ("op","lvalue","rvalue","coord")
+class ArrayRef(Node):
+    """
+    :param name: name of the array being accessed.
+    :param subscript: dimension of the array.
+    :param coord: declaration code position.
+    """
 
-    def __init__(self, op, lvalue, rvalue, coord=None):
-        """
-        :param op: assignment operator (=, +=, %=, ...).
-        :param lvalue: variable being written.
-        :param rvalue: value being assingned to variable.
-        :param coord: code position.
-        """
-        self.op = op
-        self.lvalue = lvalue
-        self.rvalue = rvalue
-        self.coord = coord
+    fields = {"name": CHILD, "subscript": CHILD}
 
-    def children(self):
-        nodelist = []
-        if self.lvalue is not None:
-            nodelist.append(("lvalue", self.lvalue))
-        if self.rvalue is not None:
-            nodelist.append(("rvalue", self.rvalue))
-        return tuple(nodelist)
 
+class Assert(Node):
+    """
+    :param expr: boolean expression being asserted.
+    :param coord: code position.
+    """
 
-class BinaryOp(Node):
+    fields = {"expr": CHILD}
 
-    attr_names = ("op","left","right","coord")
 
-    def __init__(self, op, left, right, coord=None):
-        """
-        :param op: binary operator (+, -, *, ...).
-        :param left: left hand side expression.
-        :param right: right hand side expression.
-        :param coord: code position.
-        """
-        self.op = op
-        self.left = left
-        self.right = right
-        self.coord = coord
+class Assignment(Node):
+    """
+    :param op: assignment operator (=, +=, %=, ...).
+    :param lvalue: variable being written.
+    :param rvalue: value being assingned to variable.
+    :param coord: code position.
+    """
 
-    def children(self):
-        nodelist = []
-        if self.left is not None:
-            nodelist.append(("left", self.left))
-        if self.right is not None:
-            nodelist.append(("right", self.right))
-        return tuple(nodelist)
+    fields = {"op": ATTR, "lvalue": CHILD, "rvalue": CHILD}
 
 
-class Break(Node):
+class BinaryOp(Node):
+    """
+    :param op: binary operator (+, -, *, ...).
+    :param left: left hand side expression.
+    :param right: right hand side expression.
+    :param coord: code position.
+    """
 
-    attr_names = ()
+    fields = {"op": ATTR, "left": CHILD, "right": CHILD}
 
-    def __init__(self, coord=None):
-        self.coord = coord
 
-    def children(self):
-        return ()
+class Break(Node):
+    fields = {}
 
 
 class Compound(Node):
+    """
+    :param citens: declarations & statements within the compound.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, citens, coord=None):
-        """
-        :param citens: declarations & statements within the compound.
-        :param coord: code position.
-        """
-        self.citens = citens
-        self.coord = coord
-
-    def children(self):
-        nodelist = []
-        for i, child in enumerate(self.citens or []):
-            nodelist.append(("citens[%d]" % i, child))
-        return tuple(nodelist)
+    fields = {"citens": CHILDREN}
 
 
 class Constant(Node):
+    """
+    :param type: primitive type.
+    :param value: constant value.
+    :param coord: code position.
+    """
 
-    attr_names = ('type', 'value', 'coord')
-
-    def __init__(self, type, value, coord=None):
-        """
-        :param type: primitive type.
-        :param value: constant value.
-        :param coord: code position.
-        """
-        self.type = type
-        self.value = value
-        self.coord = coord
-
-    def children(self):
-        return ()
+    fields = {"type": ATTR, "value": ATTR}
 
 
 class Decl(DeclType):
+    """
+    :param name: declaration variable name.
+    :param type: underlying type modifier.
+    :param init: declaration's initialization value.
+    :param coord: code position.
+    """
 
-    attr_names = ("name","type","init","coord")
-
-    def __init__(self, name, type, init, coord=None):
-        """
-        :param name: declaration variable name.
-        :param type: underlying type modifier.
-        :param init: declaration's initialization value.
-        :param coord: code position.
-        """
-        self.name = name
-        self.type = type
-        self.init = init
-        self.coord = coord
-
-    def children(self):
-        nodelist = []
-        if self.type is not None:
-            nodelist.append(("type", self.type))
-        if self.init is not None:
-            nodelist.append(("init", self.init))
-        return tuple(nodelist)
+    fields = {"name": ATTR, "type": CHILD, "init": CHILD}
 
 
 class DeclList(Node):
+    """
+    :param decls: list of declarations.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, decls, coord=None):
-        """
-        :param decls: list of declarations.
-        :param coord: code position.
-        """
-        self.decls = decls
-        self.coord = coord
-        #pass
-    
-    def children(self):
-        nodelist = []
-        for i, child in enumerate(self.decls or []):
-            nodelist.append(("decls[%d]" % i, child))
-        return tuple(nodelist)
+    fields = {"decls": CHILDREN}
 
 
 class EmptyStatement(Node):
-
-    attr_names = ()
-
-    def __init__(self, coord=None):
-        self.coord = coord
-
-    def children(self):
-        return ()
+    fields = {}
 
 
 class ExprList(Node):
+    """
+    :param exprs: list of expressions.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, exprs, coord=None):
-        """
-        :param exprs: list of expressions.
-        :param coord: code position.
-        """
-        self.exprs = exprs
-        self.coord = coord
-
-    def children(self):
-        nodelist = []
-        for i, child in enumerate(self.exprs or []):
-            nodelist.append(("exprs[%d]" % i, child))
-        return tuple(nodelist)
+    fields = {"exprs": CHILDREN}
 
 
 class For(Node):
+    """
+    :param init: initialization to be made before the loop.
+    :param cond: conditional to be evaluated each iteration.
+    :param next: computation to be made after each iteration.
+    :param body: statements within the loop's body.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, init, cond, next, body, coord=None):
-        """
-        :param init: initialization to be made before the loop.
-        :param cond: conditional to be evaluated each iteration.
-        :param next: computation to be made after each iteration.
-        :param body: statements within the loop's body.
-        :param coord: code position.
-        """
-        self.init = init
-        self.cond = cond
-        self.next = next
-        self.body = body
-        self.coord = coord
-
-    def children(self):
-        nodelist = []
-        if self.init is not None:
-            nodelist.append(("init", self.init))
-        if self.cond is not None:
-            nodelist.append(("cond", self.cond))
-        if self.next is not None:
-            nodelist.append(("next", self.next))
-        if self.body is not None:
-            nodelist.append(("body", self.body))
-        return tuple(nodelist)
+    fields = {"init": CHILD, "cond": CHILD, "next": CHILD, "body": CHILD}
 
 
 class FuncCall(Node):
+    """
+    :param name: name of the function being called.
+    :param args: function call arguments.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, name, args, coord=None):
-        """
-        :param name: name of the function being called.
-        :param args: function call arguments.
-        :param coord: code position.
-        """
-        self.name = name
-        self.args = args
-        self.coord = coord
-
-    def children(self):
-        nodelist = []
-        if self.name is not None: nodelist.append(("name", self.name))
-        if self.args is not None: nodelist.append(("args", self.args))
-        return tuple(nodelist)
+    fields = {"name": CHILD, "args": CHILD}
 
 
 class FuncDecl(DeclType):
+    """
+    :param params: function parameters declarations.
+    :param type: function return type.
+    :param coord: code position.
+    """
 
-    attr_names = ()
+    fields = {"params": CHILD, "type": CHILD}
 
-    def __init__(self, params, type, coord=None):
-        """
-        :param params: function parameters declarations.
-        :param type: function return type.
-        :param coord: code position.
-        """
-        self.params = params
-        self.type = type
-        self.coord = coord
-        #pass
-    
-    def children(self):
-        nodelist = []
-        if self.params is not None: nodelist.append(("params", self.params))
-        if self.type is not None: nodelist.append(("type", self.type))
-        return tuple(nodelist)
-    
 
 class FuncDef(Node):
+    """
+    :param type: function return type.
+    :param decl: function declaration AST node.
+    :param body: function compound body.
+    :param coord: code position.
+    """
 
-    attr_names = ()
+    fields = {"type": CHILD, "decl": CHILD, "body": CHILD}
 
-    def __init__(self, type, decl, body, coord=None):
-        """
-        :param type: function return type.
-        :param decl: function declaration AST node.
-        :param body: function compound body.
-        :param coord: code position.
-        """
-        self.type = type
-        self.decl = decl
-        self.body = body
-        self.coord = coord
-        #pass
-    def children(self):
-        nodelist = []
-        if self.type is not None: pass
-        if self.body is not None: pass
-        for i, child in enumerate(self.decl or []):
-            nodelist.append(("decl[%d]" %i, child))
-        return tuple(nodelist)
+    def __getattr__(self, name):
+        # only called for attributes not set, like the body of a lazy FuncDef
+        if name == "body":
+            load = lazy_bodies.pop(self, None)
+            if load is not None:
+                self.body = load()
+                return self.body
+        raise AttributeError(
+            "%r object has no attribute %r" % (type(self).__name__, name)
+        )
 
+    def __getstate__(self):
+        # copies and pickles hold the body, not its loader
+        self.body
+        return None, dict(node_attrs(self))
 
-class GlobalDecl(Node):
-
-    attr_names = ()
 
-    def __init__(self, decls, coord=None):
-        """
-        :param decls: list of declarations.
-        :param coord: code position.
-        """
-        self.decls = decls
-        self.coord = coord
+class GlobalDecl(Node):
+    """
+    :param decls: list of declarations.
+    :param coord: code position.
+    """
 
-    def children(self):
-        nodelist = []
-        for i, child in enumerate(self.decls or []):
-            nodelist.append(("decls[%d]" % i, child))
-        return tuple(nodelist)
+    fields = {"decls": CHILDREN}
 
 
 class ID(Node):
+    """
+    :param name: ID unique name.
+    :param coord: code position.
+    """
 
-    attr_names = ("name",)
-
-    def __init__(self, name, coord=None):
-        """
-        :param name: ID unique name.
-        :param coord: code position.
-        """
-        self.name = name
-        self.coord = coord
-
-    def children(self):
-        return ()
+    fields = {"name": ATTR}
 
 
 class If(Node):
+    """
+    :param cond: conditional statement being evaluated.
+    :param iftrue: compound block to execute on true statement.
+    :param iffalse: compound block to execute on false statement.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, cond, iftrue, iffalse, coord=None):
-        """
-        :param cond: conditional statement being evaluated.
-        :param iftrue: compound block to execute on true statement.
-        :param iffalse: compound block to execute on false statement.
-        :param coord: code position.
-        """
-        self.cond = cond
-        self.iftrue = iftrue
-        self.iffalse = iffalse
-        self.coord = coord
-        #pass
-    def children(self):
-        nodelist = []
-        if self.cond is not None: nodelist.append(("cond", self.cond))
-        if self.iftrue is not None: nodelist.append(("iftrue", self.iftrue))
-        if self.iffalse is not None: nodelist.append(("iffalse", self.iffalse))
-        return tuple(nodelist)
+    fields = {"cond": CHILD, "iftrue": CHILD, "iffalse": CHILD}
 
 
 class InitList(Node):
+    """
+    :param exprs: list of initializer expressions.
+    :param coord: code position.
+    """
 
-    attr_names = ()
+    fields = {"exprs": CHILDREN, "value": DATA}
 
     def __init__(self, exprs, coord=None):
-        """
-        :param exprs: list of initializer expressions.
-        :param coord: code position.
-        """
+        # value is not given, but set later on
         self.exprs = exprs
         self.coord = coord
         self.value = None
 
-    def children(self):
-        nodelist = []
-        for i, child in enumerate(self.exprs or []):
-            nodelist.append(("exprs[%d]" % i, child))
-        return tuple(nodelist)
-
 
 class ParamList(Node):
+    """
+    :param params: list of parameter declarations.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, params, coord=None):
-        """
-        :param params: list of parameter declarations.
-        :param coord: code position.
-        """
-        self.params = params
-        self.coord = coord
-        #pass
-    def children(self):
-        nodelist = []
-        for i, child in enumerate(self.params or []):
-            nodelist.append((f"params[{i}]", child)) #funciona? se n, voltar para o normal
-        return tuple(nodelist)
+    fields = {"params": CHILDREN}
 
 
 class Print(Node):
+    """
+    :param expr: expression to be printed.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, expr, coord=None):
-        """
-        :param expr: expression to be printed.
-        :param coord: code position.
-        """
-        self.expr = expr
-        self.coord = coord
-        #pass
-    def children(self):
-        nodelist = []
-        if self.expr is not None: nodelist.append(("expr", self.expr))
-        return tuple(nodelist)
+    fields = {"expr": CHILD}
 
 
 class Program(Node):
+    """
+    :param gdecls: program's global declarations.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, gdecls, coord=None):
-        """
-        :param gdecls: program's global declarations.
-        :param coord: code position.
-        """
-        self.gdecls = gdecls
-        self.coord = coord
-
-    def children(self):
-        nodelist = []
-        for i, child in enumerate(self.gdecls or []):
-            nodelist.append(("gdecls[%d]" % i, child))
-        return tuple(nodelist)
+    fields = {"gdecls": CHILDREN}
 
 
 class Read(Node):
+    """
+    :param names: IDs where read values should be stored.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, names, coord=None):
-        """
-        :param names: IDs where read values should be stored.
-        :param coord: code position.
-        """
-        pass
+    fields = {"names": CHILD}
 
 
 class Return(Node):
+    """
+    :param expr: expression whose result will be returned.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, expr, coord=None):
-        """
-        :param expr: expression whose result will be returned.
-        :param coord: code position.
-        """
-        self.expr = expr
-        self.coord = coord
-        #pass
-    def children(self):
-        nodelist = []
-        if self.expr is not None: nodelist.append(("expr", self.expr))
-        return tuple(nodelist)
+    fields = {"expr": CHILD}
 
 
 class Type(Node):
+    """
+    :param name: primitive type name (int, char, ...).
+    :param coord: code position.
+    """
 
-    attr_names = ("name",)
-
-    def __init__(self, name, coord=None):
-        """
-        :param name: primitive type name (int, char, ...).
-        :param coord: code position.
-        """
-        self.name = name
-        self.coord = coord
-        #pass
-    def children(self):
-        return ()
+    fields = {"name": ATTR}
 
 
 class UnaryOp(Node):
+    """
+    :param op: unary operator (!, +, -, ...)
+    :param expr: expression whose value will be modified by the operator.
+    """
 
-    attr_names = ("op",)
-
-    def __init__(self, op, expr, coord=None):
-        """
-        :param op: unary operator (!, +, -, ...)
-        :param expr: expression whose value will be modified by the operator.
-        """
-        self.op = op
-        self.expr = expr
-        self.coord = coord
-        #pass
-    def children(self):
-        nodelist = []
-        if self.expr is not None: nodelist.append(("expr", self.expr))
-        return tuple(nodelist)
+    fields = {"op": ATTR, "expr": CHILD}
 
 
 class VarDecl(DeclType):
+    """
+    :param declname: variable name.
+    :param type: variable primitive type.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, declname, type, coord=None):
-        """
-        :param declname: variable name.
-        :param type: variable primitive type.
-        :param coord: code position.
-        """
-        self.declname = declname
-        self.type = type
-        self.coord = coord
-
-    def children(self):
-        nodelist = []
-        if self.type is not None:
-            nodelist.append(("type", self.type))
-        return tuple(nodelist)
+    fields = {"declname": DATA, "type": CHILD}
 
     @property
     def identifier(self):
@@ -816,21 +980,10 @@ class VarDecl(DeclType):
 
 
 class While(Node):
+    """
+    :param cond: conditional being evaluated at every iteration.
+    :param body: compound representing the loop body.
+    :param coord: code position.
+    """
 
-    attr_names = ()
-
-    def __init__(self, cond, body, coord=None):
-        """
-        :param cond: conditional being evaluated at every iteration.
-        :param body: compound representing the loop body.
-        :param coord: code position.
-        """
-        self.cond = cond
-        self.body = body
-        self.coord = coord
-        #pass
-    def children(self):
-        nodelist = []
-        if self.cond is not None: nodelist.append(("cond", self.cond))
-        if self.body is not None: nodelist.append(("body", self.body))
-        return tuple(nodelist)
\ No newline at end of file
+    fields = {"cond": CHILD, "body": CHILD}
@@ -0,0 +1,171 @@
+import asyncio
+import collections
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from uc import uc_binary
+from uc.uc_parser import Diagnostic, ParseError, UCParser
+
+# parser of the current worker process, built once by _init_worker
+_parser = None
+
+
+def _init_worker(lexer_engine):
+    global _parser
+    _parser = UCParser(lexer_engine=lexer_engine, errors="collect")
+
+
+def _parse_job(text):
+    program = _parser.parse(text)
+    # tokens refer to the lexer, which does not pickle
+    diagnostics = [Diagnostic(d.kind, d.message, d.coord) for d in _parser.diagnostics]
+    # pickling the tree would recurse once per level of it
+    data = None if program is None else uc_binary.dumps(program)
+    return data, diagnostics
+
+
+class AsyncMetrics:
+    """Snapshot of the load of an AsyncUCParser: requests waiting for a
+    worker, running, and done since it started, with the latencies, in
+    seconds from the call to the result, of the last ones completed."""
+
+    def __init__(self, queued, running, completed, failed, cancelled, latencies):
+        self.queued = queued
+        self.running = running
+        self.completed = completed
+        self.failed = failed
+        self.cancelled = cancelled
+        self.latencies = sorted(latencies)
+
+    def percentile(self, p):
+        """Latency below which p percent of the recorded ones are, or None
+        if there are none."""
+        if not self.latencies:
+            return None
+        index = min(len(self.latencies) - 1, int(len(self.latencies) * p / 100))
+        return self.latencies[index]
+
+    @property
+    def mean(self):
+        if not self.latencies:
+            return None
+        return sum(self.latencies) / len(self.latencies)
+
+    def __repr__(self):
+        return (
+            "AsyncMetrics(queued=%d, running=%d, completed=%d, failed=%d, "
+            "cancelled=%d)"
+            % (self.queued, self.running, self.completed, self.failed, self.cancelled)
+        )
+
+
+class AsyncUCParser:
+    """Parses on a pool of jobs worker processes (os.cpu_count() by
+    default), each building its UCParser once, without blocking the
+    event loop:
+
+        async with AsyncUCParser() as parser:
+            program = await parser.parse(text)
+
+    At most jobs texts are handed to the workers at a time; the other
+    calls wait for a free one, in order, so that a burst of requests
+    queues up in the event loop rather than in memory of the pool.
+    Cancelling a call that waits drops it; cancelling one that runs
+    discards its result when the worker is done with it.
+
+    Workers send the Program back written by uc_binary, and its
+    function bodies are decoded when they are first read.
+    """
+
+    def __init__(self, jobs=None, lexer_engine="ply", window=1024):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.lexer_engine = lexer_engine
+        self._executor = None
+        self._slots = None
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._latencies = collections.deque(maxlen=window)
+
+    def _start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.jobs,
+                # spawned, not forked: the event loop may have threads
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.lexer_engine,),
+            )
+            self._slots = asyncio.Semaphore(self.jobs)
+
+    async def parse(self, text):
+        """The Program of text. Raises ParseError with the diagnostics if
+        it has errors."""
+        self._start()
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        self._queued += 1
+        try:
+            await self._slots.acquire()
+        except asyncio.CancelledError:
+            self._cancelled += 1
+            raise
+        finally:
+            self._queued -= 1
+        self._running += 1
+        future = self._executor.submit(_parse_job, text)
+        try:
+            data, diagnostics = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self._cancelled += 1
+            if future.cancel():
+                self._release()
+            else:
+                # the worker stays busy with it: keep its slot until then
+                future.add_done_callback(
+                    lambda _: loop.call_soon_threadsafe(self._release)
+                )
+            raise
+        except BaseException:
+            self._failed += 1
+            self._release()
+            raise
+        self._release()
+        self._latencies.append(time.perf_counter() - start)
+        if diagnostics:
+            self._failed += 1
+            raise ParseError(diagnostics)
+        self._completed += 1
+        return uc_binary.loads(data)
+
+    def _release(self):
+        self._running -= 1
+        self._slots.release()
+
+    def metrics(self):
+        return AsyncMetrics(
+            self._queued,
+            self._running,
+            self._completed,
+            self._failed,
+            self._cancelled,
+            self._latencies,
+        )
+
+    async def close(self):
+        """Wait for the running parses and stop the workers."""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.get_running_loop().run_in_executor(
+                None, executor.shutdown
+            )
+
+    async def __aenter__(self):
+        self._start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,143 @@
+import io
+import os
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from uc import uc_cache
+from uc.uc_json import write_ast
+from uc.uc_parser import UCParser
+
+# parser of the current worker process, built once by _init_worker, and
+# the format of its dumps
+_parser = None
+_output_format = "show"
+
+
+def _init_worker(lexer_engine, ast_cache, output_format="show"):
+    global _parser, _output_format
+    _parser = UCParser(
+        lexer_engine=lexer_engine,
+        ast_cache=uc_cache.ASTCache() if ast_cache else None,
+    )
+    _output_format = output_format
+
+
+def parse_to_file(parser, input_path, output_path, output_format="show"):
+    """Parse input_path and write what the single file CLI prints for it
+    to output_path, in output_format (see uc_json.write_ast). A lexer or
+    parser error ends the parse of this file only. Returns None on
+    success, or a one line description of the failure.
+    """
+    # what the parser prints, kept for the message of an error
+    buf = io.StringIO()
+    error = None
+    try:
+        with open(input_path) as f:
+            text = f.read()
+        with redirect_stdout(buf):
+            ast = parser.parse(text)
+    except SystemExit:
+        # the error message was printed to buf, as it is to stdout
+        lines = buf.getvalue().splitlines()
+        error = lines[-1] if lines else "exited"
+    except Exception as e:
+        error = "%s: %s" % (type(e).__name__, e)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as f:
+        f.write(buf.getvalue())
+        if error is None:
+            # the dump goes straight to the file
+            try:
+                write_ast(ast, f, output_format)
+            except Exception as e:
+                error = "%s: %s" % (type(e).__name__, e)
+    return error
+
+
+def _parse_job(job):
+    input_path, output_path = job
+    return parse_to_file(_parser, input_path, output_path, _output_format)
+
+
+def collect_files(inputs, files_from=None, pattern="*.uc"):
+    """Files named by inputs, with directories searched recursively for
+    pattern, followed by those listed one per line in files_from.
+    """
+    paths = []
+    for name in inputs:
+        path = pathlib.Path(name)
+        if path.is_dir():
+            paths.extend(sorted(p for p in path.rglob(pattern) if p.is_file()))
+        else:
+            paths.append(path)
+    if files_from is not None:
+        with open(files_from) as f:
+            paths.extend(pathlib.Path(line.strip()) for line in f if line.strip())
+    return paths
+
+
+def output_paths(paths, output_dir=None, suffix=".ast"):
+    """Where the dump of each file goes: next to it with suffix, or in
+    output_dir, in the tree of the files below their common directory.
+    """
+    if output_dir is None:
+        return [path.with_suffix(suffix) for path in paths]
+    paths = [path.resolve() for path in paths]
+    root = pathlib.Path(os.path.commonpath([path.parent for path in paths]))
+    return [
+        pathlib.Path(output_dir, path.relative_to(root)).with_suffix(suffix)
+        for path in paths
+    ]
+
+
+class BatchResult:
+    """Outcome of a batch: the number of files parsed, the failures as
+    (path, message) pairs and the elapsed time."""
+
+    def __init__(self, files, failures, elapsed):
+        self.files = files
+        self.failures = failures
+        self.elapsed = elapsed
+
+    def summary(self):
+        rate = self.files / self.elapsed if self.elapsed else 0.0
+        lines = [
+            "%d files, %d failed in %.2fs (%.1f files/s)"
+            % (self.files, len(self.failures), self.elapsed, rate)
+        ]
+        lines.extend("FAILED %s: %s" % failure for failure in self.failures)
+        return "\n".join(lines)
+
+
+def parse_batch(
+    paths,
+    outputs,
+    jobs=None,
+    lexer_engine="ply",
+    ast_cache=False,
+    chunksize=8,
+    output_format="show",
+):
+    """Parse every file of paths into the matching file of outputs across
+    a pool of jobs processes (os.cpu_count() by default), each of which
+    builds its UCParser once. jobs=1 parses in this process. ast_cache
+    makes the workers share the default uc_cache.ASTCache. output_format
+    is that of the dumps (see uc_json.write_ast).
+    """
+    start = time.perf_counter()
+    pairs = [(str(p), str(o)) for p, o in zip(paths, outputs)]
+    if jobs == 1:
+        _init_worker(lexer_engine, ast_cache, output_format)
+        errors = [_parse_job(job) for job in pairs]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(lexer_engine, ast_cache, output_format),
+        ) as executor:
+            errors = list(executor.map(_parse_job, pairs, chunksize=chunksize))
+    failures = [
+        (path, error) for (path, _), error in zip(pairs, errors) if error is not None
+    ]
+    return BatchResult(len(pairs), failures, time.perf_counter() - start)
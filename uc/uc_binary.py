@@ -0,0 +1,539 @@
+import io
+import mmap
+import struct
+import sys
+from array import array
+from uc.uc_ast import ATTR, CHILD, CHILDREN, DATA, FuncDef, Node, lazy_bodies
+from uc.uc_flat import KINDS
+from uc.uc_lexer import LineIndex
+
+MAGIC = b"UCAST\x00"
+VERSION = 2
+
+# magic and version, at the start of the file
+_HEADER = struct.Struct("<6sH")
+# number of FuncDefs, offsets of the top section, of the meta section
+# and of the FuncDef table, at the end of the file
+_TRAILER = struct.Struct("<IQQQ")
+# offset of the section of a FuncDef, 1 + index of its name in the
+# strings (0 if it has none)
+_ENTRY = struct.Struct("<QI")
+
+# Tags of the nodes, after which come those of the kinds of the file
+_NONE = 0
+_FUNCTION = 1
+_FIRST_KIND = 2
+
+# Tags of the values of ATTR and DATA fields, after which come those of
+# the strings of the file
+_NONE_VALUE = 0
+_NODE_VALUE = 1
+_SHARED_VALUE = 2
+_INT_VALUE = 3
+_LIST_VALUE = 4
+_FIRST_STRING = 5
+
+# What comes next in a section, besides the kinds of the fields
+_APPEND = "append"  # a node of a list
+_VALUE = "value"  # a node held by an ATTR or DATA field
+_ITEM = "item"  # a value of a list held by an ATTR or DATA field
+_RESET = "reset"  # nothing: a new scope of shared nodes and coords
+_LAZY = "lazy"  # the body of a FuncDef, read when it is first used
+
+
+def _write_varint(out, value):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf, pos):
+    """(value, pos) of the varint at pos."""
+    byte = buf[pos]
+    pos += 1
+    value = byte & 0x7F
+    shift = 7
+    while byte & 0x80:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+    return value, pos
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else (~value << 1) | 1
+
+
+def _unzigzag(value):
+    return ~(value >> 1) if value & 1 else value >> 1
+
+
+def _write_bytes(out, data):
+    _write_varint(out, len(data))
+    out += data
+
+
+def _read_bytes(buf, pos):
+    size, pos = _read_varint(buf, pos)
+    if pos + size > len(buf):
+        raise ValueError("Corrupt uC AST file")
+    return buf[pos : pos + size], pos + size
+
+
+class _Encoder:
+    """Writes the sections of a file, interning the strings and line
+    indexes they refer to."""
+
+    def __init__(self):
+        self.kinds = {}
+        self.strings = {}
+        self.starts = {}
+        self.lines = {}
+        self.functions = []
+
+    def kind(self, cls):
+        kind = self.kinds.get(cls)
+        if kind is None:
+            if "fields" not in cls.__dict__:
+                raise TypeError("Cannot encode a %s" % cls.__name__)
+            kind = self.kinds[cls] = len(self.kinds)
+        return kind
+
+    def string(self, value):
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def line_index(self, lines):
+        # line indexes shifted from one another share their starts
+        entry = self.lines.get(id(lines))
+        if entry is None:
+            starts = self.starts.get(id(lines.starts))
+            if starts is None:
+                starts = self.starts[id(lines.starts)] = (len(self.starts), lines)
+            entry = self.lines[id(lines)] = (len(self.lines), lines, starts[0])
+        return entry[0]
+
+    def encode(self, root, out, top):
+        """Write the tree under root to out, a bytearray. In the top
+        section (top true) FuncDefs are written as references to their
+        own sections, in which their bodies start a new scope."""
+        shared = {}
+        prev = 0
+        lines = None
+        # the items left to write, last first: (_APPEND, node),
+        # (_RESET, None) or (field kind, value)
+        stack = [(_APPEND, root)]
+        while stack:
+            what, value = stack.pop()
+            if what is CHILD or what is _APPEND:
+                if value is None:
+                    out.append(_NONE)
+                    continue
+                if top and value.__class__ is FuncDef:
+                    out.append(_FUNCTION)
+                    _write_varint(out, len(self.functions))
+                    self.functions.append(value)
+                    continue
+                _write_varint(out, _FIRST_KIND + self.kind(value.__class__))
+                coord_lines = value._lines
+                if coord_lines is None:
+                    out.append(0)
+                else:
+                    offset = value._offset
+                    delta = _zigzag(offset - prev) << 1
+                    prev = offset
+                    if coord_lines is lines:
+                        _write_varint(out, delta | 1)
+                    else:
+                        lines = coord_lines
+                        _write_varint(out, delta + 2)
+                        _write_varint(out, self.line_index(lines))
+                fields = list(value.fields.items())
+                if not top and value.__class__ is FuncDef:
+                    stack.append((CHILD, value.body))
+                    stack.append((_RESET, None))
+                    fields.pop()
+                for name, kind in reversed(fields):
+                    stack.append((kind, getattr(value, name)))
+            elif what is CHILDREN:
+                if value is None:
+                    out.append(0)
+                else:
+                    _write_varint(out, len(value) + 1)
+                    stack.extend((_APPEND, child) for child in reversed(value))
+            elif what is _RESET:
+                shared = {}
+                prev = 0
+                lines = None
+            elif value is None:
+                out.append(_NONE_VALUE)
+            elif value.__class__ is str:
+                _write_varint(out, _FIRST_STRING + self.string(value))
+            elif isinstance(value, Node):
+                index = shared.get(id(value))
+                if index is None:
+                    shared[id(value)] = len(shared)
+                    out.append(_NODE_VALUE)
+                    stack.append((_APPEND, value))
+                else:
+                    out.append(_SHARED_VALUE)
+                    _write_varint(out, index)
+            elif value.__class__ is int:
+                out.append(_INT_VALUE)
+                _write_varint(out, _zigzag(value))
+            elif value.__class__ is list:
+                out.append(_LIST_VALUE)
+                _write_varint(out, len(value))
+                stack.extend((what, item) for item in reversed(value))
+            else:
+                raise TypeError(
+                    "Cannot encode a %s field value" % type(value).__name__
+                )
+
+    def write_meta(self, out):
+        """Write the kinds, strings and line indexes to out."""
+        _write_varint(out, len(self.kinds))
+        for cls in self.kinds:
+            _write_bytes(out, cls.__name__.encode())
+            _write_varint(out, len(cls.fields))
+            for name, kind in cls.fields.items():
+                _write_bytes(out, name.encode())
+                _write_bytes(out, kind.encode())
+        _write_varint(out, len(self.strings))
+        for string in self.strings:
+            _write_bytes(out, string.encode("utf-8", "surrogatepass"))
+        _write_varint(out, len(self.starts))
+        for _, lines in self.starts.values():
+            starts = array("q", lines.starts)
+            if sys.byteorder == "big":
+                starts.byteswap()
+            _write_bytes(out, starts.tobytes())
+        _write_varint(out, len(self.lines))
+        for _, lines, starts in self.lines.values():
+            _write_varint(out, starts)
+            _write_varint(out, _zigzag(lines.first))
+
+
+def _function_name(funcdef):
+    name = getattr(getattr(funcdef, "decl", None), "name", None)
+    return getattr(name, "name", None)
+
+
+def dump(node, file):
+    """Write the tree under node to file, a binary file object, in the
+    format ASTReader reads. The file is written in one pass, so it need
+    not be seekable.
+
+    Layout: the magic and version; a section for each FuncDef of the
+    tree, its body in a scope of its own; the top section, holding the
+    rest of the tree with references to the FuncDef sections; the meta
+    section, with the kinds, strings and line indexes the sections
+    refer to by number; the table of the offsets and names of the
+    FuncDefs; and the offsets of these, in a trailer.
+
+    Nodes are written in preorder as the varint tag of their kind, their
+    coord (the varint of the difference from the previous offset, and of
+    its line index when it changes) and their fields, in the order of
+    the fields spec: a node or none for a CHILD, the number of nodes
+    and the nodes for CHILDREN, a tagged value for ATTR and DATA: none,
+    a string by number, an int, a node, written once however many times
+    it is held, or a list of such values.
+    """
+    encoder = _Encoder()
+    top = bytearray()
+    encoder.encode(node, top, True)
+    file.write(_HEADER.pack(MAGIC, VERSION))
+    offset = _HEADER.size
+    table = bytearray()
+    for funcdef in encoder.functions:
+        section = bytearray()
+        encoder.encode(funcdef, section, False)
+        name = _function_name(funcdef)
+        name = 0 if name is None else encoder.string(name) + 1
+        table += _ENTRY.pack(offset, name)
+        file.write(section)
+        offset += len(section)
+    file.write(top)
+    meta = bytearray()
+    encoder.write_meta(meta)
+    file.write(meta)
+    file.write(table)
+    file.write(
+        _TRAILER.pack(
+            len(encoder.functions),
+            offset,
+            offset + len(top),
+            offset + len(top) + len(meta),
+        )
+    )
+
+
+def dumps(node):
+    """The bytes dump() writes for node."""
+    buf = io.BytesIO()
+    dump(node, buf)
+    return buf.getvalue()
+
+
+class _Body:
+    """Reads the body of a FuncDef at pos of a file."""
+
+    __slots__ = ("reader", "pos")
+
+    def __init__(self, reader, pos):
+        self.reader = reader
+        self.pos = pos
+
+    def __call__(self):
+        return self.reader._decode(self.pos)
+
+
+class ASTReader:
+    """Reads a file written by dump(), mapped in memory, decoding only
+    the parts of the tree that are used: root() decodes the top section
+    and the headers of the FuncDefs, whose bodies are decoded when they
+    are first read, and function() only the FuncDef it returns.
+
+    source is the path of the file, or its bytes. Bodies not yet read
+    when the reader is closed cannot be read.
+    """
+
+    def __init__(self, source):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self.buf = bytes(source)
+        else:
+            with open(source, "rb") as f:
+                self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = self.buf
+        if len(buf) < _HEADER.size + _TRAILER.size:
+            raise ValueError("Not a uC AST file")
+        magic, version = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a uC AST file")
+        if version != VERSION:
+            raise ValueError("Unsupported uC AST file version %d" % version)
+        self.nfunctions, self._top, meta, self._table = _TRAILER.unpack_from(
+            buf, len(buf) - _TRAILER.size
+        )
+        end = self._table + self.nfunctions * _ENTRY.size + _TRAILER.size
+        if not _HEADER.size <= self._top < meta < self._table or end != len(buf):
+            raise ValueError("Corrupt uC AST file")
+        try:
+            pos = self._read_meta(meta)
+        except IndexError:
+            pos = None
+        if pos != self._table:
+            raise ValueError("Corrupt uC AST file")
+
+    def _read_meta(self, pos):
+        """Read the meta section at pos, returning the position after it."""
+        buf = self.buf
+        classes = {cls.__name__: cls for cls in KINDS}
+        self._kinds = []
+        count, pos = _read_varint(buf, pos)
+        for _ in range(count):
+            name, pos = _read_bytes(buf, pos)
+            name = name.decode()
+            nfields, pos = _read_varint(buf, pos)
+            fields = []
+            for _ in range(nfields):
+                field, pos = _read_bytes(buf, pos)
+                kind, pos = _read_bytes(buf, pos)
+                fields.append((field.decode(), kind.decode()))
+            cls = classes.get(name)
+            if cls is None or list(cls.fields.items()) != fields:
+                raise ValueError("The node class %s does not match the file" % name)
+            # the kinds of the spec, compared by identity while decoding
+            ops = [(kind, field) for field, kind in cls.fields.items()]
+            if cls is FuncDef:
+                ops[-1] = (_LAZY, "body")
+            ops.reverse()
+            self._kinds.append((cls, ops))
+        count, pos = _read_varint(buf, pos)
+        self._strings = []
+        for _ in range(count):
+            string, pos = _read_bytes(buf, pos)
+            self._strings.append(string.decode("utf-8", "surrogatepass"))
+        count, pos = _read_varint(buf, pos)
+        starts = []
+        for _ in range(count):
+            data, pos = _read_bytes(buf, pos)
+            offsets = array("q")
+            offsets.frombytes(data)
+            if sys.byteorder == "big":
+                offsets.byteswap()
+            starts.append(offsets)
+        count, pos = _read_varint(buf, pos)
+        self._lines = []
+        for _ in range(count):
+            index, pos = _read_varint(buf, pos)
+            first, pos = _read_varint(buf, pos)
+            lines = LineIndex.__new__(LineIndex)
+            lines.starts = starts[index]
+            lines.first = _unzigzag(first)
+            self._lines.append(lines)
+        return pos
+
+    def root(self):
+        """The tree written to the file."""
+        return self._decode(self._top)
+
+    def function_names(self):
+        """Names of the FuncDefs, in the order of the file."""
+        names = []
+        for index in range(self.nfunctions):
+            _, name = _ENTRY.unpack_from(self.buf, self._table + index * _ENTRY.size)
+            if name > len(self._strings):
+                raise ValueError("Corrupt uC AST file")
+            names.append(self._strings[name - 1] if name else None)
+        return names
+
+    def function(self, function):
+        """The FuncDef named function, or at index function of the file,
+        its body decoded when first read."""
+        if isinstance(function, str):
+            names = self.function_names()
+            if function not in names:
+                raise KeyError(function)
+            function = names.index(function)
+        if not 0 <= function < self.nfunctions:
+            raise IndexError("FuncDef index out of range")
+        offset, _ = _ENTRY.unpack_from(self.buf, self._table + function * _ENTRY.size)
+        if not _HEADER.size <= offset < self._top:
+            raise ValueError("Corrupt uC AST file")
+        return self._decode(offset)
+
+    def _decode(self, pos):
+        # reading past the end of the file or of one of the tables
+        try:
+            return self._decode_nodes(pos)
+        except IndexError:
+            raise ValueError("Corrupt uC AST file") from None
+
+    def _decode_nodes(self, pos):
+        """The node at pos, in a new scope."""
+        buf = self.buf
+        kinds = self._kinds
+        strings = self._strings
+        line_indexes = self._lines
+        # FuncDefs are referred to from the top section only
+        top = pos >= self._top
+        shared = []
+        prev = 0
+        lines = None
+        root = []
+        # what to read next, last first: (field kind, node, field name),
+        # or (_APPEND or _ITEM or _VALUE, list, None) for an item of list
+        stack = [(_APPEND, root, None)]
+        pop = stack.pop
+        extend = stack.extend
+        while stack:
+            what, target, name = pop()
+            if what is CHILD or what is _APPEND or what is _VALUE:
+                tag = buf[pos]
+                pos += 1
+                if tag & 0x80:
+                    tag, pos = _read_varint(buf, pos - 1)
+                if tag == _NONE:
+                    node = None
+                elif tag == _FUNCTION:
+                    if not top:
+                        raise ValueError("Corrupt uC AST file")
+                    index, pos = _read_varint(buf, pos)
+                    node = self.function(index)
+                else:
+                    cls, ops = kinds[tag - _FIRST_KIND]
+                    node = cls.__new__(cls)
+                    code = buf[pos]
+                    pos += 1
+                    if code & 0x80:
+                        code, pos = _read_varint(buf, pos - 1)
+                    if code == 0:
+                        node._offset = 0
+                        node._lines = None
+                    else:
+                        if code & 1:
+                            prev += _unzigzag(code >> 1)
+                        else:
+                            prev += _unzigzag((code - 2) >> 1)
+                            index, pos = _read_varint(buf, pos)
+                            lines = line_indexes[index]
+                        node._offset = prev
+                        node._lines = lines
+                    extend([(op, node, field) for op, field in ops])
+                    if what is _VALUE:
+                        shared.append(node)
+                if name is None:
+                    target.append(node)
+                else:
+                    setattr(target, name, node)
+            elif what is ATTR or what is DATA or what is _ITEM:
+                tag = buf[pos]
+                pos += 1
+                if tag & 0x80:
+                    tag, pos = _read_varint(buf, pos - 1)
+                if tag >= _FIRST_STRING:
+                    value = strings[tag - _FIRST_STRING]
+                elif tag == _NONE_VALUE:
+                    value = None
+                elif tag == _NODE_VALUE:
+                    stack.append((_VALUE, target, name))
+                    continue
+                elif tag == _SHARED_VALUE:
+                    index, pos = _read_varint(buf, pos)
+                    value = shared[index]
+                elif tag == _INT_VALUE:
+                    value, pos = _read_varint(buf, pos)
+                    value = _unzigzag(value)
+                else:
+                    # each value takes a byte at least
+                    count, pos = _read_varint(buf, pos)
+                    if count > len(buf) - pos:
+                        raise ValueError("Corrupt uC AST file")
+                    value = []
+                    extend([(_ITEM, value, None)] * count)
+                if name is None:
+                    target.append(value)
+                else:
+                    setattr(target, name, value)
+            elif what is CHILDREN:
+                count = buf[pos]
+                pos += 1
+                if count & 0x80:
+                    count, pos = _read_varint(buf, pos - 1)
+                if count == 0:
+                    setattr(target, name, None)
+                elif count - 1 > len(buf) - pos:
+                    # each node takes a byte at least
+                    raise ValueError("Corrupt uC AST file")
+                else:
+                    nodes = []
+                    setattr(target, name, nodes)
+                    extend([(_APPEND, nodes, None)] * (count - 1))
+            else:
+                # _LAZY: the body, last in the section of its FuncDef
+                lazy_bodies[target] = _Body(self, pos)
+        return root[0]
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load(source):
+    """The tree written by dump() to source, a path or bytes, its
+    FuncDef bodies decoded when first read."""
+    return ASTReader(source).root()
+
+
+loads = load
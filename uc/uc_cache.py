@@ -0,0 +1,226 @@
+import hashlib
+import importlib.util
+import os
+import tempfile
+from contextlib import contextmanager
+from uc.uc_ast import FuncDef
+
+
+def cache_dir():
+    """Directory of the files cached between runs: $UC_CACHE_DIR, or
+    uc inside the user's cache directory."""
+    path = os.environ.get("UC_CACHE_DIR")
+    if not path:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        path = os.path.join(base, "uc")
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        # not writable: every lookup misses and nothing gets written
+        pass
+    return path
+
+
+def fingerprint(*parts):
+    """Short hex digest of the given strings."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def load_module(name, path):
+    """Import the generated module at path, or return None if it is
+    missing or unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except Exception:
+        return None
+    return module
+
+
+@contextmanager
+def staged_module(directory, name, prefix=None):
+    """Yields a temporary directory in which name.py is to be generated.
+    On exit the module is moved into directory atomically, so concurrent
+    processes never load a partial file. Caching is best effort: None is
+    yielded when directory is not writable.
+
+    Once it is in place, the other modules of directory whose name starts
+    with prefix, generated for earlier versions, are removed.
+    """
+    try:
+        tmpdir = tempfile.mkdtemp(dir=directory)
+    except OSError:
+        yield None
+        return
+    try:
+        yield tmpdir
+        try:
+            os.replace(
+                os.path.join(tmpdir, name + ".py"), os.path.join(directory, name + ".py")
+            )
+        except OSError:
+            pass
+        else:
+            if prefix is not None:
+                remove_stale(directory, prefix, name)
+    finally:
+        for leftover in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, leftover))
+        os.rmdir(tmpdir)
+
+
+def remove_stale(directory, prefix, name):
+    """Remove the modules of directory whose name starts with prefix,
+    except name.py."""
+    for entry in os.listdir(directory):
+        if entry.startswith(prefix) and entry.endswith(".py") and entry != name + ".py":
+            try:
+                os.remove(os.path.join(directory, entry))
+            except OSError:
+                # removed by another process, or not ours to remove
+                pass
+
+
+class ASTCache:
+    """Content addressed on-disk cache of parsed programs.
+
+    Entries are ASTs written by uc_binary, whose encoder is not bound by
+    the recursion limit as pickle is, stored under directory (ast inside
+    cache_dir() if not given), named by a hash of the source text and of
+    the parser version. Reading an entry refreshes its modification
+    time; once the entries add up to more than max_bytes the least
+    recently used are evicted. Entries are written atomically, so
+    processes sharing the directory only ever see complete files, and
+    an entry evicted by another process is just a miss.
+
+    The size of the entries is counted as they are written, and the
+    directory is only scanned when it goes over max_bytes. The count
+    misses the entries written by other processes until the next scan.
+    """
+
+    def __init__(self, directory=None, max_bytes=256 << 20):
+        self.directory = directory or os.path.join(cache_dir(), "ast")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # size of the entries, unknown until the directory is scanned
+        self.total = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError:
+            pass
+
+    def key(self, version, text):
+        return fingerprint(version, text)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".ast")
+
+    def get(self, key):
+        """The AST stored under key, or None."""
+        # uc_binary imports uc_lexer, which imports this module
+        from uc import uc_binary
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                ast = uc_binary.loads(f.read())
+            # decode the bodies now, so that a damaged entry is a miss
+            for gdecl in ast.gdecls or []:
+                if isinstance(gdecl, FuncDef):
+                    gdecl.body
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # damaged entry: drop it
+            self.misses += 1
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return ast
+
+    def put(self, key, ast):
+        """Store ast under key, then evict entries over max_bytes. An ast
+        uc_binary can not encode is not stored."""
+        from uc import uc_binary
+
+        try:
+            data = uc_binary.dumps(ast)
+        except TypeError:
+            return
+        path = self._path(key)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            try:
+                replaced = os.stat(path).st_size
+            except OSError:
+                replaced = 0
+            os.replace(tmp, path)
+        except OSError:
+            self._remove(tmp)
+            return
+        if self.total is not None:
+            self.total += len(data) - replaced
+        if self.total is None or self.total > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the others fit
+        in max_bytes."""
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(".ast"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                self.evictions += 1
+            total -= size
+        self.total = total
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".ast"):
+                self._remove(os.path.join(self.directory, name))
+        self.total = 0
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
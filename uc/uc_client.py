@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+
+class Client:
+    """Connection to a running uc_daemon. Imports nothing of the parser,
+    so that it starts as fast as the interpreter does."""
+
+    def __init__(self, path=None, timeout=None):
+        if path is None:
+            from uc.uc_daemon import default_socket
+
+            path = default_socket()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.rfile = self.sock.makefile("rb")
+
+    def call(self, **request):
+        """Send request and return the daemon's response."""
+        self.sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("The daemon closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Print the AST of a file as uc_parser.py does, parsed by "
+        "a running uc_daemon"
+    )
+    parser.add_argument("input_file", help="Path to file to be parsed", type=str)
+    parser.add_argument(
+        "--socket",
+        default=os.environ.get("UC_DAEMON_SOCKET"),
+        help="Path of the daemon's socket",
+    )
+    args = parser.parse_args()
+
+    try:
+        with open(args.input_file) as f:
+            text = f.read()
+    except OSError:
+        print("ERROR: Input", args.input_file, "not found", file=sys.stderr)
+        sys.exit(1)
+
+    with Client(args.socket) as client:
+        response = client.call(op="dump", text=text)
+    if not response["ok"]:
+        print("ERROR:", response["error"], file=sys.stderr)
+        sys.exit(1)
+    if response["diagnostics"]:
+        # the first error, as the parser prints it before exiting
+        print(response["diagnostics"][0]["text"])
+        sys.exit(1)
+    sys.stdout.write(response["dump"])
@@ -0,0 +1,273 @@
+import argparse
+import io
+import json
+import math
+import multiprocessing
+import os
+import queue
+import socketserver
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from uc import uc_cache
+
+
+def default_socket():
+    """Socket of the daemon: $UC_DAEMON_SOCKET, or daemon.sock in the
+    cache directory."""
+    return os.environ.get("UC_DAEMON_SOCKET") or os.path.join(
+        uc_cache.cache_dir(), "daemon.sock"
+    )
+
+
+def handle(parser, request):
+    """Response of parser, a UCParser(errors="collect"), to request.
+
+    Requests are dicts with the text to parse, or the path of a file
+    holding it, and an op: "parse" only reports the diagnostics, "dump"
+    also returns the AST as show() prints it (showcoord unless the
+    request sets it false) when there are none.
+    """
+    op = request.get("op", "dump")
+    if op not in ("parse", "dump"):
+        return {"ok": False, "error": "Unknown op %r" % op}
+    text = request.get("text")
+    if text is None:
+        path = request.get("path")
+        if path is None:
+            return {"ok": False, "error": "Missing text or path"}
+        try:
+            with open(path) as f:
+                text = f.read()
+        except OSError as e:
+            return {"ok": False, "error": str(e)}
+    program = parser.parse(text)
+    diagnostics = [
+        {
+            "kind": d.kind,
+            "message": d.message,
+            "line": d.coord.line if d.coord else None,
+            "column": d.coord.column if d.coord else None,
+            "text": str(d),
+        }
+        for d in parser.diagnostics
+    ]
+    response = {"ok": True, "diagnostics": diagnostics}
+    if op == "dump" and not diagnostics and program is not None:
+        buf = io.StringIO()
+        program.show(buf=buf, showcoord=request.get("showcoord", True))
+        response["dump"] = buf.getvalue()
+    return response
+
+
+def _serve_worker(conn, lexer_engine):
+    from uc.uc_parser import UCParser
+
+    parser = UCParser(lexer_engine=lexer_engine, errors="collect")
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        try:
+            response = handle(parser, request)
+        except Exception as e:
+            response = {"ok": False, "error": "%s: %s" % (type(e).__name__, e)}
+        conn.send(response)
+
+
+class _Worker:
+    """A process with a warm UCParser, answering one request at a time."""
+
+    def __init__(self, context, lexer_engine):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_serve_worker, args=(child, lexer_engine), daemon=True
+        )
+        self.process.start()
+        child.close()
+
+    def call(self, request, timeout):
+        """Response to request, or None if there is none within timeout
+        seconds or the process died."""
+        try:
+            self.conn.send(request)
+            if self.conn.poll(timeout):
+                return self.conn.recv()
+        except (EOFError, OSError):
+            pass
+        return None
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """jobs worker processes, each building its UCParser once. A request
+    taking longer than timeout seconds gets its worker killed and
+    replaced by a new one."""
+
+    def __init__(self, jobs=None, timeout=10.0, lexer_engine="ply"):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.timeout = timeout
+        self.lexer_engine = lexer_engine
+        # spawned, not forked: the server has threads running
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        for _ in range(self.jobs):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        worker = _Worker(self._context, self.lexer_engine)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker):
+        worker.kill()
+        with self._lock:
+            self._workers.remove(worker)
+        return self._spawn()
+
+    def submit(self, request):
+        """Response of the next idle worker to request, waiting for one
+        if all are busy."""
+        timeout = request.get("timeout", self.timeout)
+        if timeout.__class__ not in (int, float) or not 0 < timeout < math.inf:
+            return {"ok": False, "error": "Bad timeout %r" % (timeout,)}
+        worker = self._idle.get()
+        try:
+            try:
+                response = worker.call(request, timeout)
+            except Exception as e:
+                # the pipe may still hold the request or its response
+                worker = self._replace(worker)
+                response = {"ok": False, "error": "%s: %s" % (type(e).__name__, e)}
+            else:
+                if response is None:
+                    worker = self._replace(worker)
+                    error = "Timed out after %gs" % timeout
+                    response = {"ok": False, "error": error}
+        finally:
+            self._idle.put(worker)
+        return response
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.kill()
+
+
+def respond(pool, line):
+    """Response line to the request line, both JSON."""
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("Request is not an object")
+    except ValueError as e:
+        response = {"ok": False, "error": "Bad request: %s" % e}
+    else:
+        response = pool.submit(request)
+        if "id" in request:
+            response["id"] = request["id"]
+    return json.dumps(response) + "\n"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                self.wfile.write(respond(self.server.pool, line).encode("utf-8"))
+                self.wfile.flush()
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves the requests of each connection to the socket at path,
+    one JSON object per line, with a WorkerPool."""
+
+    daemon_threads = True
+
+    def __init__(self, path, pool):
+        if os.path.exists(path):
+            os.remove(path)
+        self.pool = pool
+        super().__init__(path, _Handler)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def serve_stream(pool, infile, outfile):
+    """Serve the requests read from infile, one JSON object per line,
+    writing each response to outfile as soon as it is ready: responses
+    may come out of order, matched to requests by their id."""
+    lock = threading.Lock()
+
+    def serve(line):
+        response = respond(pool, line)
+        with lock:
+            outfile.write(response)
+            outfile.flush()
+
+    with ThreadPoolExecutor(max_workers=pool.jobs) as executor:
+        for line in infile:
+            if line.strip():
+                executor.submit(serve, line)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Keep warm parsers answering parse requests, one JSON "
+        "object per line, on a Unix socket or on stdin and stdout"
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Path of the socket (default: $UC_DAEMON_SOCKET or in the cache "
+        "directory)",
+    )
+    parser.add_argument(
+        "--stdio", action="store_true", help="Serve stdin and stdout, not a socket"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=10.0,
+        help="Seconds a request may take before its worker is killed",
+    )
+    parser.add_argument(
+        "--engine", default="ply", choices=["ply", "regex"], help="Lexer engine"
+    )
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.jobs, args.timeout, args.engine)
+    try:
+        if args.stdio:
+            serve_stream(pool, sys.stdin, sys.stdout)
+        else:
+            path = args.socket or default_socket()
+            with DaemonServer(path, pool) as server:
+                print("Listening on", path, file=sys.stderr)
+                try:
+                    server.serve_forever()
+                except KeyboardInterrupt:
+                    pass
+    finally:
+        pool.close()
@@ -0,0 +1,485 @@
+import gc
+from array import array
+from itertools import chain
+from uc.uc_ast import ATTR, CHILD, CHILDREN, DATA, Coord, Node
+
+
+def _node_classes():
+    classes = []
+    stack = [Node]
+    while stack:
+        cls = stack.pop()
+        stack.extend(cls.__subclasses__())
+        if "fields" in cls.__dict__:
+            classes.append(cls)
+    return sorted(classes, key=lambda cls: cls.__name__)
+
+
+# The concrete node classes, by kind: the index of each in KINDS
+KINDS = tuple(_node_classes())
+_kind_of = {cls: kind for kind, cls in enumerate(KINDS)}
+# For each kind, the (index, name, kind) of its fields
+_fields_of = [
+    tuple((index, *field) for index, field in enumerate(cls.fields.items()))
+    for cls in KINDS
+]
+
+
+class FlatAST:
+    """An AST held in typed arrays, one entry per node in each, instead
+    of a Node object per node, for programs of millions of nodes.
+
+    The nodes of the tree are numbered in preorder from 0, the root, to
+    size - 1, so that each subtree is a range of numbers. For node i:
+
+    kinds[i]:
+        Its class, KINDS[kinds[i]].
+    parents[i], first_children[i], next_siblings[i]:
+        The links of the tree, -1 where there is no such node.
+    field_of[i]:
+        The field of its parent holding it, by its index in the
+        parent's class fields.
+    offsets[i], line_of[i]:
+        Its coord, Coord(offsets[i], lines[line_of[i]]), or None when
+        offsets[i] is -1.
+    values[values_at[i]:]:
+        An entry for each of its fields that is not a CHILD, in order:
+        for a CHILDREN field, -1 if it is None and its length if it is
+        a list; for an ATTR or DATA field, the index of its value in
+        constants if it is at least 0, else ~index of the node holding
+        it.
+
+    Nodes held by ATTR and DATA fields (the ID in Decl.name) are not
+    part of the tree: they and their subtrees follow it, from size on,
+    with no parent. A node held by several fields is stored once.
+    Values of other types are interned in constants, which lines and
+    all the nodes share.
+    """
+
+    __slots__ = (
+        "kinds",
+        "parents",
+        "first_children",
+        "next_siblings",
+        "field_of",
+        "offsets",
+        "line_of",
+        "values_at",
+        "values",
+        "constants",
+        "lines",
+        "size",
+    )
+
+    def __init__(self):
+        self.kinds = array("B")
+        self.parents = array("i")
+        self.first_children = array("i")
+        self.next_siblings = array("i")
+        self.field_of = array("B")
+        self.offsets = array("q")
+        self.line_of = array("I")
+        self.values_at = array("I")
+        self.values = array("i")
+        self.constants = []
+        self.lines = []
+        self.size = 0
+
+    @classmethod
+    def from_tree(cls, root):
+        """The FlatAST of the tree under root, a Node. Lazily parsed
+        function bodies are loaded."""
+        flat = cls()
+        constant_index = {}
+        line_index = {}
+        # id(node) -> (node, positions in values of the fields holding it)
+        held = {}
+        kinds = flat.kinds
+        parents = flat.parents
+        first_children = flat.first_children
+        next_siblings = flat.next_siblings
+        field_of = flat.field_of
+        offsets = flat.offsets
+        line_of = flat.line_of
+        values_at = flat.values_at
+        values = flat.values
+        constants = flat.constants
+        lines = flat.lines
+
+        def flatten(root):
+            stack = [(root, -1, 0)]
+            # last child added to each node, -1 if none yet
+            last = {}
+            while stack:
+                node, parent, field = stack.pop()
+                index = len(kinds)
+                kind = _kind_of[node.__class__]
+                kinds.append(kind)
+                parents.append(parent)
+                first_children.append(-1)
+                next_siblings.append(-1)
+                field_of.append(field)
+                if parent >= 0:
+                    previous = last.get(parent, -1)
+                    if previous < 0:
+                        first_children[parent] = index
+                    else:
+                        next_siblings[previous] = index
+                    last[parent] = index
+                coord_lines = node._lines
+                if coord_lines is None:
+                    offsets.append(-1)
+                    line_of.append(0)
+                else:
+                    offsets.append(node._offset)
+                    line = line_index.get(id(coord_lines))
+                    if line is None:
+                        line = line_index[id(coord_lines)] = len(lines)
+                        lines.append(coord_lines)
+                    line_of.append(line)
+                values_at.append(len(values))
+                children = []
+                for field, name, field_kind in _fields_of[kind]:
+                    value = getattr(node, name)
+                    if field_kind == CHILD:
+                        if value is not None:
+                            children.append((value, index, field))
+                    elif field_kind == CHILDREN:
+                        if value is None:
+                            values.append(-1)
+                        else:
+                            values.append(len(value))
+                            children.extend((child, index, field) for child in value)
+                    elif isinstance(value, Node):
+                        entry = held.get(id(value))
+                        if entry is None:
+                            entry = held[id(value)] = (value, [])
+                        entry[1].append(len(values))
+                        values.append(0)
+                    else:
+                        key = (value.__class__, value)
+                        constant = constant_index.get(key)
+                        if constant is None:
+                            constant = constant_index[key] = len(constants)
+                            constants.append(value)
+                        values.append(constant)
+                children.reverse()
+                stack.extend(children)
+
+        flatten(root)
+        flat.size = len(kinds)
+        # the nodes held by fields, which may hold others
+        entries = []
+        while len(entries) < len(held):
+            for node, positions in list(held.values())[len(entries) :]:
+                entries.append((len(kinds), positions))
+                flatten(node)
+        for index, positions in entries:
+            for position in positions:
+                values[position] = ~index
+        return flat
+
+    def to_tree(self, index=0):
+        """The tree of Node objects under node index. Only its nodes and
+        the nodes their fields hold are built."""
+        # built last to first: the children of a node follow it
+        if index == 0:
+            # the whole tree holds every held node
+            order = range(len(self.kinds) - 1, -1, -1)
+        else:
+            order = chain.from_iterable(
+                range(self.subtree_end(root) - 1, root - 1, -1)
+                for root in sorted(self._held_by(index), reverse=True)
+            )
+        # the nodes built hold no cycles: collecting while building them
+        # would only rescan them, again and again
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            return self._build(order, index)
+        finally:
+            if collecting:
+                gc.enable()
+
+    def _held_by(self, index):
+        """index and the held nodes its subtree needs: those its fields
+        hold, and in turn those their subtrees hold."""
+        kinds = self.kinds
+        values_at = self.values_at
+        values = self.values
+        roots = {index}
+        stack = [index]
+        while stack:
+            root = stack.pop()
+            for i in range(root, self.subtree_end(root)):
+                position = values_at[i]
+                for _, _, field_kind in _fields_of[kinds[i]]:
+                    if field_kind == CHILD:
+                        continue
+                    value = values[position]
+                    position += 1
+                    if field_kind != CHILDREN and value < 0 and ~value not in roots:
+                        roots.add(~value)
+                        stack.append(~value)
+        return roots
+
+    def _build(self, order, index):
+        """Build the nodes in order, returning node index."""
+        kinds = self.kinds
+        first_children = self.first_children
+        next_siblings = self.next_siblings
+        field_of = self.field_of
+        offsets = self.offsets
+        line_of = self.line_of
+        values_at = self.values_at
+        values = self.values
+        constants = self.constants
+        lines = self.lines
+        # all of them for the whole tree, a few for a subtree
+        nodes = [None] * len(kinds) if index == 0 else {}
+        # (node, field name, held node) of the held nodes built later
+        pending = []
+        for i in order:
+            kind = kinds[i]
+            cls = KINDS[kind]
+            node = cls.__new__(cls)
+            fields = _fields_of[kind]
+            position = values_at[i]
+            for _, name, field_kind in fields:
+                if field_kind == CHILD:
+                    setattr(node, name, None)
+                    continue
+                value = values[position]
+                position += 1
+                if field_kind == CHILDREN:
+                    setattr(node, name, None if value < 0 else [])
+                elif value < 0:
+                    held = nodes.get(~value) if index else nodes[~value]
+                    if held is None:
+                        pending.append((node, name, ~value))
+                    setattr(node, name, held)
+                else:
+                    setattr(node, name, constants[value])
+            child = first_children[i]
+            while child >= 0:
+                _, name, field_kind = fields[field_of[child]]
+                if field_kind == CHILD:
+                    setattr(node, name, nodes[child])
+                else:
+                    getattr(node, name).append(nodes[child])
+                nodes[child] = None
+                child = next_siblings[child]
+            offset = offsets[i]
+            if offset < 0:
+                node._offset = 0
+                node._lines = None
+            else:
+                node._offset = offset
+                node._lines = lines[line_of[i]]
+            nodes[i] = node
+        for node, name, held in pending:
+            setattr(node, name, nodes[held])
+        return nodes[index]
+
+    def __len__(self):
+        """Number of nodes of the tree."""
+        return self.size
+
+    def nbytes(self):
+        """Bytes taken by the arrays."""
+        return sum(
+            len(column) * column.itemsize
+            for column in (
+                self.kinds,
+                self.parents,
+                self.first_children,
+                self.next_siblings,
+                self.field_of,
+                self.offsets,
+                self.line_of,
+                self.values_at,
+                self.values,
+            )
+        )
+
+    def subtree_end(self, index):
+        """The number after the last node of the subtree of index."""
+        parents = self.parents
+        next_siblings = self.next_siblings
+        while True:
+            sibling = next_siblings[index]
+            if sibling >= 0:
+                return sibling
+            if parents[index] < 0:
+                break
+            index = parents[index]
+        if index < self.size:
+            return self.size
+        # a held node: its subtree runs up to the next node with no parent
+        end = index + 1
+        while end < len(parents) and parents[end] >= 0:
+            end += 1
+        return end
+
+    def cursor(self, index=0):
+        """A Cursor on node index, the root by default."""
+        return Cursor(self, index)
+
+    def find(self, kind, **attrs):
+        """Cursors on the nodes of the tree of class kind, a name in
+        KINDS, in preorder, whose ATTR and DATA fields have the values
+        given by attrs."""
+        try:
+            code = [cls.__name__ for cls in KINDS].index(kind)
+        except ValueError:
+            raise ValueError("Unknown node kind %r" % kind) from None
+        fields = {name: field for field, name, _ in _fields_of[code]}
+        tests = [(fields[name], value) for name, value in attrs.items()]
+        # scanned in C, for the nodes of the kind only
+        kinds = self.kinds.tobytes()
+        tag = bytes([code])
+        index = kinds.find(tag, 0, self.size)
+        while index >= 0:
+            cursor = Cursor(self, index)
+            if all(cursor.value(field) == value for field, value in tests):
+                yield cursor
+            index = kinds.find(tag, index + 1, self.size)
+
+
+class Cursor:
+    """A position in a FlatAST, moved from node to node with the goto_
+    methods, reading the node there without building it."""
+
+    __slots__ = ("ast", "index")
+
+    def __init__(self, ast, index=0):
+        self.ast = ast
+        self.index = index
+
+    def copy(self):
+        return Cursor(self.ast, self.index)
+
+    @property
+    def kind(self):
+        """Name of the class of the node."""
+        return KINDS[self.ast.kinds[self.index]].__name__
+
+    @property
+    def node_class(self):
+        return KINDS[self.ast.kinds[self.index]]
+
+    @property
+    def coord(self):
+        ast = self.ast
+        offset = ast.offsets[self.index]
+        if offset < 0:
+            return None
+        return Coord(offset, ast.lines[ast.line_of[self.index]])
+
+    @property
+    def field(self):
+        """Name of the field of the parent holding the node, None at the
+        root."""
+        ast = self.ast
+        parent = ast.parents[self.index]
+        if parent < 0:
+            return None
+        return _fields_of[ast.kinds[parent]][ast.field_of[self.index]][1]
+
+    @property
+    def name(self):
+        """The name children() of the parent gives the node, such as
+        "citens[2]"."""
+        ast = self.ast
+        parent = ast.parents[self.index]
+        if parent < 0:
+            return None
+        field = ast.field_of[self.index]
+        _, name, kind = _fields_of[ast.kinds[parent]][field]
+        if kind == CHILD:
+            return name
+        position = 0
+        child = ast.first_children[parent]
+        while child != self.index:
+            position += ast.field_of[child] == field
+            child = ast.next_siblings[child]
+        return "%s[%d]" % (name, position)
+
+    def value(self, field):
+        """Value of the ATTR or DATA field of the node, by name or
+        index: a Cursor for a Node, else the value itself."""
+        ast = self.ast
+        fields = _fields_of[ast.kinds[self.index]]
+        if isinstance(field, str):
+            for index, name, kind in fields:
+                if name == field:
+                    break
+            else:
+                raise AttributeError("%s has no field %r" % (self.kind, field))
+        else:
+            index, name, kind = fields[field]
+        if kind not in (ATTR, DATA):
+            raise AttributeError("%s.%s is not an attribute" % (self.kind, name))
+        position = ast.values_at[self.index]
+        position += sum(kind != CHILD for _, _, kind in fields[:index])
+        value = ast.values[position]
+        if value < 0:
+            return Cursor(ast, ~value)
+        return ast.constants[value]
+
+    def attrs(self):
+        """(name, value) of the ATTR fields of the node, as shown."""
+        return [
+            (name, self.value(index))
+            for index, name, kind in _fields_of[self.ast.kinds[self.index]]
+            if kind == ATTR
+        ]
+
+    def goto_parent(self):
+        parent = self.ast.parents[self.index]
+        if parent < 0:
+            return False
+        self.index = parent
+        return True
+
+    def goto_first_child(self):
+        child = self.ast.first_children[self.index]
+        if child < 0:
+            return False
+        self.index = child
+        return True
+
+    def goto_next_sibling(self):
+        sibling = self.ast.next_siblings[self.index]
+        if sibling < 0:
+            return False
+        self.index = sibling
+        return True
+
+    def children(self):
+        """Cursors on the children of the node, in order."""
+        next_siblings = self.ast.next_siblings
+        child = self.ast.first_children[self.index]
+        while child >= 0:
+            yield Cursor(self.ast, child)
+            child = next_siblings[child]
+
+    def descendants(self):
+        """Numbers of the nodes of the subtree of the node, itself
+        included, in preorder."""
+        return range(self.index, self.ast.subtree_end(self.index))
+
+    def to_node(self):
+        """The Node tree of the subtree of the node."""
+        return self.ast.to_tree(self.index)
+
+    def __eq__(self, other):
+        if not isinstance(other, Cursor):
+            return NotImplemented
+        return self.ast is other.ast and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.ast), self.index))
+
+    def __repr__(self):
+        return "Cursor(%s #%d)" % (self.kind, self.index)
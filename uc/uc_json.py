@@ -0,0 +1,116 @@
+import io
+import json
+from json.encoder import encode_basestring_ascii
+from uc.uc_ast import CHILD, CHILDREN, DATA, Node, Program
+
+# Pieces of output written to the file at once
+_FLUSH = 4096
+
+# For each node class, the start of its objects and the (key, name,
+# kind) of the fields written
+_templates = {}
+
+
+def _template(cls):
+    fields = tuple(
+        (',"%s":' % name, name, kind)
+        for name, kind in cls.fields.items()
+        if kind != DATA
+    )
+    _templates[cls] = ('{"_nodetype":"%s","coord":' % cls.__name__, fields)
+    return _templates[cls]
+
+
+def _write_node(node, file, parts, showcoord):
+    """Add the JSON object of node to parts, writing them to file as
+    they pile up."""
+    write = parts.append
+    templates = _templates
+    stack = [node]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        node = pop()
+        if node.__class__ is str:
+            write(node)
+            if len(parts) >= _FLUSH:
+                file.write("".join(parts))
+                parts.clear()
+            continue
+        head, fields = templates.get(node.__class__) or _template(node.__class__)
+        write(head)
+        lines = node._lines
+        if lines is not None and showcoord:
+            write('{"line":%d,"column":%d}' % lines.location(node._offset))
+        else:
+            write("null")
+        push("}")
+        for i in range(len(fields) - 1, -1, -1):
+            key, name, kind = fields[i]
+            value = getattr(node, name)
+            if value is None:
+                push("null")
+            elif kind is CHILDREN:
+                push("]")
+                for j in range(len(value) - 1, 0, -1):
+                    push(value[j])
+                    push(",")
+                if value:
+                    push(value[0])
+                key += "["
+            elif kind is CHILD or isinstance(value, Node):
+                push(value)
+            elif value.__class__ is str:
+                push(encode_basestring_ascii(value))
+            else:
+                push(json.dumps(value))
+            push(key)
+
+
+def write_json(node, file, showcoord=True):
+    """Write the tree under node to file, a text file object, as a JSON
+    object, in pieces as it is walked: the whole document is never held
+    in memory.
+
+    Each node is an object with its class name as "_nodetype", its coord
+    as "coord" ({"line": ..., "column": ...}, or null if it has none or
+    showcoord is false), and a key for each of its ATTR, CHILD and
+    CHILDREN fields, holding a string, a node object, a list of them or
+    null. DATA fields, which show() does not print either, are left out.
+    """
+    parts = []
+    _write_node(node, file, parts, showcoord)
+    file.write("".join(parts))
+
+
+def write_ndjson(node, file, showcoord=True):
+    """Write the tree under node to file as NDJSON, as write_json() does:
+    a line for each global declaration of a Program, or a single line
+    for any other node."""
+    parts = []
+    nodes = (node.gdecls or []) if isinstance(node, Program) else [node]
+    for node in nodes:
+        _write_node(node, file, parts, showcoord)
+        parts.append("\n")
+    file.write("".join(parts))
+
+
+def write_ast(node, file, output_format="show"):
+    """Write node to file as the command line tool prints it: in the
+    show() dump, as JSON or as NDJSON, with coords."""
+    if output_format == "show":
+        node.show(buf=file, showcoord=True)
+    elif output_format == "json":
+        write_json(node, file)
+        file.write("\n")
+    elif output_format == "ndjson":
+        write_ndjson(node, file)
+    else:
+        raise ValueError("Unknown output format %r" % output_format)
+
+
+def to_json(node, showcoord=True):
+    """The JSON text write_json() writes for node."""
+    buf = io.StringIO()
+    write_json(node, buf, showcoord)
+    return buf.getvalue()
@@ -1,7 +1,85 @@
 import argparse
+import codecs
+import io
+import locale
+import mmap
+import os
 import pathlib
+import re
 import sys
+from array import array
+from bisect import bisect_right
 import ply.lex as lex
+from uc import uc_cache
+
+
+class LineIndex:
+    """Offsets where each line of a text starts. Built once per input,
+    it resolves a lexpos into its line and column with a binary
+    search instead of scanning back for the previous newline.
+    """
+
+    __slots__ = ("starts", "first")
+
+    def __init__(self, text="", compact=False, first=1, column=0):
+        """
+        :param text: text whose lines are indexed.
+        :param compact: keep the offsets in an array instead of a list,
+            for indexes grown chunk by chunk over large inputs or kept
+            along with the coords of an AST.
+        :param first: number of the first line of text.
+        :param column: column (from 0) at which text starts in its first
+            line, for a text cut from a larger one: that line starts
+            before offset 0.
+        """
+        self.starts = array("q", [-column]) if compact else [-column]
+        self.first = first
+        self.add(text, 0)
+
+    def add(self, text, offset):
+        """Index the lines starting inside text, found at offset of the
+        whole input."""
+        starts = self.starts
+        find = text.find
+        pos = find("\n")
+        while pos >= 0:
+            starts.append(offset + pos + 1)
+            pos = find("\n", pos + 1)
+
+    def forget(self, offset):
+        """Drop the lines ending before offset, the first line becoming
+        the one holding it. Offsets before it can no longer be looked
+        up."""
+        index = bisect_right(self.starts, offset) - 1
+        if index > 0:
+            del self.starts[:index]
+            self.first += index
+
+    def line(self, lexpos):
+        """Line (starting at first) containing the given offset."""
+        return bisect_right(self.starts, lexpos) + self.first - 1
+
+    def column(self, lexpos):
+        """Column (starting at 1) of the given offset in its line."""
+        return lexpos - self.starts[bisect_right(self.starts, lexpos) - 1] + 1
+
+    def location(self, lexpos):
+        """(line, column) of the given offset."""
+        index = bisect_right(self.starts, lexpos)
+        return index + self.first - 1, lexpos - self.starts[index - 1] + 1
+
+    def offset(self, line, column):
+        """Offset of the given line and column."""
+        return self.starts[line - self.first] + column - 1
+
+    def shifted(self, delta):
+        """An index of the same text starting delta lines further, which
+        shares the offsets of this one."""
+        index = LineIndex.__new__(LineIndex)
+        index.starts = self.starts
+        index.first = self.first + delta
+        return index
+
 
 class UCLexer:
     """A lexer for the uC language. After building it, set the
@@ -21,29 +99,141 @@ class UCLexer:
         # Keeps track of the last token returned from self.token()
         self.last_token = None
 
-    def build(self, **kwargs):
+        # Line start offsets of the current input
+        self.lines = LineIndex()
+
+    def build(self, engine="ply", cache=False, cache_dir=None, **kwargs):
         """Builds the lexer from the specification. Must be
         called after the lexer object is created.
         This method exists separately, because the PLY
         manual warns against calling lex.lex inside __init__
+
+        engine:
+            "ply" scans with the PLY lexer, "regex" with the faster
+            RegexScanner. Both emit the same tokens.
+        cache:
+            Load the PLY lexer from a table module generated by a
+            previous build, skipping the validation of the rules. The
+            module name carries a hash of the rules, so changing them
+            generates a new one.
+        cache_dir:
+            Directory of the table modules, uc_cache.cache_dir() if
+            not given.
         """
-        self.lexer = lex.lex(object=self, **kwargs)
+        if engine == "ply":
+            if cache:
+                self.lexer = self._build_cached(cache_dir, **kwargs)
+            else:
+                self.lexer = lex.lex(object=self, **kwargs)
+        elif engine == "regex":
+            self.lexer = RegexScanner(self)
+        else:
+            raise ValueError("Unknown lexer engine %r" % engine)
+
+    def _build_cached(self, cache_dir, **kwargs):
+        cache_dir = cache_dir or uc_cache.cache_dir()
+        prefix = "uc_lextab_%s_" % type(self).__name__.lower()
+        name = prefix + uc_cache.fingerprint(
+            lex.__version__,
+            self.tokens,
+            self.t_ignore,
+            [(name, func.__doc__) for name, func in _function_rules(self)],
+        )
+        lextab = uc_cache.load_module(name, os.path.join(cache_dir, name + ".py"))
+        if lextab is not None:
+            try:
+                return lex.lex(object=self, optimize=True, lextab=lextab, **kwargs)
+            except Exception:
+                # stale or damaged table: build it again
+                pass
+        lexer = lex.lex(object=self, **kwargs)
+        with uc_cache.staged_module(cache_dir, name, prefix) as tmpdir:
+            if tmpdir is not None:
+                lexer.writetab(name, tmpdir)
+        return lexer
 
     def reset_lineno(self):
         """Resets the internal line number counter of the lexer."""
         self.lexer.lineno = 1
 
-    def input(self, text):
+    def input(self, text, column=0):
+        """Scan text, which starts at line lexer.lineno and at column (from
+        0) of it."""
         self.lexer.input(text)
+        # kept along with the AST by its coords
+        self.lines = LineIndex(
+            text, compact=True, first=self.lexer.lineno, column=column
+        )
+
+    def input_file(self, path, use_mmap=False, chunk_size=1 << 16, keep_lines=False):
+        """Scan a file chunk by chunk instead of reading it whole, from
+        a text reader or from an mmap of the file. Needs the regex
+        engine.
+
+        Only the window of the input holding the current chunk and the
+        token being scanned is held in memory, along with the lines of
+        the window in self.lines. keep_lines keeps the offsets of all the
+        lines read instead, 8 bytes per line, for coords that refer to
+        the whole input, as those of an AST do.
+        """
+        if not isinstance(self.lexer, RegexScanner):
+            raise ValueError("Streaming input needs the regex lexer engine")
+        self.lines = LineIndex(compact=True, first=self.lexer.lineno)
+        source = MmapReader(path) if use_mmap else open(path)
+        self.lexer.input_stream(source, self.lines, chunk_size, keep_lines)
 
     def token(self):
         self.last_token = self.lexer.token()
         return self.last_token
 
+    def profile(self, stats):
+        """Count the tokens emitted by type in stats.tokens and add the
+        time spent in token() to the "lex" phase of stats, a
+        uc_profile.ParseStats."""
+        token = stats.timed("lex", self.token)
+        counts = stats.tokens
+
+        def profiled_token():
+            tok = token()
+            if tok is not None:
+                counts[tok.type] += 1
+            return tok
+
+        # shadows the method on this instance only
+        self.token = profiled_token
+
     def find_tok_column(self, token):
         """Find the column of the token in its line."""
-        last_cr = self.lexer.lexdata.rfind("\n", 0, token.lexpos)
-        return token.lexpos - last_cr
+        return self.lines.column(token.lexpos)
+
+    def tokenize_all(self, text):
+        """Scan the whole text at once into a TokenBuffer."""
+        buf = TokenBuffer(self.tokens)
+        codes = buf.codes
+        valued = buf.valued
+        texts = buf.texts
+        types = buf.types
+        lexpos = buf.lexpos
+        lineno = buf.lineno
+        values = buf.values
+        # repeated identifiers and constants share a single string
+        shared = {}
+
+        self.reset_lineno()
+        self.input(text)
+        buf.lines = self.lines
+        tok = self.token()
+        while tok:
+            code = codes[tok.type]
+            types.append(code)
+            lexpos.append(tok.lexpos)
+            lineno.append(tok.lineno)
+            if code in valued:
+                values.append(shared.setdefault(tok.value, tok.value))
+            elif texts[code] is None:
+                texts[code] = tok.value
+            tok = self.token()
+        return buf
 
     # Internal auxiliary methods
     def _error(self, msg, token):
@@ -300,7 +490,7 @@ class UCLexer:
 
     # Scanner (used only for test)
     def scan(self, data):
-        self.lexer.input(data)
+        self.input(data)
         output = ""
         while True:
             tok = self.lexer.token()
@@ -311,11 +501,450 @@ class UCLexer:
         return output
 
 
+def _function_rules(module):
+    """(name, method) of the token rules of module, in the order PLY
+    tries them: by their definition line."""
+    rules = [
+        (name, getattr(module, name))
+        for name in dir(module)
+        if name.startswith("t_")
+        and name not in ("t_ignore", "t_error", "t_eof")
+        and callable(getattr(module, name))
+    ]
+    rules.sort(key=lambda rule: rule[1].__code__.co_firstlineno)
+    return rules
+
+
+class RegexScanner:
+    """Alternative engine for UCLexer. All the rules are compiled into a
+    single alternation of named groups, tried in the same order as PLY
+    tries them, and most tokens are built straight from the match
+    instead of going through a rule method. The most common tokens skip
+    the alternation altogether: they are dispatched on their first
+    character. It follows the PLY lexer protocol (input, token, skip,
+    lineno, lexpos), so it takes the place of the PLY lexer inside
+    UCLexer.
+
+    Besides a whole string, it can scan a stream read chunk by chunk
+    (input_stream). lexdata then only holds a window of the input that
+    starts at offset base, and lexpos is relative to that window; the
+    tokens still carry their offset in the whole input.
+    """
+
+    # Rules that only count the newlines they consume.
+    newline_rules = ("t_NEWLINE", "t_comment")
+    # Rules whose token type is looked up in the keyword map.
+    keyword_rules = ("t_ID",)
+    # Rules that rewrite the token value, always called.
+    value_rules = ("t_string_literal",)
+    # Single characters that no other rule can start with.
+    punctuators = ";,(){}[]+-*%"
+    # Rules dispatched on the first character of their match.
+    first_chars = {
+        "t_ID": "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_",
+        "t_int_const": "0123456789",
+    }
+
+    # Characters a match may look at around it. A token ending closer
+    # than that to the end of a streamed window is scanned again once
+    # more input is loaded, and that many consumed characters are kept
+    # at the start of the window for the lookbehinds.
+    lookahead = 2
+    lookbehind = 2
+    # Longest part of a streamed input a single token may keep in the
+    # window, in characters.
+    max_window = 1 << 24
+    # Only string literals may span lines: any other token that fails
+    # to match before the next newline of the window fails for good.
+    open_ended = '"'
+
+    def __init__(self, module):
+        self.lexdata = ""
+        self.lexpos = 0
+        self.lexlen = 0
+        self.lineno = 1
+        self.lexmatch = None
+        # Streamed input: offset of lexdata in the whole input, the
+        # furthest a token may end before more input must be loaded,
+        # and where the next chunks come from.
+        self.base = 0
+        self.limit = 0
+        self.source = None
+        self.lines = None
+        self.keep_lines = False
+        self.chunk_size = 0
+        self.errorf = module.t_error
+        self.keyword_map = module.keyword_map
+
+        rules = _function_rules(module)
+
+        # Token type of the rules emitted without calling them
+        self.fixed = {}
+        # Rule methods for everything else
+        self.funcs = {}
+        for name, func in rules:
+            tokname = name[2:].upper()
+            if name in self.newline_rules or name in self.keyword_rules:
+                continue
+            if tokname in module.tokens and name not in self.value_rules:
+                self.fixed[name] = tokname
+            else:
+                self.funcs[name] = func
+
+        self.master = re.compile(
+            "|".join("(?P<%s>%s)" % (name, func.__doc__) for name, func in rules),
+            re.VERBOSE,
+        )
+
+        # First character -> how to scan the token starting with it:
+        # None skips it, "\n" counts a line, a token type emits the
+        # character itself and a (regex, type, keywords) rule scans a
+        # longer token. Anything else goes through the alternation.
+        self.first = {}
+        for c in module.t_ignore:
+            self.first[c] = None
+        self.first["\n"] = "\n"
+        for c in self.punctuators:
+            self.first[c] = self.fixed[self.master.match(c).lastgroup]
+        for name, chars in self.first_chars.items():
+            rule = (
+                re.compile(getattr(module, name).__doc__, re.VERBOSE),
+                name[2:].upper(),
+                name in self.keyword_rules,
+            )
+            for c in chars:
+                self.first[c] = rule
+
+    def input(self, text):
+        self.close()
+        self.lexdata = text
+        self.lexpos = 0
+        self.lexlen = len(text)
+        self.base = 0
+        self.limit = self.lexlen
+
+    def input_stream(self, source, lines, chunk_size, keep_lines=False):
+        """Scan the text read from source, chunk_size characters at a
+        time, indexing its lines into lines as they are read. The lines
+        before the window are dropped from lines unless keep_lines.
+        """
+        self.input("")
+        self.source = source
+        self.lines = lines
+        self.keep_lines = keep_lines
+        self.chunk_size = chunk_size
+        self._refill(0)
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    def _refill(self, lexpos):
+        """Load the next chunk of a streamed input, dropping the part of
+        the window before lexpos. Returns where lexpos moved to, or -1
+        when there is nothing left to load.
+        """
+        if self.source is None:
+            return -1
+        drop = max(0, lexpos - self.lookbehind)
+        kept = self.lexlen - drop
+        if kept > self.max_window:
+            raise lex.LexError(
+                "Scanning error. Token longer than %d characters" % self.max_window,
+                self.lexdata[lexpos:],
+            )
+        # A token spanning many chunks stays whole in the window: reading
+        # at least as much as is kept doubles the window each time, so
+        # copying it stays linear in the length of the token.
+        chunk = self.source.read(max(self.chunk_size, kept))
+        if not chunk:
+            # at the end of the input every token can be scanned whole
+            self.close()
+            self.limit = self.lexlen
+            return lexpos
+        self.lines.add(chunk, self.base + self.lexlen)
+        self.lexdata = self.lexdata[drop:] + chunk
+        self.lexlen = len(self.lexdata)
+        self.limit = self.lexlen - self.lookahead
+        self.base += drop
+        if not self.keep_lines:
+            self.lines.forget(self.base)
+        return lexpos - drop
+
+    def skip(self, n):
+        self.lexpos += n
+
+    def token(self):
+        lexdata = self.lexdata
+        lexpos = self.lexpos
+        lexlen = self.lexlen
+        base = self.base
+        first = self.first
+        keyword_map = self.keyword_map
+        LexToken = lex.LexToken
+        while True:
+            if lexpos >= lexlen:
+                moved = self._refill(lexpos)
+                if moved < 0:
+                    break
+                lexpos = moved
+                lexdata, lexlen, base = self.lexdata, self.lexlen, self.base
+                continue
+            c = lexdata[lexpos]
+            kind = first.get(c, first)
+            if kind is None:
+                lexpos += 1
+                continue
+            if kind == "\n":
+                self.lineno += 1
+                lexpos += 1
+                continue
+
+            if kind.__class__ is str:
+                tok = LexToken()
+                tok.type = kind
+                tok.value = c
+                tok.lineno = self.lineno
+                tok.lexpos = base + lexpos
+                self.lexpos = lexpos + 1
+                return tok
+            if kind is not first:
+                rule, tokname, keywords = kind
+                end = rule.match(lexdata, lexpos).end()
+                if end > self.limit:
+                    lexpos = self._refill(lexpos)
+                    lexdata, lexlen, base = self.lexdata, self.lexlen, self.base
+                    continue
+                tok = LexToken()
+                tok.value = value = lexdata[lexpos:end]
+                tok.type = keyword_map.get(value, tokname) if keywords else tokname
+                tok.lineno = self.lineno
+                tok.lexpos = base + lexpos
+                self.lexpos = end
+                return tok
+
+            m = self.master.match(lexdata, lexpos)
+            if self.source is not None and (
+                (
+                    m is None
+                    and (c in self.open_ended or lexdata.find("\n", lexpos) < 0)
+                )
+                or (m is not None and m.end() > self.limit)
+            ):
+                # the token may go on in the next chunk
+                lexpos = self._refill(lexpos)
+                lexdata, lexlen, base = self.lexdata, self.lexlen, self.base
+                continue
+
+            tok = LexToken()
+            tok.lineno = self.lineno
+            tok.lexpos = base + lexpos
+            if m is None:
+                tok.value = lexdata[lexpos:]
+                tok.type = "error"
+                tok.lexer = self
+                self.lexpos = lexpos
+                newtok = self.errorf(tok)
+                if lexpos == self.lexpos:
+                    raise lex.LexError(
+                        "Scanning error. Illegal character '%s'" % c,
+                        lexdata[lexpos:],
+                    )
+                lexpos = self.lexpos
+                if not newtok:
+                    continue
+                return newtok
+
+            name = m.lastgroup
+            tok.value = m.group()
+            tokname = self.fixed.get(name)
+            if tokname is not None:
+                tok.type = tokname
+                self.lexpos = m.end()
+                return tok
+
+            if name in self.newline_rules:
+                self.lineno += tok.value.count("\n")
+                lexpos = m.end()
+                continue
+
+            tok.type = name[2:]
+            tok.lexer = self
+            self.lexmatch = m
+            self.lexpos = m.end()
+            newtok = self.funcs[name](tok)
+            if not newtok:
+                lexpos = self.lexpos
+                continue
+            return newtok
+
+        # stay at the end: token() keeps returning None
+        self.lexpos = lexpos
+        return None
+
+
+class MmapReader:
+    """Reads the text of a file from an mmap of it, decoding it chunk by
+    chunk with the same encoding and newline translation as open().
+    """
+
+    def __init__(self, path, encoding=None):
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = None
+        if self.size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.pos = 0
+        self.released = 0
+        decoder = codecs.getincrementaldecoder(
+            encoding or locale.getpreferredencoding(False)
+        )()
+        self.decoder = io.IncrementalNewlineDecoder(decoder, translate=True)
+
+    def read(self, size):
+        """Up to size bytes of the file, decoded. Empty at the end."""
+        while self.pos < self.size:
+            data = self.map[self.pos : self.pos + size]
+            self.pos += len(data)
+            self._release()
+            text = self.decoder.decode(data, final=self.pos >= self.size)
+            if text:
+                return text
+        return ""
+
+    def _release(self):
+        """Drop the pages already read from the resident set, so it does
+        not grow with the file."""
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        end = self.pos - self.pos % mmap.PAGESIZE
+        if end > self.released:
+            self.map.madvise(mmap.MADV_DONTNEED, self.released, end - self.released)
+            self.released = end
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+
+class TokenBuffer:
+    """A whole token stream stored by columns instead of one LexToken
+    per token: type codes (indexes in UCLexer.tokens), start offsets and
+    line numbers live in arrays, and values are only kept for the
+    tokens whose value is not implied by their type.
+    """
+
+    __slots__ = (
+        "names",
+        "codes",
+        "valued",
+        "texts",
+        "types",
+        "lexpos",
+        "lineno",
+        "values",
+        "lines",
+    )
+
+    # Token types whose value has to be stored.
+    valued_types = ("ID", "INT_CONST", "CHAR_CONST", "STRING_LITERAL")
+
+    def __init__(self, names):
+        """
+        :param names: token types; a type is coded by its index.
+        """
+        self.names = names
+        self.codes = {name: code for code, name in enumerate(names)}
+        self.valued = frozenset(self.codes[name] for name in self.valued_types)
+        # value shared by every token of the other types
+        self.texts = [None] * len(names)
+        self.types = array("B")
+        self.lexpos = array("i")
+        self.lineno = array("i")
+        self.values = []
+        self.lines = LineIndex()
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        """Rebuild the tokens as PLY LexTokens, one at a time."""
+        names = self.names
+        valued = self.valued
+        texts = self.texts
+        values = iter(self.values)
+        for code, lexpos, lineno in zip(self.types, self.lexpos, self.lineno):
+            tok = lex.LexToken()
+            tok.type = names[code]
+            tok.value = next(values) if code in valued else texts[code]
+            tok.lineno = lineno
+            tok.lexpos = lexpos
+            yield tok
+
+    def stream(self):
+        """A lexer over the buffered tokens, to be given to
+        UCParser.parse(lexer=...)."""
+        return TokenStream(self)
+
+
+class TokenStream:
+    """Lexer interface over a TokenBuffer. Tokens are rebuilt lazily,
+    one per call to token(); the text given to input() is ignored, since
+    it has already been scanned into the buffer.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.lines = buffer.lines
+        self.filename = ""
+        self.last_token = None
+        self._tokens = iter(buffer)
+
+    def reset_lineno(self):
+        pass
+
+    def input(self, text):
+        self._tokens = iter(self.buffer)
+
+    def token(self):
+        self.last_token = next(self._tokens, None)
+        return self.last_token
+
+    def find_tok_column(self, token):
+        """Find the column of the token in its line."""
+        return self.lines.column(token.lexpos)
+
+
 if __name__ == "__main__":
 
     # create argument parser
     parser = argparse.ArgumentParser()
     parser.add_argument("input_file", help="Path to file to be scanned", type=str)
+    parser.add_argument(
+        "--engine",
+        choices=("ply", "regex"),
+        default="ply",
+        help="Lexer engine used to scan the file",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Scan the file chunk by chunk instead of reading it whole",
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Scan the file chunk by chunk from an mmap of it",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1 << 16,
+        help="Size of the chunks read with --stream and --mmap",
+    )
     args = parser.parse_args()
 
     # get input path
@@ -333,8 +962,14 @@ if __name__ == "__main__":
 
     # set error function
     m = UCLexer(print_error)
-    # Build the lexer
-    m.build()
+    # Build the lexer; streamed input needs the regex engine
+    streamed = args.stream or args.mmap
+    m.build(engine="regex" if streamed else args.engine)
     # open file and print tokens
-    with open(input_path) as f:
-        m.scan(f.read())
\ No newline at end of file
+    if streamed:
+        m.input_file(input_path, use_mmap=args.mmap, chunk_size=args.chunk_size)
+        for tok in iter(m.token, None):
+            print(tok)
+    else:
+        with open(input_path) as f:
+            m.scan(f.read())
\ No newline at end of file
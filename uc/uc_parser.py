@@ -1,8 +1,18 @@
 import argparse
+import os
 import pathlib
+import re
 import sys
+from collections import deque
+from ply import yacc as ply_yacc
 from ply.yacc import yacc
+from uc import uc_cache
+from uc.uc_profile import ParseStats
 from uc.uc_ast import (
+    Coord,
+    lazy_bodies,
+    node_attrs,
+    WeakIdentityMap,
     ID,
     ArrayDecl,
     ArrayRef,
@@ -23,6 +33,7 @@ from uc.uc_ast import (
     GlobalDecl,
     If,
     InitList,
+    Node,
     ParamList,
     Print,
     Program,
@@ -33,66 +44,524 @@ from uc.uc_ast import (
     VarDecl,
     While,
 )
+from uc.uc_json import write_ast
 from uc.uc_lexer import UCLexer
 
 
-class Coord:
-    """Coordinates of a syntactic element. Consists of:
-    - Line number
-    - (optional) column number, for the Lexer
+class Diagnostic:
+    """An error found in the input. kind is "LexerError" or
+    "ParserError", coord is None at the end of the input and token is
+    the token a ParserError was found at, if any. Its str() is the line
+    the command line tool prints.
     """
 
-    __slots__ = ("line", "column")
+    __slots__ = ("kind", "message", "coord", "token")
 
-    def __init__(self, line, column=None):
-        self.line = line
-        self.column = column
+    def __init__(self, kind, message, coord=None, token=None):
+        self.kind = kind
+        self.message = message
+        self.coord = coord
+        self.token = token
 
     def __str__(self):
-        if self.line and self.column is not None:
-            coord_str = "@ %s:%s" % (self.line, self.column)
-        elif self.line:
-            coord_str = "@ %s" % (self.line)
-        else:
-            coord_str = ""
-        return coord_str
+        if self.kind == "LexerError":
+            return "LexerError: %s at %d:%d" % (
+                self.message,
+                self.coord.line,
+                self.coord.column,
+            )
+        if self.coord is None:
+            return "ParserError: %s" % self.message
+        return "ParserError: %s %s" % (self.message, self.coord)
+
+    def __repr__(self):
+        return "Diagnostic(%r)" % str(self)
+
+
+class ParseError(Exception):
+    """Raised by a UCParser(errors="raise") with the diagnostics of the
+    input."""
+
+    def __init__(self, diagnostics):
+        super().__init__("\n".join(str(d) for d in diagnostics))
+        self.diagnostics = diagnostics
+
+
+# What splits a text into top-level declarations: braces, semicolons and
+# what precedes a brace, outside of strings, characters and comments, and
+# the openers of those left unterminated
+_REGION_TOKENS = re.compile(
+    r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\\n])*\'|//[^\n]*|/\*.*?\*/'
+    r"|/\*|[\"\'{};)=]",
+    re.S,
+)
+_BLANK = re.compile(r"(?:\s|//[^\n]*|/\*.*?\*/)*", re.S)
+
+
+def split_regions(text, final=True):
+    """Split text into its top-level declarations, each ending at a
+    semicolon or at the brace closing a function body. Returns the
+    (start, end, body) of each, starting at its first token, with body
+    the offset of the brace opening the function body, if any, or None if
+    text can not be split this way (unbalanced braces, old style
+    parameter declarations). Text past the last declaration makes a
+    region of its own unless it holds only blanks and comments.
+
+    final=False splits a text that more text may follow: only the
+    declarations sure to be complete are returned, those before the
+    first unterminated comment, string or character.
+    """
+    regions = []
+    start = _BLANK.match(text).end()
+    depth = 0
+    last = None
+    body = None
+    for m in _REGION_TOKENS.finditer(text):
+        c = m.group()
+        if c in ("/*", '"', "'"):
+            if not final:
+                return regions
+        elif c == "{":
+            if depth == 0:
+                if last == ";":
+                    return None
+                body = m.start() if last == ")" else None
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0 and body is not None:
+                regions.append((start, m.end(), body))
+                start = _BLANK.match(text, m.end()).end()
+                body = None
+        elif c == ";" and depth == 0:
+            regions.append((start, m.end(), None))
+            start = _BLANK.match(text, m.end()).end()
+        if c in "{};)=":
+            last = c
+    if final and start < len(text):
+        regions.append((start, len(text), None))
+    return regions
+
+
+def _regions(text):
+    """The regions of text keyed by their text and column, with the
+    line they start at."""
+    spans = split_regions(text)
+    if spans is None:
+        return None
+    regions = []
+    line = 1
+    pos = 0
+    for start, end, _ in spans:
+        line += text.count("\n", pos, start)
+        pos = start
+        column = start - text.rfind("\n", 0, start) - 1
+        regions.append(((column, text[start:end]), line))
+    return regions
+
+
+def _shift_lines(nodes, delta):
+    """Move the coords of nodes and of everything below them delta lines.
+    Nodes shared by several nodes are moved once."""
+    seen = set()
+    # the coords of a text move to the same shifted line index; the
+    # original is kept so that its id is not reused
+    shifted = {}
+    stack = list(nodes)
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, list):
+            stack.extend(obj)
+        elif isinstance(obj, Node) and id(obj) not in seen:
+            seen.add(id(obj))
+            lines = obj._lines
+            if lines is not None:
+                if id(lines) not in shifted:
+                    shifted[id(lines)] = (lines, lines.shifted(delta))
+                obj._lines = shifted[id(lines)][1]
+            stack.extend(value for name, value in node_attrs(obj) if name != "coord")
+            if obj in lazy_bodies:
+                lazy_bodies[obj].line += delta
+
+
+class _LazyBody:
+    """Parses the function body at text[start:end], starting at line."""
+
+    __slots__ = ("parser", "text", "start", "end", "line")
+
+    def __init__(self, parser, text, start, end, line):
+        self.parser = parser
+        self.text = text
+        self.start = start
+        self.end = end
+        self.line = line
+
+    def __call__(self):
+        text = self.text
+        column = self.start - text.rfind("\n", 0, self.start) - 1
+        # a function header just before the body, on its line
+        header = "void f()"
+        source = header + text[self.start : self.end]
+        gdecls = self.parser._parse_region((column - len(header), source), self.line)
+        return gdecls[0].body if gdecls else None
 
 
 class UCParser:
-    def __init__(self, debug=True):
-        """Create a new uCParser."""
+    # token types made by the parser itself rather than by the lexer
+    parser_tokens = ()
+
+    def __init__(
+        self,
+        debug=False,
+        lexer_engine="ply",
+        cache=True,
+        cache_dir=None,
+        ast_cache=None,
+        errors="exit",
+        profile=False,
+    ):
+        """Create a new uCParser.
+
+        debug:
+            Generate the LALR tables again and write their description
+            to parser.out in the working directory.
+        lexer_engine:
+            Engine of the UCLexer (see UCLexer.build).
+        cache:
+            Load the lexer and LALR tables generated by a previous run
+            from cache_dir (uc_cache.cache_dir() if not given). They
+            are keyed by a hash of the grammar and rebuilt when it
+            changes.
+        ast_cache:
+            uc_cache.ASTCache in which parse() looks the text up first,
+            returning the stored Program without lexing or parsing it.
+        errors:
+            What to do on a lexer or parser error. "exit" prints it to
+            stdout and exits, as the command line tool does. "collect"
+            adds a Diagnostic to self.diagnostics, skips to the next
+            ";" or "}" and carries on: the Program returned lacks the
+            declarations and statements in error, and is None if
+            nothing could be recovered. "raise" collects them too, then
+            raises a ParseError with them.
+        profile:
+            Gather a uc_profile.ParseStats in self.stats: the tokens
+            scanned, the reductions by each rule, the nodes built and
+            the time spent lexing, building the AST and parsing.
+        """
+        if errors not in ("exit", "collect", "raise"):
+            raise ValueError("Unknown errors mode %r" % errors)
+        self.errors = errors
+        self.diagnostics = []
         self.uclex = UCLexer(self._lexer_error)
-        self.uclex.build()
-        self.tokens = self.uclex.tokens
+        self.uclex.build(engine=lexer_engine, cache=cache, cache_dir=cache_dir)
+        self.tokens = self.uclex.tokens + self.parser_tokens
 
-        self.ucparser = yacc(module=self, start="program", debug=debug)
+        if debug:
+            with open("parser.out", "w") as debugfile:
+                self.ucparser = yacc(
+                    module=self,
+                    start="program",
+                    debug=True,
+                    write_tables=False,
+                    debuglog=ply_yacc.PlyLogger(debugfile),
+                )
+        elif cache:
+            self.ucparser = self._build_cached(cache_dir)
+        else:
+            self.ucparser = yacc(
+                module=self, start="program", debug=False, write_tables=False
+            )
         # Keeps track of the last token given to yacc (the lookahead token)
         self._last_yielded_token = None
+        # Lexer feeding the current parse
+        self._lexer = self.uclex
+        self.ast_cache = ast_cache
+        self._version = None
+        # Text each Program was parsed from, for reparse()
+        self._texts = WeakIdentityMap()
+        self.stats = None
+        if profile:
+            self._profile(ParseStats())
+
+    def _profile(self, stats):
+        self.stats = stats
+        self.uclex.profile(stats)
+        for production in self.ucparser.productions:
+            if production.callable is not None:
+                production.callable = stats.action(
+                    production.func, production.callable
+                )
+        # shadows the method on this instance only
+        self.ucparser.parse = stats.timed("parse", self.ucparser.parse)
+
+    def _count_nodes(self, program):
+        if self.stats is not None and program is not None:
+            # bodies not parsed yet are not read, which would parse them
+            self.stats.count_nodes(program, lambda node: node not in lazy_bodies)
+
+    def parse(self, text, debuglevel=0, lexer=None, lazy=False):
+        """Parse text into a Program. lexer replaces the parser's own
+        UCLexer, e.g. one built with another engine. Without it, text is
+        looked up in the ast_cache first, if any.
+
+        lazy:
+            Only find where the body of each function is, and parse it
+            when FuncDef.body is first read, which is also when errors
+            in it are reported. Skips the ast_cache.
+        """
+        self.diagnostics = []
+        if lazy and lexer is None:
+            program = self._parse_lazy(text)
+            self._texts[program] = text
+            self._count_nodes(program)
+            return program
+        if lexer is None:
+            if self.ast_cache is not None:
+                program = self._parse_cached(text, debuglevel)
+                self._texts[program] = text
+                return program
+            lexer = self.uclex
+        lexer.reset_lineno()
+        self._lexer = lexer
+        self._last_yielded_token = None
+        program = self.ucparser.parse(input=text, lexer=lexer, debug=debuglevel)
+        self._check_diagnostics()
+        if program is not None:
+            self._texts[program] = text
+        self._count_nodes(program)
+        return program
+
+    def reparse(self, old_program, new_text):
+        """Parse new_text, an edit of the text old_program was parsed
+        from by this parser, parsing again only the top-level
+        declarations whose text changed (see split_regions). The others
+        are taken from old_program, their coords moved to their new
+        lines, so old_program must not be used afterwards. Falls back to
+        parse() when either text can not be split.
+        """
+        self.diagnostics = []
+        old_text = self._texts.get(old_program)
+        old_regions = None if old_text is None else _regions(old_text)
+        new_regions = _regions(new_text)
+        if (
+            old_regions is None
+            or new_regions is None
+            or len(old_regions) != len(old_program.gdecls)
+        ):
+            return self.parse(new_text)
 
-    def parse(self, text, debuglevel=0):
+        reusable = {}
+        for (key, line), gdecl in zip(old_regions, old_program.gdecls):
+            reusable.setdefault(key, deque()).append((line, gdecl))
+        gdecls = []
+        for key, line in new_regions:
+            if reusable.get(key):
+                old_line, gdecl = reusable[key].popleft()
+                if line != old_line:
+                    _shift_lines([gdecl], line - old_line)
+                gdecls.append(gdecl)
+            else:
+                gdecls.extend(self._parse_region(key, line))
+        program = Program(gdecls)
+        self._texts[program] = new_text
+        return program
+
+    def iter_parse(self, source, chunk_size=1 << 16):
+        """Generator of the global declarations (GlobalDecl or FuncDef)
+        of source, a text or a text file read chunk_size characters at a
+        time. Each is parsed on its own as soon as its text is read and
+        nothing refers to it once yielded, so the memory used is bounded
+        by the largest declaration, not by the size of source.
+        """
+        self.diagnostics = []
+        if isinstance(source, str):
+            chunks = iter((source,))
+        else:
+            chunks = iter(lambda: source.read(chunk_size), "")
+        # text not parsed yet, and where it starts
+        buffer = ""
+        line = 1
+        column = 0
+        splittable = True
+        for chunk in chunks:
+            buffer += chunk
+            if not splittable:
+                continue
+            spans = split_regions(buffer, final=False)
+            if spans is None:
+                # old style parameter declarations: parse the rest whole
+                splittable = False
+            elif spans:
+                yield from self._parse_spans(buffer, spans, line, column)
+                end = spans[-1][1]
+                newline = buffer.rfind("\n", 0, end)
+                column = end - newline - 1 if newline >= 0 else column + end
+                line += buffer.count("\n", 0, end)
+                buffer = buffer[end:]
+        spans = split_regions(buffer) if splittable else None
+        if spans is None and _BLANK.match(buffer).end() < len(buffer):
+            spans = [(0, len(buffer), None)]
+        yield from self._parse_spans(buffer, spans or [], line, column)
+
+    def _parse_spans(self, text, spans, line, column):
+        """Parse the regions of text at spans, text starting at line and
+        column, yielding their global declarations."""
+        pos = 0
+        for start, end, _ in spans:
+            line += text.count("\n", pos, start)
+            pos = start
+            newline = text.rfind("\n", 0, start)
+            if newline < 0:
+                key = (column + start, text[start:end])
+            else:
+                key = (start - newline - 1, text[start:end])
+            yield from self._parse_region(key, line)
+
+    def _parse_lazy(self, text):
+        spans = split_regions(text)
+        if spans is None:
+            return self.parse(text)
+        gdecls = []
+        line = 1
+        pos = 0
+        for start, end, body in spans:
+            line += text.count("\n", pos, start)
+            pos = start
+            column = start - text.rfind("\n", 0, start) - 1
+            if body is None:
+                gdecls.extend(self._parse_region((column, text[start:end]), line))
+                continue
+            # the header with an empty body stands for the function
+            funcdef = self._parse_region((column, text[start:body] + "{}"), line)[0]
+            del funcdef.body
+            body_line = line + text.count("\n", start, body)
+            lazy_bodies[funcdef] = _LazyBody(self, text, body, end, body_line)
+            gdecls.append(funcdef)
+        return Program(gdecls)
+
+    def _parse_region(self, key, line):
+        """Global declarations of the region of text key (column, text)
+        starting at line."""
+        column, text = key
+        self.uclex.reset_lineno()
+        self.uclex.lexer.lineno = line
+        # the line index gives the columns of the region in its lines
+        self.uclex.input(text, column)
+        self._lexer = self.uclex
+        self._last_yielded_token = None
+        program = self.ucparser.parse(lexer=self.uclex)
+        # the LR parser keeps its last stack, which holds the program
+        del self.ucparser.symstack[:]
+        self._check_diagnostics()
+        return program.gdecls if program is not None else []
+
+    def parse_file(self, path, use_mmap=False, chunk_size=1 << 16, debuglevel=0):
+        """Parse a file scanned chunk by chunk (see UCLexer.input_file)
+        instead of read whole. Needs the regex lexer engine. Besides the
+        window of the lexer, the memory used grows with the AST, whose
+        coords keep the offset of every line of the file, 8 bytes each.
+        """
+        self.diagnostics = []
         self.uclex.reset_lineno()
+        # the coords of the AST refer to every line
+        self.uclex.input_file(
+            path, use_mmap=use_mmap, chunk_size=chunk_size, keep_lines=True
+        )
+        self._lexer = self.uclex
         self._last_yielded_token = None
-        return self.ucparser.parse(input=text, lexer=self.uclex, debug=debuglevel)
+        program = self.ucparser.parse(lexer=self.uclex, debug=debuglevel)
+        self._check_diagnostics()
+        self._count_nodes(program)
+        return program
+
+    def version(self):
+        """Hash of the sources of the lexer, the parser and the AST nodes,
+        which changes whenever the AST built for a text may change."""
+        if self._version is None:
+            modules = {sys.modules[cls.__module__] for cls in type(self).__mro__}
+            modules.add(sys.modules[UCLexer.__module__])
+            modules.add(sys.modules[Program.__module__])
+            sources = []
+            for module in modules:
+                path = getattr(module, "__file__", None)
+                if path is not None:
+                    with open(path, "rb") as f:
+                        sources.append(f.read())
+            self._version = uc_cache.fingerprint(
+                ply_yacc.__version__, type(self).__qualname__, *sorted(sources)
+            )
+        return self._version
+
+    def _parse_cached(self, text, debuglevel):
+        key = self.ast_cache.key(self.version(), text)
+        ast = self.ast_cache.get(key)
+        if ast is None:
+            ast = self.parse(text, debuglevel, lexer=self.uclex)
+            # a program recovered from errors comes with its diagnostics
+            if not self.diagnostics:
+                self.ast_cache.put(key, ast)
+        return ast
+
+    def _build_cached(self, cache_dir):
+        cache_dir = cache_dir or uc_cache.cache_dir()
+        rules = sorted(
+            (getattr(self, name).__code__.co_firstlineno, name)
+            for name in dir(self)
+            if name.startswith("p_") and name != "p_error"
+        )
+        # tables of other UCParser subclasses are kept, those of earlier
+        # versions of this grammar are removed once the new one is written
+        prefix = "uc_parsetab_%s_" % type(self).__name__.lower()
+        name = prefix + uc_cache.fingerprint(
+            ply_yacc.__version__,
+            self.tokens,
+            self.precedence,
+            [(name, getattr(self, name).__doc__) for _, name in rules],
+        )
+        tabmodule = uc_cache.load_module(name, os.path.join(cache_dir, name + ".py"))
+        if tabmodule is not None:
+            # PLY still checks the signature of the tables it loads
+            return yacc(
+                module=self,
+                start="program",
+                debug=False,
+                tabmodule=tabmodule,
+                write_tables=False,
+            )
+        with uc_cache.staged_module(cache_dir, name, prefix) as tmpdir:
+            return yacc(
+                module=self,
+                start="program",
+                debug=False,
+                tabmodule=name,
+                write_tables=tmpdir is not None,
+                outputdir=tmpdir,
+            )
 
     def _lexer_error(self, msg, line, column):
-        # use stdout to match with the output in the .out test files
-        print("LexerError: %s at %d:%d" % (msg, line, column), file=sys.stdout)
-        sys.exit(1)
+        lines = self.uclex.lines
+        coord = Coord(lines.offset(line, column), lines)
+        self._report(Diagnostic("LexerError", msg, coord))
 
-    def _parser_error(self, msg, coord=None):
-        # use stdout to match with the output in the .out test files
-        if coord is None:
-            print("ParserError: %s" % (msg), file=sys.stdout)
-        else:
-            print("ParserError: %s %s" % (msg, coord), file=sys.stdout)
-        sys.exit(1)
+    def _parser_error(self, msg, coord=None, token=None):
+        self._report(Diagnostic("ParserError", msg, coord, token))
+
+    def _report(self, diagnostic):
+        if self.errors == "exit":
+            # use stdout to match with the output in the .out test files
+            print(diagnostic, file=sys.stdout)
+            sys.exit(1)
+        self.diagnostics.append(diagnostic)
+
+    def _check_diagnostics(self):
+        if self.errors == "raise" and self.diagnostics:
+            diagnostics, self.diagnostics = self.diagnostics, []
+            raise ParseError(diagnostics)
 
     def _token_coord(self, p, token_idx):
-        last_cr = p.lexer.lexer.lexdata.rfind("\n", 0, p.lexpos(token_idx))
-        if last_cr < 0:
-            last_cr = -1
-        column = p.lexpos(token_idx) - (last_cr)
-        return Coord(p.lineno(token_idx), column)
+        return Coord(p.lexpos(token_idx), p.lexer.lines)
 
     precedence = (
         ('left', 'OR'),
@@ -103,28 +572,49 @@ class UCParser:
         ('left', 'TIMES', 'DIVIDE', 'MOD')
     )
 
+    def _build_declarations(self, spec, decls):
+        """Decls of the (declarator, initializer) pairs in decls, each
+        with its own copy of the type specifier spec."""
+        declarations = []
+        for decl, init in decls:
+            decl.primitive = Type(spec.name, spec.coord)
+            declarations.append(Decl(decl.identifier, decl, init))
+        return declarations
+
     def p_program(self, p):
-            """program : global_declaration_list"""
-            p[0] = ('Program', p[1])
+        """program : global_declaration_list"""
+        p[0] = Program(p[1])
 
     def p_global_declaration_list(self, p):
         """global_declaration_list : global_declaration
                                     | global_declaration_list global_declaration
         """
-        p[0] = [p[1]] if len(p) == 2 else p[1] + [p[2]]
+        if len(p) == 2:
+            p[0] = [p[1]] if p[1] is not None else []
+        else:
+            if p[2] is not None:
+                p[1].append(p[2])
+            p[0] = p[1]
 
     def p_global_declaration(self, p):
         """global_declaration : function_definition
                                 | declaration
         """
-        
-        pass
+        if p.slice[1].type == "declaration":
+            p[0] = GlobalDecl(p[1])
+        else:
+            p[0] = p[1]
 
     def p_function_definition(self, p):
         """function_definition : type_specifier declarator compound_statement
                                 | type_specifier declarator declaration_list compound_statement
         """
-        pass
+        decl = self._build_declarations(p[1], [(p[2], None)])[0]
+        body = p[len(p) - 1]
+        if len(p) == 5:
+            # old style parameter declarations open the body
+            body.citens[:0] = p[3]
+        p[0] = FuncDef(p[1], decl, body)
 
     #feito (funciona ?)
     def p_type_specifier(self, p):
@@ -132,7 +622,7 @@ class UCParser:
                           | CHAR
                           | INT
         """
-        p[0] = Type([p[1]], coord=self._token_coord(p, 1))
+        p[0] = Type(p[1], coord=self._token_coord(p, 1))
         #pass
 
     def p_declarator(self, p):
@@ -143,12 +633,21 @@ class UCParser:
                       | declarator LPAREN RPAREN
                       | declarator LPAREN parameter_list RPAREN
         """
-        pass
+        if len(p) == 2:
+            p[0] = VarDecl(p[1], None)
+        elif p.slice[1].type == "LPAREN":
+            p[0] = p[2]
+        elif p[2] == "[":
+            dim = p[3] if len(p) == 5 else None
+            p[0] = p[1].modify(ArrayDecl(None, dim))
+        else:
+            params = p[3] if len(p) == 5 else None
+            p[0] = p[1].modify(FuncDecl(params, None))
 
     def p_constant_expression(self, p):
         """constant_expression : binary_expression
         """
-        pass
+        p[0] = p[1]
     
     #feito (funciona ?)
     def p_binary_expression(self, p):
@@ -177,7 +676,10 @@ class UCParser:
         """unary_expression : postfix_expression
                             | unary_operator unary_expression
         """
-        pass
+        if len(p) == 2:
+            p[0] = p[1]
+        else:
+            p[0] = UnaryOp(p[1], p[2], p[2].coord)
     
     #feito (funciona ?)
     def p_postfix_expression(self, p): #1,2,3
@@ -188,7 +690,7 @@ class UCParser:
         """
         if len(p) == 2:
             p[0] = p[1]
-        elif len(p) == 5 and p[2] == 'LBRACKET':
+        elif len(p) == 5 and p[2] == "[":
             p[0] = ArrayRef(p[1], p[3], p[1].coord)
         else:
             p[0] = FuncCall(p[1], p[3] if len(p) == 5 else None, p[1].coord)
@@ -200,14 +702,19 @@ class UCParser:
                               | STRING_LITERAL
                               | LPAREN expression RPAREN
         """
-        pass
+        if len(p) == 4:
+            p[0] = p[2]
+        elif p.slice[1].type == "STRING_LITERAL":
+            p[0] = Constant("string", p[1], self._token_coord(p, 1))
+        else:
+            p[0] = p[1]
     
     #feito (funciona ?)
     def p_constant(self, p):
         """constant : INT_CONST
                     | CHAR_CONST
         """
-        if p[1] == "INT_CONST":
+        if p.slice[1].type == "INT_CONST":
             type = "int"
         else:
             type = "char"
@@ -235,8 +742,11 @@ class UCParser:
                                | argument_expression COMMA assignment_expression
         """
         if len(p) == 2:
-            p[0] = ExprList([p[1]], p[1].coord)
+            p[0] = p[1]
         else:
+            if not isinstance(p[1], ExprList):
+                p[1] = ExprList([p[1]], p[1].coord)
+
             p[1].exprs.append(p[3])
             p[0] = p[1]
         #pass
@@ -257,7 +767,7 @@ class UCParser:
                           | MINUS
                           | NOT
         """
-        pass
+        p[0] = p[1]
 
     #feito (funciona ?)
     def p_parameter_list(self, p):
@@ -274,31 +784,42 @@ class UCParser:
     def p_parameter_declaration(self, p):
         """parameter_declaration : type_specifier declarator
         """
-        pass
+        p[0] = self._build_declarations(p[1], [(p[2], None)])[0]
 
     def p_declaration(self, p):
         """declaration : type_specifier SEMI
                        | type_specifier init_declarator_list SEMI
         """
-        pass
+        if len(p) == 3:
+            p[0] = []
+        else:
+            p[0] = self._build_declarations(p[1], p[2])
 
     def p_declaration_list(self, p):
         """declaration_list : declaration
                             | declaration_list declaration
         """
-        pass
+        if len(p) == 2:
+            p[0] = p[1]
+        else:
+            p[1].extend(p[2])
+            p[0] = p[1]
 
     def p_init_declarator_list(self, p):
         """init_declarator_list : init_declarator
                                 | init_declarator_list COMMA init_declarator
         """
-        pass
+        if len(p) == 2:
+            p[0] = [p[1]]
+        else:
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_init_declarator(self, p):
         """init_declarator : declarator
                             | declarator EQUALS initializer
         """
-        pass
+        p[0] = (p[1], p[3] if len(p) == 4 else None)
     
     #feito (funciona ?)
     def p_initializer(self, p):
@@ -310,18 +831,19 @@ class UCParser:
         if len(p) == 2:
             p[0] = p[1]
         elif len(p) == 3:
-            p[0] = p[1] + p[2]
-        elif (p[2] is None) and (len(p) == 4):
             p[0] = InitList([], self._token_coord(p, 1))
         else:
-            p[0] = p[2]
-        #pass
+            p[0] = InitList(p[2], p[2][0].coord)
 
     def p_initializer_list(self, p):
         """initializer_list : initializer
                             | initializer_list COMMA initializer
         """
-        pass
+        if len(p) == 2:
+            p[0] = [p[1]]
+        else:
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_compound_statement(self, p):
         """compound_statement : LBRACE RBRACE
@@ -329,7 +851,10 @@ class UCParser:
                               | LBRACE statement_list RBRACE
                               | LBRACE declaration_list statement_list RBRACE
         """
-        pass
+        citens = []
+        for item in p[2 : len(p) - 1]:
+            citens.extend(item)
+        p[0] = Compound(citens, self._token_coord(p, 1))
     
     #feito (funciona ?)
     def p_statement(self, p):
@@ -342,13 +867,18 @@ class UCParser:
                      | print_statement
                      | read_statement
         """
-        pass
+        p[0] = p[1]
 
     def p_statement_list(self, p):
         """statement_list : statement
                           | statement_list statement
         """
-        pass
+        if len(p) == 2:
+            p[0] = [p[1]] if p[1] is not None else []
+        else:
+            if p[2] is not None:
+                p[1].append(p[2])
+            p[0] = p[1]
     
     #feito (funciona ?)
     def p_expression_statement(self, p):
@@ -356,13 +886,9 @@ class UCParser:
                                 | expression SEMI
         """
         if len(p) == 2:
-            p[0] = p[1]
+            p[0] = EmptyStatement(self._token_coord(p, 1))
         else:
-            if p[1] is None:
-                p[0] = EmptyStatement(self._token_coord(p, 2))
-            else:
-                p[0] = p[1]
-        #pass
+            p[0] = p[1]
     
     #feito (funciona ?)
     def p_selection_statement(self, p):
@@ -390,43 +916,86 @@ class UCParser:
                                | FOR LPAREN declaration SEMI expression RPAREN statement
                                | FOR LPAREN declaration expression SEMI expression RPAREN statement
         """
-        if p[1] == "WHILE":
-            p[0] = While(p[3], p[5], self._token_coord(p, 1))
-        elif
-        #pass
+        coord = self._token_coord(p, 1)
+        if p[1] == "while":
+            p[0] = While(p[3], p[5], coord)
+            return
+        # init, cond and next are the expressions between the
+        # parentheses, separated by semicolons; a declaration brings its own
+        parts = [None, None, None]
+        index = 0
+        for symbol in p.slice[3 : len(p) - 2]:
+            if symbol.type == "SEMI":
+                index += 1
+            elif symbol.type == "declaration":
+                parts[0] = DeclList(symbol.value, coord)
+                index = 1
+            else:
+                parts[index] = symbol.value
+        p[0] = For(*parts, p[len(p) - 1], coord)
 
     def p_jump_statement(self, p):
         """jump_statement : BREAK SEMI
                             | RETURN SEMI
                             | RETURN expression SEMI
         """
-        pass
+        coord = self._token_coord(p, 1)
+        if p[1] == "break":
+            p[0] = Break(coord)
+        else:
+            p[0] = Return(p[2] if len(p) == 4 else None, coord)
 
     def p_assert_statement(self, p):
         """assert_statement : ASSERT expression SEMI
         """
-        pass
+        p[0] = Assert(p[2], self._token_coord(p, 1))
 
     def p_print_statement(self, p):
         """print_statement : PRINT LPAREN RPAREN SEMI
                             | PRINT LPAREN expression RPAREN SEMI
         """
-        pass
+        p[0] = Print(p[3] if len(p) == 6 else None, self._token_coord(p, 1))
 
     def p_read_statement(self, p):
         """read_statement : READ LPAREN argument_expression RPAREN SEMI
         """
-        pass
+        p[0] = Read(p[3], self._token_coord(p, 1))
 
     def p_identifier(self, p):
         """identifier : ID"""
-        p[0] = ('ID', p[1])
+        p[0] = ID(p[1], self._token_coord(p, 1))
         p.set_lineno(0, p.lineno(1))
 
+    # Error recovery, used when errors are not fatal: a faulty declaration
+    # or statement is dropped up to the next ";" or "}"
+
+    def p_global_declaration_error(self, p):
+        """global_declaration : error SEMI
+                              | error compound_statement
+        """
+        p[0] = None
+
+    def p_compound_statement_error(self, p):
+        """compound_statement : LBRACE error RBRACE
+                              | LBRACE declaration_list error RBRACE
+                              | LBRACE statement_list error RBRACE
+                              | LBRACE declaration_list statement_list error RBRACE
+        """
+        citens = []
+        for item in p[2 : len(p) - 2]:
+            citens.extend(item)
+        p[0] = Compound(citens, self._token_coord(p, 1))
+
+    def p_statement_error(self, p):
+        """statement : error SEMI"""
+        p[0] = None
+
     def p_error(self, p):
         if p:
             self._parser_error(
-                "Before %s" % p.value, Coord(p.lineno, self.uclex.find_tok_column(p))
+                "Before %s" % p.value,
+                Coord(p.lexpos, self._lexer.lines),
+                p,
             )
         else:
             self._parser_error("At the end of input (%s)" % self.uclex.filename)
@@ -436,11 +1005,114 @@ if __name__ == "__main__":
 
     # create argument parser
     parser = argparse.ArgumentParser()
-    parser.add_argument("input_file", help="Path to file to be parsed", type=str)
+    parser.add_argument(
+        "input_file",
+        nargs="*",
+        help="Path to file to be parsed, or files and directories in batch mode",
+        type=str,
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Scan the file chunk by chunk instead of reading it whole",
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Scan the file chunk by chunk from an mmap of it",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1 << 16,
+        help="Size of the chunks read with --stream and --mmap",
+    )
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="Write the description of the LALR tables to parser.out",
+    )
+    parser.add_argument(
+        "--ast-cache",
+        action="store_true",
+        help="Reuse the ASTs of files parsed before, kept in the cache directory",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the time spent in each phase and the counts of tokens, "
+        "reductions and nodes to stderr",
+    )
+    parser.add_argument(
+        "--format",
+        default="show",
+        choices=["show", "json", "ndjson"],
+        help="Print the AST as show() dumps it, as a JSON object, or as NDJSON "
+        "with one global declaration per line",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Parse many files across a process pool, writing one AST dump per file",
+    )
+    parser.add_argument(
+        "--files-from",
+        help="File listing the paths to be parsed in batch mode, one per line",
+    )
+    parser.add_argument(
+        "--pattern",
+        default="*.uc",
+        help="Files searched for in the directories given in batch mode",
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="Directory of the AST dumps in batch mode, instead of next to each file",
+    )
+    parser.add_argument(
+        "--suffix", default=".ast", help="Suffix of the AST dumps in batch mode"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes in batch mode (default: one per CPU)",
+    )
     args = parser.parse_args()
 
+    if (
+        args.batch
+        or args.files_from
+        or len(args.input_file) > 1
+        or any(os.path.isdir(name) for name in args.input_file)
+    ):
+        if args.profile:
+            parser.error("--profile is not supported in batch mode")
+        from uc import uc_batch
+
+        paths = uc_batch.collect_files(args.input_file, args.files_from, args.pattern)
+        missing = [path for path in paths if not path.exists()]
+        for path in missing:
+            print("ERROR: Input", path, "not found", file=sys.stderr)
+        paths = [path for path in paths if path.exists()]
+        if not paths:
+            sys.exit(1)
+        outputs = uc_batch.output_paths(paths, args.output_dir, args.suffix)
+        result = uc_batch.parse_batch(
+            paths,
+            outputs,
+            jobs=args.jobs,
+            ast_cache=args.ast_cache,
+            output_format=args.format,
+        )
+        print(result.summary(), file=sys.stderr)
+        sys.exit(1 if result.failures or missing else 0)
+
+    if len(args.input_file) != 1:
+        parser.error("expected one input_file")
+
     # get input path
-    input_file = args.input_file
+    input_file = args.input_file[0]
     input_path = pathlib.Path(input_file)
 
     # check if file exists
@@ -452,8 +1124,20 @@ if __name__ == "__main__":
         print("Lexical error: %s at %d:%d" % (msg, x, y), file=sys.stderr)
 
     # set error function
-    p = UCParser()
-    # open file and print ast
-    with open(input_path) as f:
-        ast = p.parse(f.read())
-        ast.show(buf=sys.stdout, showcoord=True)
+    if args.stream or args.mmap:
+        # streamed input needs the regex lexer engine
+        p = UCParser(debug=args.debug, lexer_engine="regex", profile=args.profile)
+        ast = p.parse_file(input_path, use_mmap=args.mmap, chunk_size=args.chunk_size)
+    else:
+        ast_cache = uc_cache.ASTCache() if args.ast_cache else None
+        p = UCParser(debug=args.debug, ast_cache=ast_cache, profile=args.profile)
+        # open file and print ast
+        with open(input_path) as f:
+            ast = p.parse(f.read())
+
+    if args.profile:
+        with p.stats.timer("show"):
+            write_ast(ast, sys.stdout, args.format)
+        print(p.stats.report(), file=sys.stderr)
+    else:
+        write_ast(ast, sys.stdout, args.format)
@@ -0,0 +1,270 @@
+from collections import deque
+from ply.lex import LexToken
+from uc.uc_ast import (
+    ID,
+    ArrayRef,
+    Assignment,
+    BinaryOp,
+    Constant,
+    Coord,
+    ExprList,
+    FuncCall,
+    UnaryOp,
+)
+from uc.uc_parser import UCParser
+
+UNARY_OPERATORS = frozenset(("PLUS", "MINUS", "NOT"))
+# token types an expression can start with
+EXPRESSION_START = UNARY_OPERATORS.union(
+    ("ID", "INT_CONST", "CHAR_CONST", "STRING_LITERAL", "LPAREN")
+)
+CONSTANTS = {"INT_CONST": "int", "CHAR_CONST": "char", "STRING_LITERAL": "string"}
+
+
+class _Backtrack(Exception):
+    """The tokens read are not an expression the LALR parser accepts."""
+
+
+class ExpressionReader:
+    """Token function of the LALR parser of a UCPrattParser.
+
+    Where the parser state expects an assignment or a constant expression,
+    the reader parses it from the tokens of the lexer by precedence
+    climbing, and hands it to the parser as a single token whose value is
+    the expression node. The token that ends the expression follows it.
+
+    Expressions the hand-written parser gives up on, because they are not
+    valid or nest too deep for the Python stack, are not reported: their
+    tokens are handed to the parser one by one again, which then parses
+    them, or reports the same error it would have without the reader.
+    """
+
+    def __init__(self, parser, lexer, starts, levels, right):
+        """
+        :param parser: the PLY LRParser, whose statestack is read.
+        :param lexer: lexer the tokens are read from.
+        :param starts: LALR state -> type of the token to hand over for
+            an expression read in that state.
+        :param levels: binary operator token type -> binding level, from
+            1 for the loosest.
+        :param right: levels whose operators are right associative.
+        """
+        self.parser = parser
+        self.lexer = lexer
+        self.read = lexer.token
+        self.starts = starts
+        self.levels = levels
+        self.right = right
+        self.pending = deque()
+        self.taken = None
+        self.tok = None
+        self.type = None
+
+    def token(self):
+        pending = self.pending
+        if pending:
+            return pending.popleft()
+        tok = self.read()
+        if tok is None or tok.type not in EXPRESSION_START:
+            return tok
+        kind = self.starts.get(self.parser.statestack[-1])
+        if kind is None:
+            # the parser may expect an expression once it has reduced
+            # what comes before it
+            kind = self.starts.get(self.shift_state(tok.type))
+            if kind is None or self.shift_state(kind) is None:
+                return tok
+        self.taken = [tok]
+        self.tok = tok
+        self.type = tok.type
+        try:
+            if kind == "ASSIGNMENT_EXPRESSION":
+                node = self.assignment()
+            else:
+                node = self.binary(self.unary(), 1)
+        except (_Backtrack, RecursionError):
+            pending.extend(self.taken[1:])
+            return tok
+        finally:
+            self.taken = None
+        expr = LexToken()
+        expr.type = kind
+        expr.value = node
+        expr.lineno = tok.lineno
+        expr.lexpos = tok.lexpos
+        # the token that ended the expression
+        pending.append(self.tok)
+        return expr
+
+    def shift_state(self, type):
+        """State in which the parser shifts a token of the given type,
+        after the reductions it makes first, or None if it is an error."""
+        parser = self.parser
+        stack = parser.statestack
+        top = len(stack)
+        # states pushed by the reductions, over stack[:top]
+        pushed = []
+        state = stack[-1]
+        action = parser.action[state].get(type)
+        while action is not None and action < 0:
+            production = parser.productions[-action]
+            popped = production.len - len(pushed)
+            if popped > 0:
+                top -= popped
+                pushed = []
+            elif production.len:
+                del pushed[-production.len :]
+            state = pushed[-1] if pushed else stack[top - 1]
+            state = parser.goto[state][production.name]
+            pushed.append(state)
+            action = parser.action[state].get(type)
+        return state if action else None
+
+    def advance(self):
+        tok = self.tok = self.read()
+        self.taken.append(tok)
+        self.type = tok.type if tok is not None else "$end"
+
+    def expect(self, type):
+        if self.type != type:
+            raise _Backtrack
+        self.advance()
+
+    def coord(self, tok):
+        return Coord(tok.lexpos, self.lexer.lines)
+
+    def expression(self):
+        """expression, or argument_expression: assignments separated by
+        commas."""
+        node = self.assignment()
+        if self.type == "COMMA":
+            # like the LALR actions, the list of a parenthesized comma
+            # expression on the left is extended
+            if not isinstance(node, ExprList):
+                node = ExprList([node], node.coord)
+            while self.type == "COMMA":
+                self.advance()
+                node.exprs.append(self.assignment())
+        return node
+
+    def assignment(self):
+        node = self.unary()
+        if self.type == "EQUALS":
+            op = self.tok.value
+            self.advance()
+            return Assignment(op, node, self.assignment(), node.coord)
+        node = self.binary(node, 1)
+        if self.type == "EQUALS":
+            # only a unary expression can be assigned to
+            raise _Backtrack
+        return node
+
+    def binary(self, left, min_level):
+        """The binary expression starting with the operand left, up to the
+        first operator binding looser than min_level."""
+        levels = self.levels
+        level = levels.get(self.type, 0)
+        while level >= min_level:
+            op = self.tok.value
+            self.advance()
+            right = self.unary()
+            next_level = levels.get(self.type, 0)
+            while next_level > level or (
+                next_level == level and level in self.right
+            ):
+                right = self.binary(right, next_level)
+                next_level = levels.get(self.type, 0)
+            left = BinaryOp(op, left, right, left.coord)
+            level = next_level
+        return left
+
+    def unary(self):
+        operators = []
+        while self.type in UNARY_OPERATORS:
+            operators.append(self.tok.value)
+            self.advance()
+        node = self.postfix()
+        for op in reversed(operators):
+            node = UnaryOp(op, node, node.coord)
+        return node
+
+    def postfix(self):
+        node = self.primary()
+        while True:
+            if self.type == "LBRACKET":
+                self.advance()
+                index = self.expression()
+                self.expect("RBRACKET")
+                node = ArrayRef(node, index, node.coord)
+            elif self.type == "LPAREN":
+                self.advance()
+                args = None
+                if self.type != "RPAREN":
+                    args = self.expression()
+                self.expect("RPAREN")
+                node = FuncCall(node, args, node.coord)
+            else:
+                return node
+
+    def primary(self):
+        tok = self.tok
+        type = self.type
+        if type == "ID":
+            node = ID(tok.value, self.coord(tok))
+        elif type in CONSTANTS:
+            node = Constant(CONSTANTS[type], tok.value, self.coord(tok))
+        elif type == "LPAREN":
+            self.advance()
+            node = self.expression()
+            self.expect("RPAREN")
+            return node
+        else:
+            raise _Backtrack
+        self.advance()
+        return node
+
+
+class UCPrattParser(UCParser):
+    """UCParser whose expressions are parsed by a hand-written precedence
+    climbing parser, following UCParser.precedence, instead of by the
+    LALR tables. The declarations and statements around them are still
+    parsed by the grammar of UCParser, which takes each expression as a
+    single ASSIGNMENT_EXPRESSION or CONSTANT_EXPRESSION token.
+
+    The AST, coords included, and the errors reported are the same as
+    those of UCParser.
+    """
+
+    parser_tokens = ("ASSIGNMENT_EXPRESSION", "CONSTANT_EXPRESSION")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # LALR states in which an expression can start
+        starts = {}
+        for state, actions in self.ucparser.action.items():
+            for kind in self.parser_tokens:
+                if kind in actions:
+                    starts[state] = kind
+        levels = {}
+        right = set()
+        for level, (assoc, *types) in enumerate(self.precedence, 1):
+            levels.update(dict.fromkeys(types, level))
+            if assoc == "right":
+                right.add(level)
+        ucparser = self.ucparser
+        parse = ucparser.parse
+
+        def parse_expressions(
+            input=None, lexer=None, debug=False, tracking=False, tokenfunc=None
+        ):
+            reader = ExpressionReader(ucparser, lexer, starts, levels, right)
+            return parse(input, lexer, debug, tracking, reader.token)
+
+        # shadows the method on this instance only
+        ucparser.parse = parse_expressions
+
+    def p_parsed_expression(self, p):
+        """assignment_expression : ASSIGNMENT_EXPRESSION
+        constant_expression : CONSTANT_EXPRESSION
+        """
+        p[0] = p[1]
@@ -0,0 +1,120 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class ParseStats:
+    """Counters and timings gathered by a UCParser(profile=True), summed
+    over the texts it parses:
+
+    tokens:
+        Count of each token type the lexer emitted.
+    reductions:
+        Count of the reductions by each grammar rule, by the name of
+        its p_ function.
+    nodes:
+        Count of the nodes of each AST class in the programs returned.
+    times:
+        Seconds spent in each phase: "lex" in UCLexer.token, "actions"
+        in the p_ functions building the AST, "parse" in the whole LR
+        parse (lexing and actions included) and "show" in the blocks
+        timed with timer("show").
+    """
+
+    def __init__(self):
+        self.tokens = Counter()
+        self.reductions = Counter()
+        self.nodes = Counter()
+        self.times = Counter()
+
+    def clear(self):
+        self.tokens.clear()
+        self.reductions.clear()
+        self.nodes.clear()
+        self.times.clear()
+
+    @contextmanager
+    def timer(self, phase):
+        """Add the time spent in the with block to phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[phase] += time.perf_counter() - start
+
+    def timed(self, phase, func):
+        """func, adding the time spent in its calls to phase."""
+        times = self.times
+        clock = time.perf_counter
+
+        def timed_func(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                times[phase] += clock() - start
+
+        return timed_func
+
+    def action(self, name, func):
+        """func, the p_ function name of a grammar rule, counting its
+        reductions and timing them as "actions"."""
+        reductions = self.reductions
+        times = self.times
+        clock = time.perf_counter
+
+        def counted_action(p):
+            reductions[name] += 1
+            start = clock()
+            try:
+                func(p)
+            finally:
+                times["actions"] += clock() - start
+
+        return counted_action
+
+    def count_nodes(self, node, loaded=lambda node: True):
+        """Count node and the nodes below it, without descending into
+        those for which loaded(node) is false."""
+        nodes = self.nodes
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            nodes[type(node).__name__] += 1
+            if loaded(node):
+                stack.extend(child for _, child in node.children())
+
+    def report(self):
+        """The stats as a text table."""
+        lines = ["%-28s %10s" % ("phase", "seconds")]
+        parse = self.times["parse"]
+        phases = [
+            ("lex", self.times["lex"]),
+            ("actions (AST)", self.times["actions"]),
+            (
+                "LR (rest of parse)",
+                max(0.0, parse - self.times["lex"] - self.times["actions"]),
+            ),
+            ("parse", parse),
+            ("show", self.times["show"]),
+        ]
+        lines.extend("%-28s %10.4f" % phase for phase in phases)
+        for title, counter in [
+            ("tokens", self.tokens),
+            ("reductions", self.reductions),
+            ("nodes", self.nodes),
+        ]:
+            lines.append("")
+            lines.append("%-28s %10d" % (title, sum(counter.values())))
+            lines.extend(
+                "  %-26s %10d" % item
+                for item in sorted(counter.items(), key=lambda kv: (-kv[1], kv[0]))
+            )
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return "ParseStats(tokens=%d, reductions=%d, nodes=%d)" % (
+            sum(self.tokens.values()),
+            sum(self.reductions.values()),
+            sum(self.nodes.values()),
+        )